@@ -1,3 +1,4 @@
+import codec
 import communication
 from PySide6.QtCore import QThreadPool, Qt, Signal
 from PySide6.QtWidgets import (
@@ -19,6 +20,7 @@ import routing
 import settings
 import socket
 import sys
+import tablestate
 
 def create_socket(host: str, port: int) -> socket.socket:
     conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -68,11 +70,10 @@ class PokerApp(QWidget):
         self._game_id = value
         self.gameIdChanged.emit(value)
 
-    def recv_main_msg(self, message: str) -> None:
-        cmd, data = message.split(':', 1)
-        match cmd:
-            case 'game_id': self.game_id = data
-        pass
+    def recv_main_msg(self, message: tuple) -> None:
+        match message:
+            case (codec.GAME_ID, game_id): self.game_id = str(game_id)
+            case (codec.ERROR, code, text): print(f'{code}: {text}')
 
     def connect_server(self) -> None:
         if not self.conn:
@@ -88,11 +89,15 @@ class PokerApp(QWidget):
         self.conn = None
 
     def new_game(self) -> None:
-        message = f'game:new:holdem'
+        message = codec.encode(codec.GAME_NEW, 'holdem')
         self.router.send_msg_to_server(self.conn, message)
 
     def connect_game(self) -> None:
-        message = f'game:join:{self.game_area.game_id_entry.text()}'
+        try:
+            game_id = int(self.game_area.game_id_entry.text())
+        except ValueError:
+            return
+        message = codec.encode(codec.GAME_JOIN, game_id)
         self.router.send_msg_to_server(self.conn, message)
 
     def closeEvent(self, event) -> None:
@@ -106,6 +111,7 @@ class GameArea(QWidget):
         super().__init__(parent)
 
         self.balance = 5000
+        self.reset_table()
 
         self.resize(700, 800)
 
@@ -147,6 +153,10 @@ class GameArea(QWidget):
 
         layout.addLayout(connect_layout)
 
+        self.table_view = QLabel(self)
+        self.table_view.setWordWrap(True)
+        layout.addWidget(self.table_view)
+
         self.game_area = QTextEdit(self)
         self.game_area.setReadOnly(True)
         layout.addWidget(self.game_area)
@@ -189,15 +199,19 @@ class GameArea(QWidget):
         self.button_layout.addWidget(self.slider_value, 1, 1)
 
         self.call_bet_button = GameButton('Bet')
+        self.call_bet_button.clicked.connect(lambda: self.act('call' if self.to_call() else 'bet'))
         self.button_layout.addWidget(self.call_bet_button, 0, 2)
 
         self.check_button = GameButton('Check')
+        self.check_button.clicked.connect(lambda: self.act('check'))
         self.button_layout.addWidget(self.check_button, 0, 3)
 
         self.raise_button = GameButton('Raise')
+        self.raise_button.clicked.connect(lambda: self.act('raise'))
         self.button_layout.addWidget(self.raise_button, 1, 2)
 
         self.fold_button = GameButton('Fold')
+        self.fold_button.clicked.connect(lambda: self.act('fold'))
         self.button_layout.addWidget(self.fold_button, 1, 3)
 
         layout.addLayout(self.button_layout)
@@ -231,7 +245,9 @@ class GameArea(QWidget):
         self.id_line.setText(game_id)
         self.game_id_entry.setText('')
         self.button_layout.setEnabled(True)
-        self.enable_game_buttons()
+        self.reset_table()
+        self.game_area.setText('')
+        self.show_table()
 
     def update_raise_value(self, value: int) -> None:
         self.slider_value.setText(f'{value}')
@@ -259,8 +275,89 @@ class GameArea(QWidget):
         if value > maximum:
             self.slider_value.setText(f'{maximum}')
 
-    def recv_game_msg(self, message: str) -> None:
-        pass
+    # The server sends a snapshot when we join, then a numbered delta after
+    # every change. A delta that skips a version means one was lost, so ask
+    # for a fresh snapshot and ignore deltas until it arrives.
+    def recv_game_msg(self, message: tuple) -> None:
+        match message:
+            case (codec.TABLE_SNAPSHOT, version, seat, changes):
+                self.table = tablestate.new_state()
+                tablestate.apply(self.table, changes)
+                self.version, self.seat = version, seat
+            case (codec.TABLE_DELTA, version, changes):
+                if self.version is None or version <= self.version:
+                    return
+                if version != self.version + 1:
+                    self.version = None
+                    self.request_sync()
+                    return
+                tablestate.apply(self.table, changes)
+                self.version = version
+            case (codec.TABLE_HOLE, cards):
+                self.hole = cards
+            case (codec.GAME_EVENT, event):
+                self.game_area.append(event)
+                return
+            case _:
+                return
+        self.show_table()
+
+    def reset_table(self) -> None:
+        self.table = tablestate.new_state()
+        self.version = None
+        self.seat = tablestate.NO_SEAT
+        self.hole = b''
+
+    def request_sync(self) -> None:
+        parent: PokerApp = self.parent()
+        if parent.game_id:
+            message = codec.encode(codec.TABLE_SYNC, int(parent.game_id))
+            self.router.send_msg_to_server(parent.conn, message)
+
+    def to_call(self) -> int:
+        seats = self.table['seats']
+        if self.seat not in seats:
+            return 0
+        return max(bet for _, bet, _ in seats.values()) - seats[self.seat][1]
+
+    def act(self, action: str) -> None:
+        parent: PokerApp = self.parent()
+        if not parent.game_id:
+            return
+        amount = self.raise_slider.value() if action in ('bet', 'raise') else 0
+        message = codec.encode(codec.GAME_ACT, int(parent.game_id), codec.ACTION_CODES[action], amount)
+        self.router.send_msg_to_server(parent.conn, message)
+
+    def show_table(self) -> None:
+        table = self.table
+        board = ' '.join(map(tablestate.card_name, table['board']))
+        lines = [f'Hand #{table['hand']}    Pot: ${table['pot']}    Board: {board or '-'}']
+        for seat, (balance, bet, flags) in sorted(table['seats'].items()):
+            notes = []
+            if seat == table['button']: notes.append('button')
+            if seat == table['turn']: notes.append('to act')
+            if flags & tablestate.ALL_IN: notes.append('all in')
+            elif flags & tablestate.SITTING_OUT: notes.append('sitting out')
+            elif not flags & tablestate.IN_HAND and table['hand']: notes.append('folded')
+            line = f'Seat {seat}: ${balance}'
+            if bet: line += f', betting ${bet}'
+            if notes: line += f' ({', '.join(notes)})'
+            if seat == self.seat:
+                line += f'  <- you {' '.join(map(tablestate.card_name, self.hole))}'
+            lines.append(line)
+        self.table_view.setText('\n'.join(lines))
+
+        mine = table['seats'].get(self.seat)
+        if mine is None or table['turn'] != self.seat:
+            self.disable_game_buttons()
+            return
+        balance, bet, _ = mine
+        self.balance = balance
+        self.raise_slider.setMaximum(balance + bet)
+        to_call = self.to_call()
+        self.call_bet_button.setText(f'Call {to_call}' if to_call else 'Bet')
+        self.enable_game_buttons()
+        self.check_button.setEnabled(not to_call)
 
 class GameButton(QPushButton):
     def __init__(self, text):
@@ -338,15 +435,14 @@ class ChatBox(QWidget):
         game_id = parent.game_id
         data = self.text_entry.text()
         if parent.game_id and data:
-            message = f'game:msg:{game_id}:{data}'
+            message = codec.encode(codec.CHAT_SEND, int(game_id), data)
             self.router.send_msg_to_server(self.conn, message)
             self.text_entry.setText('')
 
-    def recv_chat_msg(self, message: str) -> None:
-        cmd, data = message.split(':', 1)
-        match cmd:
-            case 'msg':
-                self.read_area.append(data)
+    def recv_chat_msg(self, message: tuple) -> None:
+        match message:
+            case (codec.CHAT_MSG, sender, text):
+                self.read_area.append(f'{sender}: {text}')
 
     def set_conn(self, conn: socket.socket) -> None:
         self.conn = conn
@@ -355,7 +451,7 @@ class ChatBox(QWidget):
         if not self.username_field.text(): return
         if not username:
             username = self.username_field.text()
-        message = f'main:user:{username}'
+        message = codec.encode(codec.USER, username)
         self.router.send_msg_to_server(self.conn, message)
         self.username_field.setEnabled(False)
         self.save_user_button.setEnabled(False)
@@ -1,10 +1,12 @@
+import codec
+import protocol
 import routing
 import socket
 import settings
 from PySide6.QtCore import QRunnable, QObject, Signal
 
 class SignalEmitter(QObject):
-    signal: Signal = Signal(str)
+    signal: Signal = Signal(object)
 
 class TcpThread(QRunnable):
     def __init__(self, conn: socket.socket):
@@ -21,22 +23,32 @@ class TcpThread(QRunnable):
         for router in routing.get_all_routers():
             router.register_tcp_handler(send_message)
 
+        self.routes = codec.table({
+            codec.GAME_ID: self.main_msgr,
+            codec.ERROR: self.main_msgr,
+            codec.CHAT_MSG: self.chat_msgr,
+            codec.GAME_EVENT: self.game_msgr,
+            codec.TABLE_SNAPSHOT: self.game_msgr,
+            codec.TABLE_DELTA: self.game_msgr,
+            codec.TABLE_HOLE: self.game_msgr,
+        })
+
     def run(self):
         self.recv_messages()
 
     def recv_messages(self) -> None:
+        frames = protocol.FrameBuffer(settings.BUFFER_SIZE)
         while True:
-            message = self.conn.recv(settings.BUFFER_SIZE).decode('utf-8')
-            if not message or not self.conn:
+            if not frames.recv_into(self.conn) or not self.conn:
                 break
-            attn, data = message.split(':', 1)
-            match attn:
-                case 'main': self.main_msgr.signal.emit(data)
-                case 'chat': self.chat_msgr.signal.emit(data)
-                case 'game': self.game_msgr.signal.emit(data)
+            for payload in frames:
+                message = codec.decode(payload)
+                messenger = self.routes[message[0]]
+                if messenger:
+                    messenger.signal.emit(message)
 
-def send_message(conn: socket.socket, message: str) -> None:
+def send_message(conn: socket.socket, message: bytes) -> None:
     try:
-        conn.sendall(message.encode('utf-8'))
+        conn.sendall(protocol.encode_frame(message))
     except Exception as e:
         print(e)
\ No newline at end of file
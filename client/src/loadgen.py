@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import codec
+from concurrent.futures import ProcessPoolExecutor
+import json
+import protocol
+import random
+import settings
+import time
+
+# Headless load generator: thousands of simulated players per process on one
+# asyncio loop, speaking the app's framing (protocol.py) and messages
+# (codec.py) to a local server. Each bot connects and registers, then until
+# the deadline thinks for a random while, picks an operation by weight and
+# waits for the server's answer. Latency runs from handing the request to
+# the socket to reading the answer, so with too many bots for one process
+# it includes the bots' own loop falling behind; --processes spreads them.
+#   connect    TCP connect and USER (which has no answer)
+#   game_new   GAME_NEW until GAME_ID
+#   game_join  GAME_JOIN to a table another bot sits at, until GAME_ID or
+#              ERROR (a full table)
+#   chat       CHAT_SEND until the bot's own line comes back from the room
+#   leave      GAME_LEAVE, which has no answer
+#   reconnect  hanging up and connecting again
+#   malformed  a frame with an unknown opcode, until the server hangs up
+# Operations that need a table join one first when the bot has none. A
+# failed operation is counted under its error: the server's ERROR code,
+# 'timeout', or the connection error's type.
+
+OPERATIONS = ('connect', 'game_new', 'game_join', 'chat', 'leave', 'reconnect', 'malformed')
+MIX = {'chat': 70, 'game_join': 10, 'game_new': 5, 'leave': 10, 'reconnect': 5, 'malformed': 0}
+MAX_SEATS = 8
+UNKNOWN_OPCODE = b'\xff'
+
+class BotError(Exception):
+    pass
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {op: [] for op in OPERATIONS}
+        self.errors: dict[str, dict[str, int]] = {op: {} for op in OPERATIONS}
+        self.sent = 0
+        self.received = 0
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        self.elapsed = 0.0
+
+    def fail(self, op: str, error: str) -> None:
+        self.errors[op][error] = self.errors[op].get(error, 0) + 1
+
+    def merge(self, other: 'Stats') -> None:
+        for op in OPERATIONS:
+            self.latencies[op] += other.latencies[op]
+            for error, count in other.errors[op].items():
+                self.errors[op][error] = self.errors[op].get(error, 0) + count
+        self.sent += other.sent
+        self.received += other.received
+        self.sent_bytes += other.sent_bytes
+        self.received_bytes += other.received_bytes
+        self.elapsed = max(self.elapsed, other.elapsed)
+
+    # Counts, error rates and p50/p99/p999 latency in ms per operation.
+    def summary(self) -> dict:
+        operations = {}
+        for op in OPERATIONS:
+            ordered = sorted(self.latencies[op])
+            failed = sum(self.errors[op].values())
+            if not ordered and not failed:
+                continue
+            entry = {'ok': len(ordered), 'failed': failed, 'error_rate': failed / (len(ordered) + failed), 'errors': self.errors[op]}
+            for name, pct in (('p50', 50), ('p99', 99), ('p999', 99.9)):
+                entry[name] = ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1e3 if ordered else 0.0
+            operations[op] = entry
+        done = sum(entry['ok'] for entry in operations.values())
+        return {
+            'seconds': self.elapsed,
+            'ops_per_sec': done / self.elapsed if self.elapsed else 0.0,
+            'messages_sent': self.sent,
+            'messages_received': self.received,
+            'received_per_sec': self.received / self.elapsed if self.elapsed else 0.0,
+            'bytes_sent': self.sent_bytes,
+            'bytes_received': self.received_bytes,
+            'operations': operations,
+        }
+
+class Bot:
+    def __init__(self, swarm: 'Swarm', name: str):
+        self.swarm = swarm
+        self.stats = swarm.stats
+        self.name = name
+        self.reader = None
+        self.writer = None
+        self.receiver = None
+        self.game_id = 0
+        self.chats = 0
+        # The answer the running operation waits for: a message starting
+        # with these values, an ERROR, or () for the server hanging up.
+        self.expect = None
+        self.answer = None
+
+    async def connect(self) -> None:
+        start = time.perf_counter()
+        self.reader, self.writer = await asyncio.open_connection(self.swarm.host, self.swarm.port)
+        self.receiver = asyncio.create_task(self.receive())
+        await self.request(codec.encode(codec.USER, self.name))
+        self.stats.latencies['connect'].append(time.perf_counter() - start)
+
+    async def close(self) -> None:
+        if self.writer:
+            self.writer.close()
+            await self.receiver
+            self.writer = None
+
+    async def receive(self) -> None:
+        frames = protocol.FrameBuffer(settings.BUFFER_SIZE)
+        try:
+            while data := await self.reader.read(65536):
+                self.stats.received_bytes += len(data)
+                frames.feed(data)
+                for payload in frames:
+                    self.stats.received += 1
+                    self.on_message(codec.decode(payload))
+        except (OSError, protocol.ProtocolError):
+            pass
+        self.seat(0) #The server leaves a closed connection's table
+        self.writer = None
+        if self.answer and not self.answer.done():
+            self.answer.set_result(())
+
+    def on_message(self, message: tuple) -> None:
+        if self.answer is None or self.answer.done():
+            return
+        if message[0] == codec.ERROR or message[:len(self.expect)] == self.expect:
+            self.answer.set_result(message)
+
+    # Sends a message and, given what to expect, waits for the answer.
+    async def request(self, payload: bytes, expect: tuple | None = None) -> tuple | None:
+        if self.writer is None:
+            raise ConnectionResetError()
+        if expect is not None:
+            self.expect, self.answer = expect, asyncio.get_running_loop().create_future()
+        frame = protocol.encode_frame(payload)
+        self.writer.write(frame)
+        self.stats.sent += 1
+        self.stats.sent_bytes += len(frame)
+        await self.writer.drain()
+        if expect is None:
+            return None
+        try:
+            message = await asyncio.wait_for(self.answer, self.swarm.timeout)
+        finally:
+            self.answer = None
+        if message and message[0] == codec.ERROR:
+            raise BotError(f'error {message[1]}')
+        if message == () != expect:
+            raise ConnectionResetError()
+        return message
+
+    def seat(self, game_id: int) -> None:
+        tables = self.swarm.tables
+        if self.game_id in tables:
+            tables[self.game_id] -= 1
+            if not tables[self.game_id]:
+                del tables[self.game_id] #Reaped once the grace period runs out
+        if game_id:
+            tables[game_id] = tables.get(game_id, 0) + 1
+        self.game_id = game_id
+
+    # Joining anywhere, even a full table, first leaves the table the bot is at.
+    async def game_new(self) -> None:
+        self.seat(0)
+        _, game_id = await self.request(codec.encode(codec.GAME_NEW, 'holdem'), (codec.GAME_ID,))
+        self.seat(game_id)
+
+    async def game_join(self, target: int) -> None:
+        self.seat(0)
+        _, game_id = await self.request(codec.encode(codec.GAME_JOIN, target), (codec.GAME_ID,))
+        self.seat(game_id)
+
+    async def chat(self) -> None:
+        self.chats += 1
+        text = f'hello {self.chats}'
+        await self.request(codec.encode(codec.CHAT_SEND, self.game_id, text), (codec.CHAT_MSG, self.name, text))
+
+    async def leave(self) -> None:
+        await self.request(codec.encode(codec.GAME_LEAVE, self.game_id))
+        self.seat(0)
+
+    async def reconnect(self) -> None:
+        await self.close()
+        await self.connect()
+
+    async def malformed(self) -> None:
+        await self.request(UNKNOWN_OPCODE, ())
+        await self.receiver
+
+    # Runs one operation, or the one it needs first, and records it.
+    async def run(self, op: str) -> None:
+        if self.writer is None:
+            op = 'connect'
+        elif op in ('chat', 'leave', 'game_join') and not self.game_id:
+            op = 'game_join'
+        target = self.swarm.pick_table(self.game_id) if op == 'game_join' else 0
+        if op == 'game_join' and not target:
+            op = 'game_new'
+        start = time.perf_counter()
+        try:
+            await (self.game_join(target) if target else getattr(self, op)())
+        except BotError as e:
+            self.stats.fail(op, str(e))
+            return
+        except (asyncio.TimeoutError, TimeoutError):
+            self.stats.fail(op, 'timeout')
+            return
+        except OSError as e:
+            self.stats.fail(op, type(e).__name__)
+            return
+        if op not in ('connect', 'reconnect'):
+            self.stats.latencies[op].append(time.perf_counter() - start)
+
+    async def live(self, deadline: float) -> None:
+        rng, mix = self.swarm.rng, self.swarm.mix
+        await self.run('connect')
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(rng.expovariate(1 / self.swarm.think) if self.swarm.think else 0)
+            await self.run(rng.choices(list(mix), list(mix.values()))[0])
+        await self.close()
+
+class Swarm:
+    def __init__(self, host: str, port: int, mix: dict[str, int], think: float, timeout: float, seed: int):
+        self.host = host
+        self.port = port
+        self.mix = {op: weight for op, weight in mix.items() if weight}
+        self.think = think
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.stats = Stats()
+        self.tables: dict[int, int] = {} #Game id to the bots seated there
+
+    # A table with a free seat that some bot still sits at, so it has not
+    # been reaped, or 0 after a few misses.
+    def pick_table(self, current: int) -> int:
+        for _ in range(8):
+            game_id = self.rng.choice(list(self.tables)) if self.tables else 0
+            if game_id != current and self.tables.get(game_id, MAX_SEATS) < MAX_SEATS:
+                return game_id
+        return 0
+
+    # Starts the bots spread over ramp seconds, all stopping at the deadline.
+    # Rates are over the time up to the deadline; operations still running
+    # then (a timeout can take a while) are counted when they finish.
+    async def run(self, bots: int, duration: float, ramp: float, prefix: str) -> Stats:
+        async def launch(index: int) -> None:
+            await asyncio.sleep(ramp * index / bots)
+            await Bot(self, f'{prefix}{index}').live(deadline)
+        deadline = time.perf_counter() + ramp + duration
+        await asyncio.gather(*(launch(index) for index in range(bots)))
+        self.stats.elapsed = ramp + duration
+        return self.stats
+
+def run_process(host: str, port: int, mix: dict[str, int], think: float, timeout: float, seed: int,
+        bots: int, duration: float, ramp: float, prefix: str) -> Stats:
+    swarm = Swarm(host, port, mix, think, timeout, seed)
+    return asyncio.run(swarm.run(bots, duration, ramp, prefix))
+
+def run(host: str, port: int, bots: int, duration: float, processes: int = 1, mix: dict[str, int] = MIX,
+        think: float = 0.5, timeout: float = 5, ramp: float = 1, seed: int = 0) -> dict:
+    stats = Stats()
+    with ProcessPoolExecutor(processes) as pool:
+        jobs = [pool.submit(run_process, host, port, mix, think, timeout, seed + process,
+            bots // processes + (process < bots % processes), duration, ramp, f'bot{process}.') for process in range(processes)]
+        for job in jobs:
+            stats.merge(job.result())
+    return stats.summary()
+
+def parse_mix(text: str) -> dict[str, int]:
+    mix = dict(MIX)
+    for entry in filter(None, text.split(',')):
+        op, _, weight = entry.partition('=')
+        if op not in MIX:
+            raise argparse.ArgumentTypeError(f'Unknown operation {op!r}, expected one of {', '.join(MIX)}.')
+        mix[op] = int(weight)
+    return mix
+
+def print_summary(summary: dict) -> None:
+    print(f'{summary['ops_per_sec']:.0f} ops/s over {summary['seconds']:.1f}s, '
+        f'{summary['messages_sent']} messages sent, {summary['received_per_sec']:.0f} received/s')
+    print(f'  {'operation':>10}  {'ok':>8}  {'failed':>8}  {'errors':>7}  {'p50 ms':>8}  {'p99 ms':>8}  {'p999 ms':>8}')
+    for op, entry in summary['operations'].items():
+        print(f'  {op:>10}  {entry['ok']:>8}  {entry['failed']:>8}  {entry['error_rate']:>7.2%}  '
+            f'{entry['p50']:>8.2f}  {entry['p99']:>8.2f}  {entry['p999']:>8.2f}')
+    for op, entry in summary['operations'].items():
+        for error, count in entry['errors'].items():
+            print(f'  {op} {error}: {count}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulated players against a local server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=settings.PORT)
+    parser.add_argument('--bots', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=10, help='seconds after the ramp')
+    parser.add_argument('--ramp', type=float, default=2, help='seconds over which the bots connect')
+    parser.add_argument('--think', type=float, default=0.5, help='mean seconds between a bot\'s operations')
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--mix', type=parse_mix, default=MIX, help='weights, e.g. chat=50,malformed=1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    summary = run(args.host, args.port, args.bots, args.duration, args.processes, args.mix, args.think, args.timeout, args.ramp, args.seed)
+    if args.json:
+        print(json.dumps(summary, indent=1))
+    else:
+        print_summary(summary)
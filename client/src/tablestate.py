@@ -0,0 +1,104 @@
+import struct
+
+# What a client knows about a table, and the compact changes that move it
+# from one version to the next. The server diffs the state it last published
+# against the current one; the client applies the same changes in order. A
+# snapshot is just the changes from new_state(), so both use one encoding.
+# The client and server carry identical copies of this file, like codec.py.
+#
+# State:
+#   hand    hand number           button  button seat
+#   turn    seat to act           pot     chips in the middle
+#   board   card ints             seats   {seat: (balance, bet, flags)}
+# Hole cards are private and travel separately (codec.TABLE_HOLE).
+
+NO_SEAT = 255
+
+# Seat flags
+IN_HAND = 1
+SITTING_OUT = 2
+ALL_IN = 4
+
+# Change tags and their layouts; board cards follow BOARD as raw bytes.
+HAND = 1
+TURN = 2
+POT = 3
+BOARD = 4
+SEAT = 5
+LEAVE = 6
+
+HAND_LAYOUT = struct.Struct('!BIB')     #hand, button
+TURN_LAYOUT = struct.Struct('!BB')      #seat
+POT_LAYOUT = struct.Struct('!BI')       #total
+BOARD_LAYOUT = struct.Struct('!BBB')    #cards kept, cards added
+SEAT_LAYOUT = struct.Struct('!BBIIB')   #seat, balance, bet, flags
+LEAVE_LAYOUT = struct.Struct('!BB')     #seat
+
+LAYOUTS = {
+    HAND: HAND_LAYOUT,
+    TURN: TURN_LAYOUT,
+    POT: POT_LAYOUT,
+    BOARD: BOARD_LAYOUT,
+    SEAT: SEAT_LAYOUT,
+    LEAVE: LEAVE_LAYOUT,
+}
+
+RANKS = '23456789TJQKA'
+SUITS = 'schd'  #Same order as poker.cards.Card
+
+def new_state() -> dict:
+    return {'hand': 0, 'button': NO_SEAT, 'turn': NO_SEAT, 'pot': 0, 'board': (), 'seats': {}}
+
+def diff(old: dict, new: dict) -> bytes:
+    parts = []
+    if new['hand'] != old['hand'] or new['button'] != old['button']:
+        parts.append(HAND_LAYOUT.pack(HAND, new['hand'], new['button']))
+    if new['turn'] != old['turn']:
+        parts.append(TURN_LAYOUT.pack(TURN, new['turn']))
+    if new['pot'] != old['pot']:
+        parts.append(POT_LAYOUT.pack(POT, new['pot']))
+
+    board, old_board = new['board'], old['board']
+    if board != old_board:
+        # Streets only add cards, so usually just the new ones go out.
+        kept = len(old_board) if board[:len(old_board)] == old_board else 0
+        parts.append(BOARD_LAYOUT.pack(BOARD, kept, len(board) - kept) + bytes(board[kept:]))
+
+    seats, old_seats = new['seats'], old['seats']
+    for seat, values in seats.items():
+        if old_seats.get(seat) != values:
+            parts.append(SEAT_LAYOUT.pack(SEAT, seat, *values))
+    for seat in old_seats:
+        if seat not in seats:
+            parts.append(LEAVE_LAYOUT.pack(LEAVE, seat))
+    return b''.join(parts)
+
+def apply(state: dict, changes: bytes) -> None:
+    offset = 0
+    while offset < len(changes):
+        tag = changes[offset]
+        layout = LAYOUTS.get(tag)
+        if layout is None:
+            raise ValueError(f'Unknown table change {tag}.')
+        values = layout.unpack_from(changes, offset)
+        offset += layout.size
+        if tag == HAND:
+            state['hand'], state['button'] = values[1:]
+        elif tag == TURN:
+            state['turn'] = values[1]
+        elif tag == POT:
+            state['pot'] = values[1]
+        elif tag == BOARD:
+            kept, added = values[1:]
+            state['board'] = state['board'][:kept] + tuple(changes[offset:offset + added])
+            offset += added
+        elif tag == SEAT:
+            state['seats'][values[1]] = values[2:]
+        elif tag == LEAVE:
+            state['seats'].pop(values[1], None)
+
+def snapshot(state: dict) -> bytes:
+    return diff(new_state(), state)
+
+def card_name(card: int) -> str:
+    return RANKS[card >> 2] + SUITS[card & 3]
@@ -0,0 +1,140 @@
+import common
+import argparse
+import codec
+import communication
+import legacy
+import outbound
+from poker import logic
+import protocol
+import routing
+import selectors
+import socket
+import threading
+import time
+
+# Measures chat fan-out to a room of seated players plus spectators over
+# real socket pairs. 'send' is how long the sender is held up, 'deliver' is
+# until the last member has the whole frame. A drain thread reads every
+# member's far end, except a stalled member that never reads.
+
+GAME_ID = 1
+
+class Drain:
+    def __init__(self, socks: list[socket.socket]):
+        self.selector = selectors.DefaultSelector()
+        for sock in socks:
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ)
+        self.received = 0
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while not self.stopped:
+            for key, _ in self.selector.select(0.1):
+                try:
+                    count = len(key.fileobj.recv(65536))
+                except BlockingIOError:
+                    continue
+                with self.condition:
+                    self.received += count
+                    self.condition.notify_all()
+
+    def wait_for(self, total: int) -> None:
+        with self.condition:
+            self.condition.wait_for(lambda: self.received >= total, timeout=10)
+
+    def stop(self) -> None:
+        self.stopped = True
+        self.thread.join()
+        self.selector.close()
+
+def teardown(drain: Drain, keep: list) -> None:
+    drain.stop()
+    for client in communication.clients.values():
+        client['connection'].close()
+    for _, far in keep:
+        far.close()
+
+def setup(players: int, spectators: int, queued: bool, stalled: bool) -> tuple[list[str], Drain, list]:
+    communication.clients.clear()
+    communication.rooms.clear()
+    routing.routers.clear()
+    logic.create_game('holdem', GAME_ID)
+    router = routing.get_router(GAME_ID)
+
+    addrs, far_ends, keep = [], [], []
+    for index in range(players + spectators):
+        addr = f'client{index}'
+        near, far = socket.socketpair()
+        # A bounded legacy send to a stalled member fails instead of hanging.
+        near.settimeout(None if queued else 0.5)
+        conn = outbound.QueuedConnection(near) if queued else near
+        communication.clients[addr] = {'username': addr, 'connection': conn, 'game': None}
+        if index < players:
+            router.send_msg_to_game(f'player:add:{addr}')
+        communication.join_room(addr, GAME_ID)
+        addrs.append(addr)
+        keep.append((near, far))
+        if not (stalled and index == 1):
+            far_ends.append(far)
+    return addrs, Drain(far_ends), keep
+
+def run(players: int, spectators: int, queued: bool, rounds: int) -> tuple[list[float], list[float]]:
+    addrs, drain, keep = setup(players, spectators, queued, False)
+    router = routing.get_router(GAME_ID)
+    message = 'x' * 64
+    if queued:
+        payload = codec.encode(codec.CHAT_MSG, addrs[0], message)
+    else:
+        payload = f'chat:msg:{addrs[0]}: {message}'.encode('utf-8')
+    frame = len(protocol.encode_frame(payload))
+    sends, delivers = [], []
+    for round_no in range(rounds):
+        start = time.perf_counter()
+        if queued:
+            communication.distribute_chat_message(addrs[0], GAME_ID, message)
+        else:
+            try:
+                legacy.legacy_distribute_chat_message(communication.clients, router, addrs[0], message, addrs[players:])
+            except OSError:
+                pass
+        sends.append(time.perf_counter() - start)
+        drain.wait_for(frame * len(addrs) * (round_no + 1))
+        delivers.append(time.perf_counter() - start)
+    teardown(drain, keep)
+    return sends, delivers
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = [('room', 'path', 'send p50 us', 'send p99 us', 'deliver p50 us', 'deliver p99 us')]
+    for label, players, spectators in (('8 players', 8, 0), ('8 + 1000 watch', 8, 1000)):
+        for name, queued in (('legacy', False), ('rooms', True)):
+            sends, delivers = run(players, spectators, queued, args.rounds)
+            rows.append((label, name, *(f'{common.percentile(s, p) * 1e6:.0f}' for s in (sends, delivers) for p in (50, 99))))
+    common.report(f'Chat broadcast latency, {args.rounds} lines', rows)
+
+    # One member stops reading; 1 KB lines fill its socket buffer.
+    rows = [('path', 'send p50 us', 'send max us')]
+    for name, queued in (('legacy', False), ('rooms', True)):
+        addrs, drain, keep = setup(8, 0, queued, stalled=True)
+        router = routing.get_router(GAME_ID)
+        sends = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            if queued:
+                communication.distribute_chat_message(addrs[0], GAME_ID, 'x' * 1024)
+            else:
+                try:
+                    legacy.legacy_distribute_chat_message(communication.clients, router, addrs[0], 'x' * 1024)
+                except OSError:
+                    pass
+            sends.append(time.perf_counter() - start)
+        rows.append((name, f'{common.percentile(sends, 50) * 1e6:.0f}', f'{max(sends) * 1e6:.0f}'))
+        teardown(drain, keep)
+    common.report('8 players, one stalled reader', rows)
@@ -0,0 +1,137 @@
+import common
+import argparse
+from bench_engine import pick_action
+import checkpoint
+import json
+from poker import logic
+import poker.objects as poker
+import os
+import random
+import routing
+import settings
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+# Times checkpoint.save per table at hand boundaries, writing only what
+# changed and (for comparison) rewriting whole copies, then has a child
+# process play hands with checkpoints on and SIGKILL itself. The tables
+# restored from its file must match what it last reported, and a copy torn
+# mid-write must fall back to the copy before it.
+
+def open_tables(tables: int) -> list:
+    routing.routers.clear()
+    poker.games.clear()
+    engines = []
+    for game_id in range(1, tables + 1):
+        logic.create_game('holdem', game_id)
+        router = routing.get_router(game_id)
+        for seat in range(6):
+            router.send_msg_to_game(f'player:add:bot{game_id}.{seat}|bot{game_id}.{seat}')
+        engines.append(poker.games[game_id].engine)
+    return engines
+
+# Plays one hand at every table; finish_hand saves the checkpoint.
+def play_round(engines: list, rng: random.Random) -> None:
+    for engine in engines:
+        with engine.lock:
+            for player in engine.game.players:
+                if player.balance == 0:
+                    player.balance, player.sit_out = engine.game.buy_in, False
+            hand_no = engine.hand_no
+            engine.start_hand()
+            while engine.hand_no == hand_no or engine.state != logic.WAITING:
+                engine.act(engine.in_hand[engine.turn].addr, *pick_action(engine, rng))
+
+def table_state(game) -> dict:
+    return {
+        'hand': game.engine.hand_no,
+        'button': game.button,
+        'players': [[p.seat, p.balance, p.name] for p in game.players],
+    }
+
+def child(path: str, tables: int, rounds: int) -> None:
+    checkpoint.start(path)
+    engines = open_tables(tables)
+    rng = random.Random(2)
+    for _ in range(rounds):
+        play_round(engines, rng)
+    print(json.dumps({engine.game.id: table_state(engine.game) for engine in engines}), flush=True)
+    os.kill(os.getpid(), signal.SIGKILL)
+
+# Saves each table after a hand and again after one player sits out, the
+# two kinds of change the server checkpoints.
+def time_saves(engines: list, rounds: int, full: bool) -> tuple[list[float], int]:
+    rng = random.Random(1)
+    checkpoints = checkpoint.checkpoints
+    samples = []
+    before = checkpoints.bytes_written
+    for _ in range(rounds):
+        play_round(engines, rng)
+        for engine in engines:
+            game = engine.game
+            game.players[0].sit_out = not game.players[0].sit_out
+            if full:
+                checkpoints.written[game.id] = [[], [], None]
+            start = time.perf_counter()
+            checkpoint.save(game)
+            samples.append(time.perf_counter() - start)
+    return samples, checkpoints.bytes_written - before
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    settings.HAND_START_DELAY = 3600 #Hands are started by play_round()
+    settings.ACTION_TIMEOUT = 3600
+    if args.child:
+        child(args.child, args.tables, args.rounds)
+
+    rows = [('writes', 'save p50 us', 'save p99 us', 'max us', 'bytes/hand')]
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint.start(os.path.join(directory, 'tables.ckpt'))
+        engines = open_tables(args.tables)
+        for label, full in (('changed only', False), ('whole copy', True)):
+            samples, written = time_saves(engines, args.rounds, full)
+            rows.append((label, f'{common.percentile(samples, 50) * 1e6:.1f}',
+                f'{common.percentile(samples, 99) * 1e6:.1f}', f'{max(samples) * 1e6:.0f}', f'{written / len(samples):.0f}'))
+        checkpoint.stop()
+    common.report(f'{args.tables} six-handed tables, {args.rounds} hands each', rows)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tables.ckpt')
+        result = subprocess.run(
+            [sys.executable, __file__, '--child', path, '--tables', str(args.tables), '--rounds', '5'],
+            capture_output=True, text=True,
+        )
+        assert result.returncode == -signal.SIGKILL, result.stderr
+        expected = {int(game_id): state for game_id, state in json.loads(result.stdout).items()}
+
+        routing.routers.clear()
+        poker.games.clear()
+        start = time.perf_counter()
+        game_ids = logic.restore_games(checkpoint.start(path))
+        restored = time.perf_counter() - start
+        assert sorted(game_ids) == sorted(expected), 'tables missing after restore'
+        for game_id in game_ids:
+            assert table_state(poker.games[game_id]) == expected[game_id], f'table {game_id} differs'
+        checkpoints = checkpoint.checkpoints
+
+        # Tear the newest copy of table 1: the one before it must come back.
+        slot = checkpoints.slots[1]
+        start_at = slot * checkpoint.SLOT_SIZE + checkpoints.latest[slot] * checkpoint.COPY_SIZE
+        checkpoints.map[start_at + checkpoint.PLAYERS_AT] ^= 0xFF
+        checkpoint.stop()
+        tables = {table['game_id']: table for table in checkpoint.start(path)}
+        assert tables[1]['hand'] == expected[1]['hand'] - 1, 'torn copy was not skipped'
+        checkpoint.stop()
+
+    common.report('crash recovery', [
+        ('tables', 'restore ms', 'matches'),
+        (args.tables, f'{restored * 1e3:.0f}', 'yes'),
+    ])
@@ -0,0 +1,87 @@
+import common
+import argparse
+import codec
+import random
+
+# Client-to-server messages encoded and then decoded and dispatched, once
+# the old way (an 'attn:cmd:data' string, split and matched, fields parsed
+# from text) and once with codec.py (opcode table, struct-packed fields).
+
+def make_messages(count: int) -> list[tuple]:
+    rng = random.Random(0)
+    messages = []
+    for i in range(count):
+        game_id = rng.randint(10000, 99999)
+        match i % 4:
+            case 0: messages.append((codec.CHAT_SEND, game_id, f'hello from seat {i % 8}'))
+            case 1: messages.append((codec.GAME_ACT, game_id, rng.randrange(5), rng.randrange(0, 5000, 10)))
+            case 2: messages.append((codec.GAME_JOIN, game_id))
+            case 3: messages.append((codec.USER, f'player{i % 1000}'))
+    return messages
+
+def string_encode(messages: list[tuple]) -> list[bytes]:
+    out = []
+    for message in messages:
+        match message:
+            case (codec.CHAT_SEND, game_id, text): out.append(f'game:msg:{game_id}:{text}'.encode('utf-8'))
+            case (codec.GAME_ACT, game_id, action, amount): out.append(f'game:act:{game_id}:{codec.ACTIONS[action]}:{amount}'.encode('utf-8'))
+            case (codec.GAME_JOIN, game_id): out.append(f'game:join:{game_id}'.encode('utf-8'))
+            case (codec.USER, name): out.append(f'main:user:{name}'.encode('utf-8'))
+    return out
+
+def string_dispatch(payloads: list[bytes]) -> int:
+    counts = [0]
+    def handle(*fields) -> None:
+        counts[0] += 1
+    for payload in payloads:
+        attn, cmd, data = payload.decode('utf-8').split(':', 2)
+        match attn:
+            case 'main':
+                if cmd == 'user': handle(data)
+            case 'game':
+                match cmd:
+                    case 'msg':
+                        game_id, text = data.split(':', 1)
+                        handle(int(game_id), text)
+                    case 'join':
+                        handle(int(data))
+                    case 'act':
+                        game_id, action, amount = data.split(':', 2)
+                        handle(int(game_id), codec.ACTION_CODES[action], int(amount))
+    return counts[0]
+
+def codec_encode(messages: list[tuple]) -> list[bytes]:
+    encode = codec.encode
+    return [encode(*message) for message in messages]
+
+def codec_dispatch(payloads: list[bytes]) -> int:
+    counts = [0]
+    def handle(*fields) -> None:
+        counts[0] += 1
+    handlers = codec.table({opcode: handle for opcode in codec.SCHEMA})
+    decode = codec.decode
+    for payload in payloads:
+        message = decode(payload)
+        handlers[message[0]](*message[1:])
+    return counts[0]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=200000)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    payloads = codec_encode(messages)
+    assert [codec.decode(payload) for payload in payloads] == messages, 'codec round trip'
+    assert string_dispatch(string_encode(messages)) == codec_dispatch(payloads) == len(messages)
+
+    rows = [('path', 'encode msg/s', 'decode msg/s', 'bytes/msg')]
+    for name, encode, dispatch in (('split strings', string_encode, string_dispatch), ('codec', codec_encode, codec_dispatch)):
+        encoded = encode(messages)
+        rows.append((
+            name,
+            f'{len(messages) / common.timeit(encode, messages):.0f}',
+            f'{len(messages) / common.timeit(dispatch, encoded):.0f}',
+            f'{sum(map(len, encoded)) / len(encoded):.1f}',
+        ))
+    common.report(f'{args.messages} mixed chat/act/join/user messages', rows)
@@ -0,0 +1,55 @@
+import common
+import argparse
+import legacy
+from poker import logic
+from poker.cards import Deck
+import sys
+import time
+import tracemalloc
+
+# One deal is a six-handed hold'em hand: 12 hole cards and a 5 card board.
+PLAYERS = 6
+
+def legacy_deals(count: int) -> None:
+    for _ in range(count):
+        deck = legacy.legacy_deck()
+        for _ in range(PLAYERS):
+            legacy.legacy_take_hand(deck, 2)
+        legacy.legacy_take_hand(deck, 5)
+
+def deck_deals(count: int) -> None:
+    deck = Deck()
+    for _ in range(count):
+        for _ in range(PLAYERS):
+            logic.take_hand(deck, 2)
+        logic.take_hand(deck, 5)
+        deck.reset()
+
+def deck_bytes(deck) -> int:
+    if isinstance(deck, Deck):
+        return sys.getsizeof(deck) + sys.getsizeof(deck.cards)
+    return sys.getsizeof(deck) + sum(sys.getsizeof(card) for card in deck)
+
+def measure(func, count: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    func(count)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(min(count, 10000))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--deals', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rows = [('deck', 's per 1M', 'ns/card', 'deck bytes', 'peak bytes')]
+    for name, func, deck in (('list.pop', legacy_deals, legacy.legacy_deck()), ('Deck', deck_deals, Deck())):
+        elapsed, peak = measure(func, args.deals)
+        per_million = elapsed * 1e6 / args.deals
+        per_card = elapsed / (args.deals * (PLAYERS * 2 + 5)) * 1e9
+        rows.append((name, f'{per_million:.2f}', f'{per_card:.0f}', deck_bytes(deck), peak))
+    common.report(f'{args.deals} deals of {PLAYERS} hands and a board', rows)
@@ -0,0 +1,66 @@
+import common
+import argparse
+from poker import logic
+import poker.objects as poker
+import random
+import routing
+import settings
+import threading
+import time
+
+# Advances many tables from a single driver thread: every table's engine is
+# poked with one legal action per pass, and hand starts run on the shared
+# scheduler thread.
+
+def pick_action(engine: logic.HoldemEngine, rng: random.Random) -> tuple[str, int]:
+    player = engine.in_hand[engine.turn]
+    to_call = engine.last_bet - player.cur_bet
+    roll = rng.random()
+    if roll < 0.1:
+        return 'fold', 0
+    if roll < 0.25:
+        action = 'raise' if engine.last_bet else 'bet'
+        return action, engine.last_bet + engine.min_raise
+    return ('call', 0) if to_call else ('check', 0)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=2000)
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    settings.HAND_START_DELAY = 0
+    settings.ACTION_TIMEOUT = 3600
+    rng = random.Random(0)
+    events = [0]
+    def count_event(message: str) -> None:
+        events[0] += 1
+
+    engines = []
+    for game_id in range(args.tables):
+        logic.create_game('holdem', game_id)
+        router = routing.get_router(game_id)
+        router.register_server_handler(count_event)
+        for seat in range(args.players):
+            router.send_msg_to_game(f'player:add:bot{game_id}.{seat}')
+        engines.append(poker.games[game_id].engine)
+
+    start = time.perf_counter()
+    first_hand = sum(engine.hand_no for engine in engines)
+    actions = 0
+    while time.perf_counter() - start < args.duration:
+        for engine in engines:
+            with engine.lock:
+                if engine.state not in logic.BETTING:
+                    continue
+                action, amount = pick_action(engine, rng)
+                engine.act(engine.in_hand[engine.turn].addr, action, amount)
+                actions += 1
+    elapsed = time.perf_counter() - start
+    hands = sum(engine.hand_no for engine in engines) - first_hand
+
+    common.report(f'{args.tables} tables x {args.players} players, one driver thread', [
+        ('hands/s', 'actions/s', 'events/s', 'threads'),
+        (f'{hands / elapsed:.0f}', f'{actions / elapsed:.0f}', f'{events[0] / elapsed:.0f}', threading.active_count()),
+    ])
@@ -0,0 +1,43 @@
+import common
+import argparse
+import os
+from poker import equity
+import random
+import time
+
+def deal(players: int, board: int, seed: int) -> tuple[list[list[int]], list[int]]:
+    cards = random.Random(seed).sample(range(52), players * 2 + board)
+    holes = [cards[i * 2:i * 2 + 2] for i in range(players)]
+    return holes, cards[players * 2:]
+
+def time_call(repeat: int, *args, **kwargs) -> tuple[float, equity.Equity]:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = equity.equity(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--trials', type=int, default=200000)
+    parser.add_argument('--target-ci', type=float, default=0.005)
+    args = parser.parse_args()
+
+    rows = [('players', 'runouts', 'ms', 'equities')]
+    for players in range(2, 7):
+        holes, board = deal(players, 3, players)
+        elapsed, result = time_call(5, holes, board, workers=args.workers)
+        rows.append((players, result.trials, f'{elapsed * 1e3:.1f}', ' '.join(f'{e:.3f}' for e in result.equities)))
+    common.report('Flop all-in, exhaustive', rows)
+
+    holes, board = deal(3, 0, 0)
+    rows = [('workers', 'target ci', 'trials', 'ms', 'margin')]
+    for workers in sorted({1, args.workers}):
+        for target in (None, args.target_ci):
+            equity.equity(holes, workers=workers, trials=workers * equity.BATCH_SIZE)
+            elapsed, result = time_call(1, holes, trials=args.trials, target_ci=target, workers=workers)
+            rows.append((workers, target or '-', result.trials, f'{elapsed * 1e3:.0f}', f'{result.margin:.4f}'))
+    common.report('Preflop 3-way, sampled', rows)
+    equity.shutdown()
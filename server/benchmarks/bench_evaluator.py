@@ -0,0 +1,101 @@
+import common
+import argparse
+from collections import Counter
+from itertools import combinations
+from poker import evaluator
+from legacy import LegacyPlayer
+import random
+import time
+
+# The original find_rank scored hand types with its own codes; both
+# evaluators must agree on the type of every hand.
+LEGACY_CATEGORIES = {
+    0: evaluator.HIGH_CARD,
+    3: evaluator.PAIR,
+    6: evaluator.TWO_PAIR,
+    7: evaluator.THREE_OF_A_KIND,
+    8: evaluator.STRAIGHT,
+    9: evaluator.FLUSH,
+    10: evaluator.FULL_HOUSE,
+    12: evaluator.FOUR_OF_A_KIND,
+    17: evaluator.STRAIGHT_FLUSH,
+    18: evaluator.STRAIGHT_FLUSH,
+}
+
+FIVE_CARD_COUNTS = {
+    evaluator.HIGH_CARD: 1302540,
+    evaluator.PAIR: 1098240,
+    evaluator.TWO_PAIR: 123552,
+    evaluator.THREE_OF_A_KIND: 54912,
+    evaluator.STRAIGHT: 10200,
+    evaluator.FLUSH: 5108,
+    evaluator.FULL_HOUSE: 3744,
+    evaluator.FOUR_OF_A_KIND: 624,
+    evaluator.STRAIGHT_FLUSH: 40,
+}
+
+def legacy_category(player: LegacyPlayer, hand: list[int]) -> int:
+    player.find_rank([list(evaluator.card_to_tuple(card)) for card in hand])
+    return LEGACY_CATEGORIES[player.rank[0]]
+
+def check(samples: int) -> None:
+    player = LegacyPlayer()
+    counts = Counter()
+    strengths = set()
+    mismatches = 0
+    for hand in combinations(range(52), 5):
+        strength = evaluator.evaluate(hand)
+        counts[evaluator.category(strength)] += 1
+        strengths.add(strength)
+        if legacy_category(player, hand) != evaluator.category(strength):
+            mismatches += 1
+    assert counts == FIVE_CARD_COUNTS, counts
+    assert len(strengths) == 7462, len(strengths)
+    assert mismatches == 0, f'{mismatches} 5 card hands disagree with find_rank'
+    print('5 cards: all 2598960 hands agree with find_rank')
+
+    rng = random.Random(0)
+    mismatches = 0
+    for _ in range(samples):
+        hand = rng.sample(range(52), 7)
+        if legacy_category(player, hand) != evaluator.category(evaluator.evaluate(hand)):
+            mismatches += 1
+    assert mismatches == 0, f'{mismatches} 7 card hands disagree with find_rank'
+    print(f'7 cards: {samples} random hands agree with find_rank')
+
+def bench(count: int) -> None:
+    rng = random.Random(0)
+    hands = [rng.sample(range(52), 7) for _ in range(count)]
+    legacy_hands = [[evaluator.card_to_tuple(card) for card in hand] for hand in hands]
+    player = LegacyPlayer()
+
+    def run_legacy() -> None:
+        for hand in legacy_hands[:count // 20]:
+            player.find_rank([list(card) for card in hand])
+
+    def run_evaluator() -> None:
+        evaluate = evaluator.evaluate
+        for hand in hands:
+            evaluate(hand)
+
+    legacy = common.timeit(run_legacy, repeat=3) / (count // 20)
+    fast = common.timeit(run_evaluator, repeat=3) / count
+    common.report('7 card hands', [
+        ('evaluator', 'hands/s', 'us/hand'),
+        ('legacy find_rank', f'{1 / legacy:.0f}', f'{legacy * 1e6:.2f}'),
+        ('evaluate', f'{1 / fast:.0f}', f'{fast * 1e6:.2f}'),
+    ])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hands', type=int, default=200000)
+    parser.add_argument('--check', action='store_true', help='compare against find_rank over every 5 card hand')
+    parser.add_argument('--samples', type=int, default=200000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    evaluator.build_rank_table()
+    print(f'Rank table build: {time.perf_counter() - start:.2f}s\n')
+    bench(args.hands)
+    if args.check:
+        check(args.samples)
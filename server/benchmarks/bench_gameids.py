@@ -0,0 +1,90 @@
+import common
+import argparse
+import communication
+import gameids
+import legacy
+import poker.objects as poker
+import routing
+import scheduler
+import settings
+import threading
+import time
+
+# Creates tables through communication.create_new_game from several threads
+# at once and checks every id is unique, then compares the cost per table
+# near the end of the run with the old random-and-scan allocation. The
+# tables are never joined, so their reap timers are pushed past the run and
+# cancelled before the routers go away.
+
+def create_tables(count: int, threads: int) -> tuple[float, list[int]]:
+    ids = []
+    ids_lock = threading.Lock()
+    def worker(share: int) -> None:
+        mine = [communication.create_new_game('holdem') for _ in range(share)]
+        with ids_lock:
+            ids.extend(mine)
+
+    workers = [threading.Thread(target=worker, args=(count // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, ids
+
+def clear_tables() -> None:
+    for game in poker.games.values():
+        scheduler.cancel(game.reap_timer)
+        game.reap_timer = None
+    poker.games.clear()
+    routing.routers.clear()
+
+def open_table(game_id: int) -> None:
+    router = routing.new_router(game_id)
+    router.register_game_handler(lambda message: game_id)
+
+def tail_cost(new_id, count: int, last: int) -> float:
+    routing.routers.clear()
+    for _ in range(count - last):
+        open_table(new_id())
+    start = time.perf_counter()
+    for _ in range(last):
+        open_table(new_id())
+    return (time.perf_counter() - start) / last
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=50000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--legacy-tables', type=int, default=5000)
+    args = parser.parse_args()
+
+    settings.TABLE_GRACE_PERIOD = 3600
+    elapsed, ids = create_tables(args.tables, args.threads)
+    assert None not in ids and len(set(ids)) == len(ids) == len(routing.routers), 'duplicate game id'
+    common.report(f'{len(ids)} tables from {args.threads} threads', [
+        ('s', 'us/table', 'unique'),
+        (f'{elapsed:.2f}', f'{elapsed / len(ids) * 1e6:.1f}', 'yes'),
+    ])
+
+    # Fill the id space to the last free id and past it.
+    clear_tables()
+    gameids.free = gameids.array('I')
+    gameids.filled = False
+    space = gameids.LAST_ID - gameids.FIRST_ID + 1
+    for _ in range(space):
+        routing.new_router(gameids.allocate())
+    assert len(routing.routers) == space and gameids.allocate() is None
+    routing.close_router(next(iter(routing.routers)))
+    assert gameids.allocate() is not None
+    print(f'Saturation: all {space} ids allocated, next allocate() is None, a closed id is reused\n')
+
+    # Id selection alone, cost of the last 500 ids with N tables open.
+    last = 500
+    gameids.free = gameids.array('I')
+    gameids.filled = False
+    common.report(f'Cost of the last {last} ids with N tables open', [
+        ('tables', 'legacy us/id', 'free-list us/id'),
+        (args.legacy_tables, f'{tail_cost(legacy.legacy_new_game_id, args.legacy_tables, last) * 1e6:.1f}',
+            f'{tail_cost(gameids.allocate, args.legacy_tables, last) * 1e6:.2f}'),
+    ])
@@ -0,0 +1,121 @@
+import common
+import argparse
+from bench_engine import pick_action
+import history
+from poker import logic
+import poker.objects as poker
+import random
+import routing
+import settings
+import tempfile
+import time
+
+# Plays hands with the hand history off and on to show what recording costs
+# the game thread, checks the logged hands, then pushes --hands synthetic
+# hands (the played ones under new ids) through the writer and reads them
+# all back: a full mmap replay and random lookups through the index.
+
+def play(tables: int, hands: int) -> float:
+    routing.routers.clear()
+    poker.games.clear()
+    engines = []
+    for game_id in range(1, tables + 1):
+        logic.create_game('holdem', game_id)
+        router = routing.get_router(game_id)
+        for seat in range(6):
+            router.send_msg_to_game(f'player:add:bot{game_id}.{seat}')
+        engines.append(poker.games[game_id].engine)
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    while sum(engine.hand_no for engine in engines) < hands:
+        for engine in engines:
+            with engine.lock:
+                if engine.state == logic.WAITING:
+                    for player in engine.game.players:
+                        if player.balance == 0:
+                            player.balance, player.sit_out = engine.game.buy_in, False
+                    engine.start_hand()
+                elif engine.state in logic.BETTING:
+                    engine.act(engine.in_hand[engine.turn].addr, *pick_action(engine, rng))
+    return time.perf_counter() - start
+
+def check_hands(hands: list[dict]) -> None:
+    for hand in hands:
+        before = sum(seat[1] for seat in hand['seats'])
+        after = sum(seat[2] for seat in hand['seats'])
+        assert before == after, f'chips not conserved in {hand['game_id']}/{hand['hand']}'
+        assert len(hand['board']) <= 5 and hand['actions'], 'bad hand record'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--played', type=int, default=5000)
+    parser.add_argument('--hands', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    settings.HAND_START_DELAY = 3600 #Hands are started by play()
+    settings.ACTION_TIMEOUT = 3600
+
+    with tempfile.TemporaryDirectory() as directory:
+        off = play(16, args.played)
+        history.start(directory)
+        on = play(16, args.played)
+        history.writer.flush()
+        history.stop()
+
+        played = [hand for path in history.list_logs(directory) for hand in history.HandLog(path)]
+        check_hands(played)
+        common.report(f'{args.played} six-handed hands on 16 tables', [
+            ('history', 'hands/s'),
+            ('off', f'{args.played / off:.0f}'),
+            ('on', f'{args.played / on:.0f}'),
+        ])
+
+    with tempfile.TemporaryDirectory() as directory:
+        rng = random.Random(1)
+        records = []
+        for i in range(args.hands):
+            hand = played[i % len(played)]
+            seats = [(seat, before, after, hole) for seat, before, after, hole in hand['seats']]
+            records.append((i // 1000 + 1, i % 1000 + 1, hand['button'], hand['board'], seats, hand['actions']))
+
+        history.start(directory)
+        start = time.perf_counter()
+        for record in records:
+            history.record(*record)
+        queued = time.perf_counter() - start
+        history.writer.flush()
+        written = time.perf_counter() - start
+        history.stop()
+
+        paths = history.list_logs(directory)
+        logs = [history.HandLog(path) for path in paths]
+        size = sum(len(log.data) for log in logs)
+        start = time.perf_counter()
+        count = sum(1 for log in logs for _ in log)
+        replayed = time.perf_counter() - start
+        assert count == args.hands, f'replayed {count} of {args.hands} hands'
+
+        start = time.perf_counter()
+        for log in logs:
+            log.offsets = log.load_index()
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            i = rng.randrange(args.hands)
+            game_id, hand_no = i // 1000 + 1, i % 1000 + 1
+            hand, = (h for log in logs for h in log.hands(game_id, hand_no))
+            assert hand['actions'] == records[i][5]
+        looked_up = time.perf_counter() - start
+        for log in logs:
+            log.close()
+
+        common.report(f'{args.hands} hands, {len(paths)} files of up to {settings.HISTORY_MAX_BYTES >> 20} MB, {size / args.hands:.0f} B/hand', [
+            ('step', 'seconds', 'hands/s'),
+            ('record() calls', f'{queued:.2f}', f'{args.hands / queued:.0f}'),
+            ('written + fsync', f'{written:.2f}', f'{args.hands / written:.0f}'),
+            ('full replay', f'{replayed:.2f}', f'{args.hands / replayed:.0f}'),
+            ('load indexes', f'{indexed:.2f}', ''),
+            (f'{args.lookups} lookups', f'{looked_up:.2f}', f'{args.lookups / looked_up:.0f}'),
+        ])
@@ -0,0 +1,64 @@
+import common
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(common.SRC_DIR, '..', '..', 'client', 'src'))
+import loadgen
+
+# Runs the client's load generator against a fresh local server in each
+# mode, stepping up the number of bots, to find where latency and errors
+# start to climb. Each step gets its own server so tables left by the
+# previous step do not count against it.
+
+# Thousands of bot connections leave ports in TIME_WAIT, so each server
+# gets a port the system has just handed out as free.
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def start_server(mode: str, port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, 'server.py', '--mode', mode, '--host', '127.0.0.1', '--port', str(port),
+            '--stats-port', '0', '--history', '', '--checkpoint', '', '--log-off', 'error,connection'],
+        cwd=common.SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f'{mode} server did not start on port {port}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', nargs='+', default=['thread', 'async'])
+    parser.add_argument('--bots', type=int, nargs='+', default=[500, 1000, 2000])
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--think', type=float, default=0.5)
+    args = parser.parse_args()
+
+    rows = [('mode', 'bots', 'ops/s', 'errors', 'chat p50 ms', 'chat p99 ms', 'chat p999 ms')]
+    for mode in args.modes:
+        for bots in args.bots:
+            port = free_port()
+            server = start_server(mode, port)
+            try:
+                summary = loadgen.run('127.0.0.1', port, bots, args.duration, args.processes, think=args.think)
+            finally:
+                server.kill()
+                server.wait()
+            operations = summary['operations']
+            failed = sum(entry['failed'] for entry in operations.values())
+            total = failed + sum(entry['ok'] for entry in operations.values())
+            chat = operations.get('chat', {'p50': 0, 'p99': 0, 'p999': 0})
+            rows.append((mode, bots, f'{summary['ops_per_sec']:.0f}', f'{failed / total:.2%}',
+                f'{chat['p50']:.1f}', f'{chat['p99']:.1f}', f'{chat['p999']:.1f}'))
+    common.report(f'Load generator, {args.think}s mean think time, {args.duration}s per step', rows)
@@ -0,0 +1,95 @@
+import common
+import argparse
+import log
+import os
+import settings
+import sys
+import threading
+import time
+
+# What one log line costs the thread that logs it: print() as the server
+# used to, against the log module with a category on, sampled, rate
+# limited and off. First into /dev/null, then into a pipe read at
+# --pipe-rate bytes a second, like a slow terminal, where print() holds the
+# caller up until the reader catches up and the log queue drops instead.
+
+class SlowReader:
+    def __init__(self, fd: int, rate: int):
+        self.fd = fd
+        self.rate = rate
+        self.read = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        chunk = max(1, self.rate // 100)
+        while True:
+            data = os.read(self.fd, chunk)
+            if not data:
+                return
+            self.read += len(data)
+            time.sleep(0.01)
+
+def call_times(write, count: int) -> list[float]:
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        write(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def print_line(i: int) -> None:
+    print(f'Closed connection with user{i}\n')
+
+def cases() -> list[tuple[str, object]]:
+    settings.LOG_CATEGORIES = {
+        'on': {},
+        'sampled': {'sample': 100},
+        'limited': {'rate': 100},
+        'off': {'enabled': False},
+    }
+    log.apply_settings()
+    rows = [('print()', print_line)]
+    for name in settings.LOG_CATEGORIES:
+        category = log.category(name)
+        rows.append((f'log {name}', lambda i, category=category: category('closed', addr=('127.0.0.1', 50000 + i), user=f'user{i}')))
+    return rows
+
+# Runs each case with stdout pointed at sink, returning rows for report().
+def measure(sink, count: int) -> list[tuple]:
+    stdout = sys.stdout
+    rows = []
+    for name, write in cases():
+        sys.stdout = sink
+        log.start('')
+        dropped = sum(entry.dropped for entry in log.categories.values())
+        start = time.perf_counter()
+        samples = call_times(write, count)
+        called = time.perf_counter() - start
+        log.flush()
+        written = time.perf_counter() - start
+        counted = {name: entry.dropped for name, entry in log.categories.items() if entry.dropped}
+        assert log.writer.reported == counted, 'drops counted but not reported'
+        log.stop()
+        sys.stdout = stdout
+        dropped = sum(entry.dropped for entry in log.categories.values()) - dropped
+        rows.append((name, f'{sum(samples) / count * 1e6:.2f}', f'{common.percentile(samples, 99) * 1e6:.1f}',
+            f'{max(samples) * 1e3:.1f}', f'{count / called:.0f}', f'{written:.2f}', dropped))
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--pipe-rate', type=int, default=1 << 20)
+    args = parser.parse_args()
+    header = ('logging', 'us/line', 'p99 us', 'max ms', 'lines/s', 'written s', 'dropped')
+
+    # Line buffered, as stdout is on a terminal.
+    with open(os.devnull, 'w', buffering=1) as sink:
+        common.report(f'{args.lines} lines into /dev/null (calling thread)', [header] + measure(sink, args.lines))
+
+    read_fd, write_fd = os.pipe()
+    reader = SlowReader(read_fd, args.pipe_rate)
+    with os.fdopen(write_fd, 'w', buffering=1) as sink:
+        rows = measure(sink, args.lines // 10)
+    common.report(f'{args.lines // 10} lines into a pipe read at {args.pipe_rate >> 10} KB/s (calling thread)', [header] + rows)
@@ -0,0 +1,65 @@
+import common
+import argparse
+import contextlib
+from poker import cards, logic
+import poker.objects as poker
+import tracemalloc
+
+# Memory held by full tables, with the game state classes as they are and
+# with copies of them that drop __slots__ for a per-instance __dict__, the
+# reference the slots are measured against. Both are built in the same run.
+
+SEATS = 8
+SLOTTED = ((poker, 'PokerGame'), (poker, 'Player'), (poker, 'Pot'), (cards, 'Deck'), (poker, 'Deck'))
+
+def unslotted(cls: type) -> type:
+    dropped = {'__slots__', '__dict__', '__weakref__', *cls.__slots__}
+    return type(cls.__name__, cls.__bases__, {name: value for name, value in vars(cls).items() if name not in dropped})
+
+# Swaps the slotted classes for unslotted copies wherever the table code
+# looks them up.
+@contextlib.contextmanager
+def without_slots():
+    originals = [(module, name, getattr(module, name)) for module, name in SLOTTED]
+    copies = {}
+    for module, name, cls in originals:
+        setattr(module, name, copies.setdefault(cls, unslotted(cls)))
+    try:
+        yield
+    finally:
+        for module, name, cls in originals:
+            setattr(module, name, cls)
+
+def build_table(game_id: int) -> poker.PokerGame:
+    game = poker.PokerGame(game_id)
+    for seat in range(SEATS):
+        game.add_player(f"('10.0.{game_id % 256}.{seat}', {50000 + seat})")
+    game.pots.append(poker.Pot([p.seat for p in game.players]))
+    for player in game.players:
+        player.deal(logic.take_hand(game.deck, game.hand_size))
+        player.join_pot(0)
+    logic.flip_cards(game, 5)
+    return game
+
+def measure(count: int) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tables = [build_table(game_id) for game_id in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert len(tables) == count
+    return used
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=10000)
+    args = parser.parse_args()
+
+    with without_slots():
+        reference = measure(args.tables)
+    slotted = measure(args.tables)
+
+    rows = [('classes', 'bytes/table', 'bytes/seat', 'vs unslotted')]
+    for label, used in (('unslotted', reference), ('slotted', slotted)):
+        rows.append((label, used // args.tables, used // (args.tables * SEATS), f'{used / reference - 1:+.1%}'))
+    common.report(f'{args.tables} tables with {SEATS} seated players', rows)
@@ -0,0 +1,179 @@
+import common
+import argparse
+from bench_broadcast import Drain
+from bench_engine import pick_action
+import codec
+import communication
+import json
+import legacy
+import metrics
+import outbound
+from poker import logic
+import poker.objects as poker
+import random
+import routing
+import settings
+import socket
+import urllib.request
+from time import perf_counter_ns
+
+# Dispatches a mix of client messages in process (chat to six-seat rooms,
+# game actions, table syncs), with frames going out over real socket pairs
+# that a drain thread reads, to show what the metrics cost per dispatch.
+# 'off' swaps in the legacy copies of the instrumented functions, which are
+# the code from before metrics. Off, on and on again take turns every
+# --block messages, in a shuffled order each time round so no mode keeps
+# landing on the same part of a hand, since runs on a busy machine drift by
+# far more than what is measured; each adds up only its own dispatch time,
+# and the gap between the two 'on' rows is the noise in the comparison. The
+# direct estimate is the measured cost of one instrumented call site, with
+# latency sampled as the server samples it, times the sites each dispatch
+# passed through (counted in a round with sampling left on).
+# Last, the stats endpoint must serve what was recorded.
+
+INSTRUMENTED = [
+    (routing.MessageRouter, 'send_msg_to_game', legacy.legacy_send_msg_to_game),
+    (routing.MessageRouter, 'send_msg_to_server', legacy.legacy_send_msg_to_server),
+    (poker.PokerGame, 'handle_message', legacy.legacy_handle_message),
+]
+
+def open_tables(tables: int) -> tuple[list, Drain]:
+    communication.clients.clear()
+    communication.rooms.clear()
+    routing.routers.clear()
+    poker.games.clear()
+    seats, far_ends = [], []
+    for table in range(tables):
+        members = []
+        for seat in range(6):
+            near, far = socket.socketpair()
+            far_ends.append(far)
+            conn, addr = outbound.QueuedConnection(near), f'client{table}.{seat}'
+            communication.dispatch(conn, addr, codec.encode(codec.USER, addr))
+            if seat == 0:
+                communication.dispatch(conn, addr, codec.encode(codec.GAME_NEW, 'holdem'))
+                game_id = communication.clients[addr]['game']
+            else:
+                communication.dispatch(conn, addr, codec.encode(codec.GAME_JOIN, game_id))
+            members.append((conn, addr))
+        seats.append((poker.games[game_id].engine, members))
+    return seats, Drain(far_ends)
+
+def use_metrics(on: bool, seats: list) -> None:
+    for owner, name, old in INSTRUMENTED:
+        current = vars(owner).get(f'instrumented_{name}') or getattr(owner, name)
+        setattr(owner, f'instrumented_{name}', current)
+        setattr(owner, name, current if on else old)
+    # Routers hold the game's bound handle_message.
+    for engine, _ in seats:
+        routing.get_router(engine.game.id).register_game_handler(engine.game.handle_message)
+
+def legacy_dispatch(conn, addr: str, payload: bytes) -> None:
+    legacy.legacy_dispatch(communication.handlers, conn, addr, payload)
+
+def run(seats: list, messages: int, rng: random.Random, dispatch) -> int:
+    elapsed = 0
+    for i in range(messages):
+        engine, members = seats[i % len(seats)]
+        game_id = engine.game.id
+        match i % 8:
+            case 0 | 1 | 2:
+                conn, addr = rng.choice(members)
+                payload = codec.encode(codec.CHAT_SEND, game_id, 'hello')
+            case 7:
+                conn, addr = rng.choice(members)
+                payload = codec.encode(codec.TABLE_SYNC, game_id)
+            case _:
+                with engine.lock:
+                    if engine.state == logic.WAITING:
+                        for player in engine.game.players:
+                            if player.balance == 0:
+                                player.balance, player.sit_out = engine.game.buy_in, False
+                        engine.start_hand()
+                    player = engine.in_hand[engine.turn]
+                    action, amount = pick_action(engine, rng)
+                conn, addr = next(member for member in members if member[1] == player.addr)
+                payload = codec.encode(codec.GAME_ACT, game_id, codec.ACTION_CODES[action], amount)
+        start = perf_counter_ns()
+        dispatch(conn, addr, payload)
+        elapsed += perf_counter_ns() - start
+    return elapsed
+
+# One call site as the hot paths have it, outside and inside a sampling
+# window, less the bare call. Best of five runs each.
+def site_cost(rounds: int) -> tuple[float, float]:
+    histogram = metrics.Histogram()
+    def handler() -> None:
+        pass
+    def bare() -> None:
+        handler()
+    def site() -> None:
+        start = perf_counter_ns() if metrics.sampling else 0
+        handler()
+        if start:
+            histogram.observe(perf_counter_ns() - start)
+    costs = []
+    for func, sampling in ((bare, False), (site, False), (site, True)):
+        metrics.sampling = sampling
+        costs.append(common.timeit(lambda: [func() for _ in range(rounds)]) * 1e9 / rounds)
+    metrics.sampling = False
+    return costs[1] - costs[0], costs[2] - costs[0]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=32)
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--block', type=int, default=64)
+    args = parser.parse_args()
+
+    settings.HAND_START_DELAY = 3600 #Hands are started by run()
+    settings.ACTION_TIMEOUT = 3600
+    seats, drain = open_tables(args.tables)
+    rng = random.Random(0)
+    metrics.sampling = True
+    run(seats, 10000, rng, communication.dispatch)
+    sites = sum(h['samples'] for h in metrics.snapshot()['histograms'].values()) / 10000
+    metrics.reset()
+
+    metrics.start()
+    modes = ('off', 'on', 'on again')
+    elapsed = dict.fromkeys(modes, 0)
+    order = list(modes)
+    for index in range(args.messages // args.block):
+        if index % 3 == 0:
+            rng.shuffle(order)
+        mode = order[index % 3]
+        use_metrics(mode != 'off', seats)
+        elapsed[mode] += run(seats, args.block, rng, legacy_dispatch if mode == 'off' else communication.dispatch)
+    use_metrics(True, seats)
+    metrics.stop()
+    off, on, again = (elapsed[mode] / (args.messages // args.block // 3 * args.block) for mode in modes)
+
+    idle_ns, timed_ns = site_cost(200000)
+    sampled_ns = idle_ns + (timed_ns - idle_ns) / settings.METRICS_SAMPLE
+    common.report(f'{args.messages} dispatches over {args.tables} six-seat tables', [
+        ('metrics', 'us/dispatch', 'overhead'),
+        ('off', f'{off / 1e3:.2f}', ''),
+        ('on', f'{on / 1e3:.2f}', f'{(on / off - 1) * 100:.2f}%'),
+        ('on again', f'{again / 1e3:.2f}', f'{(again / off - 1) * 100:.2f}%'),
+        ('direct estimate', f'{sites:.1f} sites', f'{sites * sampled_ns / off * 100:.2f}%'),
+        ('unsampled estimate', '', f'{sites * timed_ns / off * 100:.2f}%'),
+    ])
+    common.report('one call site', [
+        ('sampling', 'ns'),
+        ('off', f'{idle_ns:.0f}'),
+        ('on', f'{timed_ns:.0f}'),
+        (f'1 window in {settings.METRICS_SAMPLE}', f'{sampled_ns:.0f}'),
+    ])
+
+    recorded = metrics.snapshot()
+    server = metrics.serve('127.0.0.1', 0)
+    with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/stats') as response:
+        served = json.load(response)
+    server.shutdown()
+    metrics.stop()
+    assert served['histograms'] == recorded['histograms'], 'stats endpoint differs from what was recorded'
+    assert served['histograms']['dispatch.chat_send']['samples'] > 0, 'no dispatches sampled'
+    assert served['gauges']['games'] == args.tables and served['gauges']['outbound']['connections'] == args.tables * 6
+    print(json.dumps({name: served['histograms'][name] for name in ('dispatch.chat_send', 'game.player')}, indent=1))
+    drain.stop()
@@ -0,0 +1,79 @@
+import common
+import argparse
+import codec
+import outbound
+import protocol
+import settings
+import socket
+import threading
+import time
+
+# Pushes a mix of chat (droppable), pot updates (coalesced) and other table
+# events at one threaded-mode connection whose client reads at a fixed rate,
+# or not at all, and reports what the outbound queue did.
+
+def reader(sock: socket.socket, rate: int, stop: threading.Event) -> None:
+    # Reads rate bytes per second in 10 ms slices; rate 0 never reads.
+    while not stop.is_set():
+        time.sleep(0.01)
+        if rate:
+            try:
+                sock.recv(max(1, rate // 100))
+            except OSError:
+                return
+
+def run(rate: int, duration: float) -> list:
+    near, far = socket.socketpair()
+    # Small kernel buffers so the queue, not the socket, absorbs the backlog.
+    near.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    far.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    conn = outbound.QueuedConnection(near)
+    stop = threading.Event()
+    threading.Thread(target=reader, args=(far, rate, stop), daemon=True).start()
+
+    before = dict(outbound.totals)
+    chat = protocol.encode_frame(codec.encode(codec.CHAT_MSG, 'someone', 'x' * 200))
+    action = protocol.encode_frame(codec.encode(codec.GAME_EVENT, 'action:3:call:200'))
+    sends, max_depth, evicted_at = [], 0, None
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < duration and evicted_at is None:
+        sent += 1
+        pot = protocol.encode_frame(codec.encode(codec.GAME_EVENT, f'pot:{sent}'))
+        for data, key, droppable in ((chat, None, True), (pot, 'pot', False), (action, None, False)):
+            begin = time.perf_counter()
+            conn.sendall(data, key, droppable)
+            sends.append(time.perf_counter() - begin)
+        max_depth = max(max_depth, conn.depth())
+        if conn.evicted:
+            evicted_at = time.perf_counter() - start
+        time.sleep(0.0005)
+    stop.set()
+    conn.close()
+    far.close()
+
+    delta = {name: outbound.totals[name] - before[name] for name in before}
+    return [
+        f'{rate // 1024} KB/s' if rate else 'stalled',
+        sent * 3,
+        max_depth,
+        delta['dropped'],
+        delta['coalesced'],
+        f'{evicted_at:.2f} s' if evicted_at is not None else 'no',
+        f'{common.percentile(sends, 99) * 1e6:.0f}',
+    ]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=3.0)
+    args = parser.parse_args()
+
+    settings.SEND_QUEUE_HIGH = 64 * 1024
+    settings.SEND_QUEUE_LOW = 16 * 1024
+    settings.SEND_QUEUE_LIMIT = 256 * 1024
+    settings.SLOW_CLIENT_TIMEOUT = 1
+
+    rows = [('client', 'frames', 'max depth', 'dropped', 'coalesced', 'evicted', 'send p99 us')]
+    for rate in (4 << 20, 200 << 10, 0):
+        rows.append(run(rate, args.duration))
+    common.report('high 64 KB, low 16 KB, limit 256 KB, slow timeout 1 s', rows)
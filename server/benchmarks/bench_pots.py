@@ -0,0 +1,85 @@
+import common
+import argparse
+from poker import logic
+from poker.objects import Player, build_pots, pot_winners
+import poker.objects as poker
+import random
+import routing
+import settings
+import time
+
+# The cost of build_pots and pot_winners per showdown, then whole hands
+# through the engine with short stacks going all in, checking that no chip
+# is made or lost. tests/test_pots.py checks the pots themselves.
+
+def random_showdown(rng: random.Random, count: int, ranks: int = 4) -> list[Player]:
+    seats = rng.sample(range(max(count, 8)), count)
+    players = []
+    for seat in seats:
+        player = Player(seat, f'p{seat}')
+        player.total_bet = rng.choice((rng.randint(1, 50) * 10, rng.randint(1, 5000)))
+        player.pots = 1 if rng.random() < 0.7 else 0
+        player.rank = rng.randint(1, ranks)
+        players.append(player)
+    if not any(p.pots for p in players):
+        players[0].pots = 1
+    return players
+
+def time_showdowns(rng: random.Random, count: int, rounds: int) -> float:
+    scenarios = [random_showdown(rng, count, 7462) for _ in range(rounds)] #As many ranks as 5 card hands
+    start = time.perf_counter()
+    for players in scenarios:
+        pot_winners(build_pots(players), players)
+    return (time.perf_counter() - start) / rounds
+
+def play_all_in_hands(hands: int, rng: random.Random) -> int:
+    routing.routers.clear()
+    poker.games.clear()
+    logic.create_game('holdem', 1)
+    router = routing.get_router(1)
+    game = poker.games[1]
+    engine = game.engine
+    for seat in range(6):
+        router.send_msg_to_game(f'player:add:bot{seat}')
+
+    side_pot_hands = 0
+    while engine.hand_no < hands:
+        with engine.lock:
+            for player in game.players:
+                # Uneven stacks, so all-ins leave side pots behind.
+                player.balance, player.sit_out = rng.choice((150, 400, 1200, 5000)), False
+            chips = sum(p.balance for p in game.players)
+            hand_no = engine.hand_no
+            engine.start_hand()
+            while engine.hand_no == hand_no or engine.state != logic.WAITING:
+                player = engine.in_hand[engine.turn]
+                to_call = engine.last_bet - player.cur_bet
+                roll = rng.random()
+                if roll < 0.35:
+                    action = 'raise' if engine.last_bet else 'bet'
+                    engine.act(player.addr, action, player.cur_bet + player.balance)
+                elif roll < 0.45 and to_call:
+                    engine.act(player.addr, 'fold')
+                else:
+                    engine.act(player.addr, 'call' if to_call else 'check')
+            assert sum(p.balance for p in game.players) == chips, f'hand {engine.hand_no} made or lost chips'
+            side_pot_hands += len(game.pots) > 1
+    return side_pot_hands
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hands', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rows = [('players', 'us/showdown', 'us/player')]
+    for count in (2, 6, 8, 100, 1000, 10000):
+        rounds = max(10, 100000 // count)
+        seconds = time_showdowns(rng, count, rounds)
+        rows.append((count, f'{seconds * 1e6:.1f}', f'{seconds * 1e6 / count:.2f}'))
+    common.report('build_pots + pot_winners', rows)
+
+    settings.HAND_START_DELAY = 3600 #Hands are started by play_all_in_hands()
+    settings.ACTION_TIMEOUT = 3600
+    side_pots = play_all_in_hands(args.hands, rng)
+    print(f'{args.hands} engine hands with all-ins conserve chips ({side_pots} went to side pots)')
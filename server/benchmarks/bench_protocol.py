@@ -0,0 +1,58 @@
+import common
+import argparse
+import protocol
+import time
+
+# Compares today's framed codec against the old one-recv-per-message path
+# that decoded each read and split it on ':'.
+
+def make_messages(count: int) -> list[str]:
+    return [f'game:msg:{10000 + i % 90000}:hello from seat {i % 8}' for i in range(count)]
+
+def split_on_colon(reads: list[bytes]) -> int:
+    handled = 0
+    for raw in reads:
+        attn, cmd, data = raw.decode('utf-8').split(':', 2)
+        handled += 1
+    return handled
+
+def framed(stream: bytes, chunk: int) -> int:
+    handled = 0
+    frames = protocol.FrameBuffer(chunk)
+    for offset in range(0, len(stream), chunk):
+        frames.feed(stream[offset:offset + chunk])
+        for raw in frames:
+            attn, cmd, data = raw.decode('utf-8').split(':', 2)
+            handled += 1
+    return handled
+
+def run(count: int, chunk: int) -> list[tuple]:
+    messages = make_messages(count)
+
+    start = time.perf_counter()
+    reads = [message.encode('utf-8') for message in messages]
+    old_encode = time.perf_counter() - start
+    old_decode = common.timeit(split_on_colon, reads)
+
+    start = time.perf_counter()
+    stream = b''.join(protocol.encode_frame(message.encode('utf-8')) for message in messages)
+    new_encode = time.perf_counter() - start
+    new_decode = common.timeit(framed, stream, chunk)
+    assert framed(stream, chunk) == count
+
+    # What the old path sees when the same messages arrive back-to-back.
+    merged = b''.join(reads)
+    intact = sum(1 for offset in range(0, len(merged), chunk) if merged[offset:offset + chunk] in reads)
+
+    return [
+        ('path', 'encode msg/s', 'decode msg/s', 'intact msgs'),
+        ('split-on-colon', f'{count / old_encode:.0f}', f'{count / old_decode:.0f}', intact),
+        ('framed', f'{count / new_encode:.0f}', f'{count / new_decode:.0f}', count),
+    ]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--chunk', type=int, default=1024)
+    args = parser.parse_args()
+    common.report(f'{args.messages} messages, {args.chunk} byte reads', run(args.messages, args.chunk))
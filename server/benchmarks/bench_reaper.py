@@ -0,0 +1,52 @@
+import common
+import argparse
+import contextlib
+import io
+from poker import logic
+import poker.objects as poker
+import routing
+import scheduler
+import settings
+import threading
+import time
+
+# Creates batches of tables, seats a player at every other one, and checks
+# that the thread count stays flat and that only the empty tables are
+# reaped once the grace period passes.
+
+def wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--grace', type=float, default=1.0)
+    args = parser.parse_args()
+    settings.TABLE_GRACE_PERIOD = args.grace
+
+    rows = [('tables', 'threads', 'reaped', 'kept', 'reap s')]
+    next_id = 0
+    for count in args.tables:
+        ids = range(next_id, next_id + count)
+        next_id += count
+        for game_id in ids:
+            logic.create_game('holdem', game_id)
+        for game_id in ids[::2]:
+            routing.get_router(game_id).send_msg_to_game(f'player:add:bot{game_id}')
+        threads = threading.active_count()
+
+        start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            reaped = wait_for(lambda: all(game_id not in poker.games for game_id in ids[1::2]), args.grace * 10)
+        elapsed = time.monotonic() - start
+        kept = sum(1 for game_id in ids[::2] if game_id in poker.games and game_id in routing.routers)
+        assert reaped and kept == len(ids[::2]), 'reaper closed the wrong tables'
+        rows.append((count, threads, len(ids[1::2]), kept, f'{elapsed:.2f}'))
+
+    common.report(f'Idle table reaping, {args.grace}s grace period', rows)
+    print(f'Timers still pending: {scheduler.scheduler.pending()}')
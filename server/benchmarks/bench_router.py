@@ -0,0 +1,81 @@
+import common
+import argparse
+from poker import evaluator
+import random
+import routing
+import settings
+import threading
+import time
+
+# Client threads post messages to many tables, each handler standing in for
+# a bit of game logic (evaluating a few hands). 'caller' is how long the
+# posting thread is held up, 'reply' is from post to the reply callback.
+# Each client keeps at most --in-flight requests outstanding. In the second
+# run one table in eight also waits 2 ms per message, like a table behind a
+# shard pipe.
+
+HANDS = [random.Random(i).sample(range(52), 7) for i in range(64)]
+
+def game_handler(message: str) -> dict:
+    for hand in HANDS[:8]:
+        evaluator.evaluate(hand)
+    return {'code': '200', 'message': message}
+
+def slow_handler(message: str) -> dict:
+    time.sleep(0.002)
+    return game_handler(message)
+
+def client(routers: list, seed: int, deadline: float, in_flight: int, results: list) -> None:
+    rng = random.Random(seed)
+    slots = threading.Semaphore(in_flight)
+    callers, replies = [], []
+    while time.perf_counter() < deadline:
+        slots.acquire()
+        router = rng.choice(routers)
+        start = time.perf_counter()
+        def on_reply(response: dict, start: float = start) -> None:
+            replies.append(time.perf_counter() - start)
+            slots.release()
+        router.post_to_game('player:act:call:0:bot', on_reply)
+        callers.append(time.perf_counter() - start)
+    for _ in range(in_flight):
+        slots.acquire()
+    results.append((callers, replies))
+
+def run(mode: str, tables: int, clients: int, in_flight: int, duration: float, slow: bool) -> tuple:
+    settings.ROUTER_MODE = mode
+    routing.routers.clear()
+    routers = []
+    for game_id in range(tables):
+        router = routing.new_router(game_id)
+        router.register_game_handler(slow_handler if slow and game_id % 8 == 0 else game_handler)
+        routers.append(router)
+
+    results = []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(routers, seed, deadline, in_flight, results)) for seed in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    callers = [c for result in results for c in result[0]]
+    replies = [r for result in results for r in result[1]]
+    return len(replies) / elapsed, callers, replies
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=64)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--in-flight', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=3.0)
+    args = parser.parse_args()
+
+    rows = [('tables', 'router', 'msgs/s', 'caller p99 us', 'reply p50 us', 'reply p99 us')]
+    for label, slow in (('all fast', False), ('1/8 slow', True)):
+        for mode in ('direct', 'async'):
+            rate, callers, replies = run(mode, args.tables, args.clients, args.in_flight, args.duration, slow)
+            rows.append((label, mode, f'{rate:.0f}', f'{common.percentile(callers, 99) * 1e6:.0f}',
+                f'{common.percentile(replies, 50) * 1e6:.0f}', f'{common.percentile(replies, 99) * 1e6:.0f}'))
+    common.report(f'{args.tables} tables, {args.clients} clients, {settings.ROUTER_WORKERS} router workers', rows)
@@ -0,0 +1,90 @@
+import common
+import argparse
+import contextlib
+import legacy
+import os
+import random
+import routing
+import sys
+import threading
+import time
+
+# Stress test for the router registry: writer threads create and close
+# routers on a small id range, so the same ids are fought over constantly,
+# while reader threads look routers up and take snapshots. Every create and
+# close that reports success is counted; afterwards the number of routers
+# left must equal creates minus closes, or an update was lost.
+
+IDS = 256
+
+def writer(create, close, seed: int, deadline: float, counts: list) -> None:
+    rng = random.Random(seed)
+    created = closed = errors = 0
+    while time.perf_counter() < deadline:
+        router_id = rng.randrange(IDS)
+        try:
+            if rng.random() < 0.5:
+                create(router_id)
+                created += 1
+            else:
+                close(router_id)
+                closed += 1
+        except KeyError:
+            errors += 1
+        except Exception:
+            pass #Already exists / does not exist
+    counts.append((created, closed, errors))
+
+def reader(lookup, snapshot, deadline: float, counts: list) -> None:
+    rng = random.Random()
+    reads = 0
+    while time.perf_counter() < deadline:
+        lookup(rng.randrange(IDS))
+        reads += 1
+        if reads % 100 == 0:
+            snapshot()
+    counts.append(reads)
+
+def run(create, close, lookup, snapshot, registry: dict, writers: int, readers: int, duration: float) -> tuple:
+    registry.clear()
+    deadline = time.perf_counter() + duration
+    writes, reads = [], []
+    threads = [threading.Thread(target=writer, args=(create, close, seed, deadline, writes)) for seed in range(writers)]
+    threads += [threading.Thread(target=reader, args=(lookup, snapshot, deadline, reads)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    created = sum(c for c, _, _ in writes)
+    closed = sum(c for _, c, _ in writes)
+    errors = sum(e for _, _, e in writes)
+    lost = created - closed - len(registry)
+    return (created + closed) / duration, sum(reads) / duration, lost, errors
+
+def striped_lookup(router_id: int) -> None:
+    try:
+        routing.get_router(router_id)
+    except KeyError:
+        pass
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=3.0)
+    args = parser.parse_args()
+
+    # Switch threads as often as possible to shake out check-then-act races.
+    sys.setswitchinterval(1e-6)
+    legacy_routers = {}
+    paths = (
+        ('legacy', lambda i: legacy.legacy_new_router(legacy_routers, i), lambda i: legacy.legacy_close_router(legacy_routers, i),
+            legacy_routers.get, lambda: list(legacy_routers.values()), legacy_routers),
+        ('striped', routing.new_router, routing.close_router, striped_lookup, routing.get_all_routers, routing.routers),
+    )
+    rows = [('registry', 'writes/s', 'reads/s', 'lost updates', 'KeyErrors')]
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, create, close, lookup, snapshot, registry in paths:
+            writes, reads, lost, errors = run(create, close, lookup, snapshot, registry, args.writers, args.readers, args.duration)
+            rows.append((name, f'{writes:.0f}', f'{reads:.0f}', lost, errors))
+    common.report(f'{args.writers} writers, {args.readers} readers on {IDS} ids', rows)
@@ -0,0 +1,34 @@
+import common
+import argparse
+import os
+from poker import selfplay
+import sys
+
+# Soak test of the engine: self-play hands across worker processes, every
+# action and hand checked by poker.selfplay, reporting hands a second per
+# core (hands over the workers' CPU time) and any rule broken. Exits with
+# status 1 on a violation.
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hands', type=int, default=200000)
+    parser.add_argument('--tables', type=int, default=64)
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--policies', nargs='+', default=['random', 'aggressive', 'calling', 'script'], choices=list(selfplay.POLICIES),
+        help='given to the seats in turn')
+    parser.add_argument('--illegal', type=float, default=0.05, help='chance of trying an illegal action before each legal one')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = selfplay.run(args.hands, args.tables, args.players, args.workers, args.policies, args.illegal, args.seed)
+    common.report(f'{result['hands']} hands on {args.tables} tables x {args.players} players, {result['workers']} workers ({', '.join(args.policies)})', [
+        ('hands/s/core', 'hands/s', 'actions/hand', 'showdowns', 'side pots', 'illegal tried', 'violations'),
+        (f'{result['hands'] / result['cpu_seconds']:.0f}', f'{result['hands'] / result['seconds']:.0f}',
+            f'{result['actions'] / result['hands']:.1f}', f'{result['showdowns'] / result['hands']:.1%}',
+            result['side_pots'], result['illegal_tried'], len(result['violations'])),
+    ])
+    for violation in result['violations']:
+        print(f'seed {violation['seed']} table {violation['table']} hand {violation['hand']}: {violation['error']}')
+    if result['violations']:
+        sys.exit(1)
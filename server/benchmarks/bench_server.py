@@ -0,0 +1,97 @@
+import common
+import argparse
+import asyncio
+import codec
+import os
+import protocol
+import socket
+import subprocess
+import sys
+import time
+
+# Starts the server in each mode, opens N client connections that each create
+# their own table, then ping-pongs chat messages for a fixed duration.
+
+def server_threads(pid: int) -> int:
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('Threads:'):
+                return int(line.split()[1])
+    return 0
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple:
+    (length,) = protocol.HEADER.unpack(await reader.readexactly(protocol.HEADER.size))
+    return codec.decode(await reader.readexactly(length))
+
+async def open_client(port: int, index: int):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(protocol.encode_frame(codec.encode(codec.USER, f'bot{index}')))
+    await writer.drain()
+    return reader, writer
+
+async def create_table(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> int:
+    writer.write(protocol.encode_frame(codec.encode(codec.GAME_NEW, 'holdem')))
+    await writer.drain()
+    _, game_id = await read_frame(reader)
+    return game_id
+
+async def chat_loop(reader, writer, game_id: int, deadline: float, counts: list[int]) -> None:
+    message = protocol.encode_frame(codec.encode(codec.CHAT_SEND, game_id, 'hello'))
+    while time.perf_counter() < deadline:
+        writer.write(message)
+        await writer.drain()
+        await read_frame(reader)
+        counts[0] += 1
+
+async def run_clients(port: int, connections: int, duration: float, pid: int) -> dict:
+    clients = []
+    for index in range(connections):
+        clients.append(await open_client(port, index))
+    game_ids = await asyncio.gather(*(create_table(r, w) for r, w in clients))
+
+    counts = [0]
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(chat_loop(r, w, g, deadline, counts) for (r, w), g in zip(clients, game_ids)))
+    elapsed = time.perf_counter() - start
+    threads = server_threads(pid)
+
+    for _, writer in clients:
+        writer.close()
+    return {'connections': len(clients), 'msgs_per_sec': counts[0] / elapsed, 'threads': threads}
+
+# Importing the server takes about a second, so poll until it accepts.
+def wait_for_port(server: subprocess.Popen, port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while server.poll() is None and time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server did not start on port {port}')
+
+def bench_mode(mode: str, port: int, connections: int, duration: float) -> dict:
+    server = subprocess.Popen(
+        [sys.executable, 'server.py', '--mode', mode, '--host', '127.0.0.1', '--port', str(port), '--history', '', '--checkpoint', ''],
+        cwd=common.SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(server, port)
+        return asyncio.run(run_clients(port, connections, duration, server.pid))
+    finally:
+        server.kill()
+        server.wait()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--port', type=int, default=50110)
+    args = parser.parse_args()
+
+    rows = [('mode', 'connections', 'msgs/s', 'threads')]
+    for offset, mode in enumerate(('thread', 'async')):
+        result = bench_mode(mode, args.port + offset, args.connections, args.duration)
+        rows.append((mode, result['connections'], f'{result['msgs_per_sec']:.0f}', result['threads']))
+    common.report(f'Chat round trips, {args.connections} connections', rows)
@@ -0,0 +1,94 @@
+import common
+import argparse
+from poker import logic
+import poker.objects as poker
+import queue
+import routing
+import settings
+import shards
+import tablestate
+import threading
+import time
+
+# Runs heads-up call/check hands on many tables, in-process (0 shards) and
+# spread over worker processes, and reports hands/s for each shard count.
+# Table deltas arrive on the shard reader threads; they only enqueue whose
+# turn it is, and driver threads send the actions back through the proxy
+# routers.
+
+def run(shard_count: int, tables: int, duration: float, drivers: int) -> float:
+    shards.stop()
+    routing.routers.clear()
+    poker.games.clear()
+    if shard_count:
+        shards.start(shard_count, {'HAND_START_DELAY': 0, 'ACTION_TIMEOUT': 3600})
+    else:
+        settings.HAND_START_DELAY = 0
+        settings.ACTION_TIMEOUT = 3600
+
+    turns = queue.SimpleQueue()
+    hands = [0]
+    def handler(game_id: int):
+        state = tablestate.new_state()
+        def on_event(message: str | tuple) -> None:
+            match message:
+                case ('delta', _, _, changes):
+                    hand = state['hand']
+                    tablestate.apply(state, changes)
+                    if state['hand'] != hand:
+                        hands[0] += 1
+                    # Every action publishes one delta, so each one with a
+                    # seat to act is a turn, even when the seat is unchanged.
+                    seat = state['turn']
+                    if seat != tablestate.NO_SEAT:
+                        bets = {s: bet for s, (_, bet, _) in state['seats'].items()}
+                        turns.put((game_id, seat, max(bets.values()) - bets[seat]))
+        return on_event
+
+    for game_id in range(tables):
+        logic.create_game('holdem', game_id)
+        router = routing.get_router(game_id)
+        router.register_server_handler(handler(game_id))
+
+    # Seats are handed out in join order, so seat i is bot{game_id}.{i}.
+    def drive(stop: threading.Event) -> None:
+        while not stop.is_set():
+            try:
+                game_id, seat, to_call = turns.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            action = 'call' if to_call else 'check'
+            routing.get_router(game_id).send_msg_to_game(f'player:act:{action}:0:bot{game_id}.{seat}')
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=drive, args=(stop,), daemon=True) for _ in range(drivers)]
+    for thread in threads:
+        thread.start()
+    for game_id in range(tables):
+        router = routing.get_router(game_id)
+        for seat in range(2):
+            router.send_msg_to_game(f'player:add:bot{game_id}.{seat}')
+
+    time.sleep(0.5)
+    first = hands[0]
+    start = time.perf_counter()
+    time.sleep(duration)
+    rate = (hands[0] - first) / (time.perf_counter() - start)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return rate
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--tables', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--drivers', type=int, default=8)
+    args = parser.parse_args()
+
+    rows = [('shards', 'hands/s')]
+    for count in args.shards:
+        rows.append((count, f'{run(count, args.tables, args.duration, args.drivers):.0f}'))
+    shards.stop()
+    common.report(f'{args.tables} heads-up tables, {args.drivers} driver threads', rows)
@@ -0,0 +1,97 @@
+import common
+import argparse
+from bench_engine import pick_action
+import codec
+from poker import logic
+import poker.objects as poker
+import protocol
+import random
+import routing
+import settings
+import tablestate
+
+# Plays hands at one table and counts what the clients would be sent: the
+# events the state cannot carry (show, win, error) as their own frames, the
+# table state as poker.publisher deltas, and their total; a full snapshot to
+# every member after every change is counted instead of the deltas for
+# comparison. A client copy of the state is kept from the deltas alone and
+# checked against the publisher after every action and against a fresh
+# snapshot at the end.
+
+def frame_size(opcode: int, *fields) -> int:
+    return len(protocol.encode_frame(codec.encode(opcode, *fields)))
+
+def run(players: int, spectators: int, hands: int) -> list:
+    routing.routers.clear()
+    poker.games.clear()
+    logic.create_game('holdem', 1)
+    router = routing.get_router(1)
+    game = poker.games[1]
+    engine = game.engine
+    members = players + spectators
+
+    sent = {'events': 0, 'deltas': 0, 'snapshots': 0}
+    frames = {'events': 0, 'deltas': 0, 'snapshots': 0}
+    client = tablestate.new_state()
+    def on_event(message: str | tuple) -> None:
+        match message:
+            case str():
+                event = message.partition(':game:')[2]
+                # Spectators only get what is broadcast, not error:.
+                copies = 1 if event.startswith('error:') else 1 + spectators / players
+                sent['events'] += frame_size(codec.GAME_EVENT, event) * copies
+                frames['events'] += copies
+            case ('delta', _, version, changes):
+                tablestate.apply(client, changes)
+                sent['deltas'] += frame_size(codec.TABLE_DELTA, version, changes) * members
+                frames['deltas'] += members
+                snapshot = tablestate.snapshot(engine.publisher.state)
+                sent['snapshots'] += frame_size(codec.TABLE_SNAPSHOT, version, 0, snapshot) * members
+                frames['snapshots'] += members
+            case ('hole', _, cards):
+                for path in ('deltas', 'snapshots'):
+                    sent[path] += frame_size(codec.TABLE_HOLE, cards)
+                    frames[path] += 1
+    router.register_server_handler(on_event)
+
+    for seat in range(players):
+        router.send_msg_to_game(f'player:add:bot{seat}')
+
+    rng = random.Random(0)
+    while engine.hand_no < hands or engine.state != logic.WAITING:
+        with engine.lock:
+            if engine.state == logic.WAITING:
+                for player in game.players:
+                    if player.balance == 0:
+                        player.balance, player.sit_out = game.buy_in, False
+                engine.start_hand()
+                continue
+            action, amount = pick_action(engine, rng)
+            addr = engine.in_hand[engine.turn].addr
+        router.send_msg_to_game(f'player:act:{action}:{amount}:{addr}')
+        assert client == engine.publisher.state, 'client state drifted from the publisher'
+
+    fresh = tablestate.new_state()
+    version, _, changes, _ = router.send_msg_to_game('get:state:bot0')
+    tablestate.apply(fresh, changes)
+    assert fresh == client and version == engine.publisher.version, 'snapshot differs from the deltas'
+
+    return [
+        f'{players}+{spectators}',
+        f'{sent['events'] / hands:.0f}', f'{frames['events'] / hands:.0f}',
+        f'{sent['deltas'] / hands:.0f}', f'{frames['deltas'] / hands:.0f}',
+        f'{(sent['events'] + sent['deltas']) / hands:.0f}',
+        f'{sent['snapshots'] / hands:.0f}',
+    ]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hands', type=int, default=2000)
+    args = parser.parse_args()
+
+    settings.HAND_START_DELAY = 3600 #Hands are started by the loop above
+    settings.ACTION_TIMEOUT = 3600
+    rows = [('seats+watchers', 'event B/hand', 'event frames', 'delta B/hand', 'delta frames', 'total B/hand', 'snapshot B/hand')]
+    for players, spectators in ((2, 0), (6, 0), (6, 20)):
+        rows.append(run(players, spectators, args.hands))
+    common.report(f'{args.hands} hands, bytes and frames sent to all members per hand', rows)
@@ -0,0 +1,40 @@
+import common
+import argparse
+import numpy as np
+from poker import evaluator, vectorized
+import time
+
+def random_hands(count: int, size: int = 7, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for start in range(0, count, 100000):
+        rows = min(100000, count - start)
+        chunks.append(np.argsort(rng.random((rows, 52)), axis=1)[:, :size])
+    return np.concatenate(chunks)
+
+def check(hands: np.ndarray) -> None:
+    batch = vectorized.evaluate_batch(hands).tolist()
+    single = [evaluator.evaluate(hand) for hand in hands.tolist()]
+    assert batch == single, 'evaluate_batch disagrees with evaluate'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    for size in (5, 6, 7):
+        check(random_hands(20000, size))
+
+    rows = [('hands', 'batch s', 'hands/s', 'ns/hand')]
+    for count in args.sizes:
+        hands = random_hands(count)
+        elapsed = common.timeit(vectorized.evaluate_batch, hands, repeat=3)
+        rows.append((count, f'{elapsed:.3f}', f'{count / elapsed:.0f}', f'{elapsed / count * 1e9:.0f}'))
+
+    hands = random_hands(100000)
+    start = time.perf_counter()
+    for hand in hands.tolist():
+        evaluator.evaluate(hand)
+    elapsed = time.perf_counter() - start
+    rows.append(('evaluate loop', f'{elapsed:.3f}', f'{100000 / elapsed:.0f}', f'{elapsed / 100000 * 1e9:.0f}'))
+    common.report('evaluate_batch, 7 card hands', rows)
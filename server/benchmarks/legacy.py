@@ -0,0 +1,170 @@
+# Reference implementations of engine code that has since been replaced,
+# kept so benchmarks can compare against the original behaviour.
+import codec
+import protocol
+import random
+import routing
+
+class LegacyPlayer:
+    def __init__(self):
+        self.rank = [0,0]
+        self.hand = []
+
+    #Use all possible cards to find best hand of 5 cards
+    def find_rank(self, allCards):
+
+        #Clear Rank
+        self.rank = [0,0]
+
+        #Sort Available Cards by Number
+        allCards = sorted(allCards, key=lambda x: x[1])
+        for i in allCards:
+            i.append(1)
+        [bestRank, bestHand] = [[0,0,0], []]
+            
+        #Cycle through all possible 5 out of 7 and determine rank [hand type, strength of type]
+        for i in range(0,6):
+            for j in range(i+1,7):
+
+                #Set Variables
+                _counts = [1,1,0,0,0,0]
+                prevCardVal = -1
+                pairs = 0
+                flushStr = [0,1]
+                [tempRank, tempHand] = [[0,0], []]
+
+                #Begin checking pick 5 of 7 cards
+                for card in allCards:
+                    
+                    #Skip new pair of cards, add used cards to temporary hand
+                    k = allCards.index(card)
+                    if k == i or k == j: continue
+
+                    #Add new card to temp hand
+                    tempHand.append(card)
+                    
+                    #Find X of a Kind (2, 3, 4, full house)
+                    if card[1] == prevCardVal: _counts[0] += 1
+                    else: _counts[0] = 1
+                    
+                    if _counts[0] == 2:
+                        tempRank[0] += 3
+                        tempRank[1] += card[1]*2*100**pairs
+                        card[2] = 0
+                        allCards[k-1][2] = 0
+                        pairs += 1
+                    elif _counts[0] == 3:
+                        tempRank[0] += 4
+                        tempRank[1] += card[1]*100
+                        card[2] = 0
+                    elif _counts[0] == 4:
+                        tempRank = [12, card[1]]
+                        card[2] = 0
+                    
+                    #Find Straight
+                    if card[1] == prevCardVal + 1: _counts[1] += 1
+                    elif len(tempHand) == 5 and card[1] == 13 and tempHand[0][1] == 1: _counts[1] += 1 #Check for wheel
+                    else: _counts[1] = 1
+                    if _counts[1] == 5: tempRank = [8, card[1]]
+
+                    #Update strength for flush (card5 * 2^4 + card4 * 2^3 +...)
+                    flushStr[0] += card[1]*flushStr[1]
+                    flushStr[1] *= 2
+
+                    #Find Flush
+                    _curSuit = card[0]
+                    _counts[_curSuit+1] += 1
+                    if _counts[_curSuit+1] == 5:
+                        tempRank[0] += 9
+                        tempRank[1] += flushStr[0]
+                        if tempRank == [17,13]: tempRank[0] == 18
+
+                    #Set last value for check against next card
+                    prevCardVal = card[1]
+
+                #Find kicker and add value to rank
+                if tempRank[0] < 8:
+                    kickerMax = 0
+                    for c in range(len(tempHand)):
+                        if tempHand[c][2] and tempHand[c][1] > kickerMax: kickerMax = tempHand[c][1]
+                        
+                    tempRank[1] += kickerMax
+
+                #If rank is better than last hand, update player's hand
+                if tempRank[0] > bestRank[0] or (tempRank[0] == bestRank[0] and tempRank[1] > bestRank[1]):
+                    [bestRank, bestHand] = [tempRank, tempHand]
+
+        #Remove kicker markers from cards ([x, x, 1] -> [x, x])
+        for card in allCards:
+            card.pop()
+
+        #Set player rank and hand to bests
+        [self.rank, self.hand] = [bestRank, bestHand]
+
+# The deck before poker.cards.Deck: a fresh list of (suit, rank) tuples per
+# hand, dealt by popping random indexes.
+def legacy_deck() -> list[tuple[int, int]]:
+    return [(i, j) for j in range(1,14) for i in range(1, 5)]
+
+def legacy_take_hand(deck: list[tuple[int, int]], hand_size: int) -> list[tuple[int, int]]:
+    return [deck.pop(random.randint(0,len(deck)-1)) for _ in range(hand_size)]
+
+# communication.distribute_chat_message before per-game rooms: asks the game
+# for its players on every line and sends to each one in turn.
+def legacy_distribute_chat_message(clients: dict, router, addr: str, message: str, extra: list[str] = ()) -> None:
+    player_addresses = router.send_msg_to_game('get:players:') + list(extra)
+    sender = clients[addr]['username']
+    response = f'chat:msg:{sender}: {message}'
+    for address in player_addresses:
+        conn = clients[address]['connection']
+        conn.sendall(protocol.encode_frame(response.encode('utf-8')))
+
+# communication.create_new_game before gameids: draws random ids and asks
+# every router for its id to rule out a collision.
+def legacy_new_game_id() -> int:
+    game_id = random.randint(10000, 99999)
+    all_game_ids = [router.send_msg_to_game('get:id:') for router in routing.get_all_routers()]
+    while game_id in all_game_ids:
+        game_id = random.randint(10000, 99999)
+    return game_id
+
+# routing.new_router/close_router before lock striping: check-then-act on a
+# shared dict with nothing held in between.
+def legacy_new_router(routers: dict, router_id: int) -> object:
+    if router_id not in routers:
+        router = routing.MessageRouter()
+        routers[router_id] = router
+        return router
+    raise Exception('Router already exists.')
+
+def legacy_close_router(routers: dict, router_id: int) -> None:
+    if router_id in routers:
+        del routers[router_id]
+        return
+    raise Exception('Router does not exist.')
+
+# The hot paths before metrics, for measuring what the metrics cost. Each
+# stands in for the method or function of the same name.
+def legacy_dispatch(handlers: list, conn, addr: str, payload: bytes) -> None:
+    opcode, *fields = codec.decode(payload)
+    handler = handlers[opcode]
+    if handler:
+        handler(conn, addr, *fields)
+
+def legacy_send_msg_to_server(self, message):
+    if self.serverside_handler:
+        response = self.serverside_handler(message)
+        return response
+
+def legacy_send_msg_to_game(self, message):
+    if self.gameside_handler:
+        response = self.gameside_handler(message)
+        return response
+
+def legacy_handle_message(self, message: str) -> None:
+    type, cmd, data = message.split(':', 2)
+    response = self.actions_map[type][cmd](self, data)
+    if type == 'player' and self.engine:
+        self.engine.publish()
+        self.engine.checkpoint()
+    return response
@@ -0,0 +1,258 @@
+import common
+import argparse
+import fnmatch
+import gc
+import json
+import log
+import os
+import platform
+from poker import logic
+from poker.cards import Deck
+from poker.objects import Player, PokerGame
+import poker.objects as poker
+import random
+import routing
+import settings
+import subprocess
+import sys
+import time
+
+# Microbenchmarks of the poker primitives, saved as JSON and compared run
+# against run:
+#   git checkout main && python suite.py run --save baselines/before.json
+#   git checkout mine && python suite.py run --save baselines/after.json
+#   python suite.py compare baselines/before.json baselines/after.json
+# compare exits with status 1 when any benchmark got slower by more than
+# --threshold. Timings only mean anything against others from the same
+# machine and Python, so compare refuses files from different ones, and no
+# baseline is kept in the repository. Like timeit, each benchmark is looped
+# enough times to take at least MIN_TIME and timed as the best of --repeats
+# such runs with the garbage collector off, which is the figure least moved
+# by a busy machine.
+#
+# A benchmark is a setup function taking an rng and returning the number
+# of operations a run does and the function doing them.
+
+MIN_TIME = 0.05
+
+BENCHMARKS = {}
+
+def benchmark(name: str):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+def dealt_hands(rng: random.Random, count: int, size: int) -> list[list[int]]:
+    deck = Deck(rng)
+    hands = []
+    for _ in range(count):
+        deck.reset()
+        hands.append(deck.deal_many(size))
+    return hands
+
+@benchmark('player.find_rank')
+def find_rank(rng: random.Random):
+    player, hands = Player(0, 'p0'), dealt_hands(rng, 1000, 7)
+    def run() -> None:
+        for cards in hands:
+            player.find_rank(cards)
+    return len(hands), run
+
+@benchmark('logic.take_hand')
+def take_hand(rng: random.Random):
+    deck = Deck(rng)
+    def run() -> None:
+        for _ in range(1000):
+            deck.reset()
+            for _ in range(8):
+                logic.take_hand(deck, 2)
+    return 8000, run
+
+@benchmark('logic.flip_cards')
+def flip_cards(rng: random.Random):
+    game = PokerGame(1)
+    game.deck = Deck(rng)
+    def run() -> None:
+        for _ in range(1000):
+            game.deck.reset()
+            game.cards.clear()
+            logic.flip_cards(game, 3)
+            logic.flip_cards(game, 1)
+            logic.flip_cards(game, 1)
+    return 3000, run
+
+@benchmark('game.add_rmv_player')
+def add_rmv_player(rng: random.Random):
+    game = PokerGame(1)
+    addrs = [f"('127.0.0.1', {50000 + seat})" for seat in range(8)]
+    def run() -> None:
+        for _ in range(100):
+            for addr in addrs:
+                game.add_player(addr)
+            for addr in addrs:
+                game.rmv_player(addr)
+    return 100 * len(addrs), run
+
+# Messages through a full table's handle_message, as the router hands them
+# over: lookups and seat changes, which publish and checkpoint.
+@benchmark('game.handle_message')
+def handle_message(rng: random.Random):
+    game = table(1)
+    addr = game.players[0].addr
+    messages = [f'get:players:', f'get:id:', f'player:sitout:{addr}', f'player:sitin:{addr}'] * 250
+    def run() -> None:
+        for message in messages:
+            game.handle_message(message)
+    return len(messages), run
+
+@benchmark('routing.get_router')
+def get_router(rng: random.Random):
+    reset_tables(1000)
+    ids = [rng.choice(list(routing.routers)) for _ in range(1000)]
+    def run() -> None:
+        for router_id in ids:
+            routing.get_router(router_id)
+    return len(ids), run
+
+@benchmark('routing.get_all_routers')
+def get_all_routers(rng: random.Random):
+    reset_tables(1000)
+    def run() -> None:
+        for _ in range(1000):
+            routing.get_all_routers()
+    return 1000, run
+
+@benchmark('routing.new_close_router')
+def new_close_router(rng: random.Random):
+    reset_tables(1000)
+    ids = range(200000, 201000)
+    def run() -> None:
+        for router_id in ids:
+            routing.new_router(router_id)
+        for router_id in ids:
+            routing.close_router(router_id)
+    return len(ids), run
+
+def reset_tables(count: int) -> None:
+    routing.routers.clear()
+    routing.changed()
+    poker.games.clear()
+    for game_id in range(10000, 10000 + count):
+        routing.new_router(game_id)
+
+# A local table with all eight seats taken.
+def table(game_id: int) -> PokerGame:
+    reset_tables(0)
+    logic.create_local_game('holdem', game_id)
+    game = poker.games[game_id]
+    for seat in range(8):
+        game.handle_message(f"player:add:('127.0.0.1', {50000 + seat})")
+    return game
+
+def time_benchmark(setup, repeats: int) -> dict:
+    ops, run = setup(random.Random(0))
+    start = time.perf_counter()
+    run() #Warm up, and size the loop
+    loops = max(1, int(MIN_TIME / (time.perf_counter() - start)))
+    times = []
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            for _ in range(loops):
+                run()
+            times.append((time.perf_counter_ns() - start) / loops)
+    finally:
+        gc.enable()
+    times.sort()
+    return {'ns_per_op': times[0] / ops, 'median_ns_per_op': times[len(times) // 2] / ops, 'ops': ops, 'loops': loops}
+
+def run_suite(patterns: list[str], repeats: int) -> dict:
+    settings.HAND_START_DELAY = 3600 #No hand starts while timing
+    settings.ACTION_TIMEOUT = 3600
+    settings.LOG_CATEGORIES = {name: {'enabled': False} for name in settings.LOG_CATEGORIES}
+    log.apply_settings()
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            results[name] = time_benchmark(setup, repeats)
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=common.SRC_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'machine': f'{platform.node()} {platform.machine()}',
+            'repeats': repeats,
+        },
+        'results': results,
+    }
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+def save(path: str, run: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(run, file, indent=1)
+        file.write('\n')
+
+# Rows for report() and the benchmarks that regressed past threshold.
+def compare(baseline: dict, current: dict, threshold: float) -> tuple[list[tuple], list[str]]:
+    rows = [('benchmark', 'baseline ns', 'current ns', 'change', '')]
+    regressed = []
+    for name in {**baseline['results'], **current['results']}:
+        before, after = baseline['results'].get(name), current['results'].get(name)
+        if not before or not after:
+            rows.append((name, f'{before['ns_per_op']:.1f}' if before else '', f'{after['ns_per_op']:.1f}' if after else '', '', 'new' if after else 'missing'))
+            continue
+        change = after['ns_per_op'] / before['ns_per_op'] - 1
+        status = 'REGRESSED' if change > threshold else 'improved' if change < -threshold else ''
+        if change > threshold:
+            regressed.append(name)
+        rows.append((name, f'{before['ns_per_op']:.1f}', f'{after['ns_per_op']:.1f}', f'{change:+.1%}', status))
+    return rows, regressed
+
+def print_run(run: dict) -> None:
+    rows = [('benchmark', 'ns/op', 'median ns/op', 'ops/run')]
+    for name, result in run['results'].items():
+        rows.append((name, f'{result['ns_per_op']:.1f}', f'{result['median_ns_per_op']:.1f}', result['ops'] * result['loops']))
+    common.report(f'Best of {run['meta']['repeats']} at {run['meta']['commit'] or 'unknown commit'}', rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the suite, optionally saving a baseline')
+    run_parser.add_argument('--save', help='path to write the results to, e.g. baselines/mine.json')
+    compare_parser = commands.add_parser('compare', help='compare two saved runs from the same machine')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='slowdown that counts as a regression, 0.1 for 10%%')
+    run_parser.add_argument('--repeats', type=int, default=15)
+    for command in (run_parser, compare_parser):
+        command.add_argument('--only', nargs='+', default=['*'], help='benchmark name patterns')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        current = run_suite(args.only, args.repeats)
+        print_run(current)
+        if args.save:
+            save(args.save, current)
+    else:
+        baseline, current = load(args.baseline), load(args.current)
+        for key in ('machine', 'python'):
+            if baseline['meta'][key] != current['meta'][key]:
+                sys.exit(f'{args.baseline} and {args.current} come from different {key}s: '
+                    f'{baseline['meta'][key]} and {current['meta'][key]}')
+        for run in (baseline, current):
+            run['results'] = {name: result for name, result in run['results'].items() if any(fnmatch.fnmatch(name, pattern) for pattern in args.only)}
+        rows, regressed = compare(baseline, current, args.threshold)
+        common.report(f'{args.current} ({current['meta']['commit'] or 'unknown commit'}) against {args.baseline} '
+            f'({baseline['meta']['commit'] or 'unknown commit'}), threshold {args.threshold:.0%}', rows)
+        if regressed:
+            sys.exit(1)
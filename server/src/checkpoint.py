@@ -0,0 +1,206 @@
+import mmap
+import os
+import routing
+import scheduler
+import settings
+import struct
+import threading
+import zlib
+
+# Table checkpoints in one memory-mapped file, so tables and balances survive
+# the server process dying. Every table gets a slot, and every slot holds two
+# copies of the table that are written in turn, each stamped with a sequence
+# number and a crc; restore takes the newest copy whose crc matches, so a
+# checkpoint cut short leaves the one before it intact. A copy is written
+# entry by entry, only where it differs from what that copy last held, with
+# the header last.
+#
+# Writes land in the page cache as soon as they are made, which is enough to
+# survive the process; msync every CHECKPOINT_SYNC_INTERVAL seconds covers
+# the machine going down.
+#
+# Copy layout:
+#   HEADER   crc, sequence, used, game id, hand number, button, small blind,
+#            buy in, player count, pot count
+#   PLAYER   MAX_PLAYERS x (seat, balance, sitting out, username)
+# Seats are kept by username, as the address dies with the connection;
+# communication refuses usernames longer than NAME_SIZE bytes.
+#   POT      MAX_POTS x (total, seat bitset)
+
+HEADER = struct.Struct('!IQBIIbIIBB')
+NAME_SIZE = 64
+PLAYER = struct.Struct(f'!BIB{NAME_SIZE}s')
+POT = struct.Struct('!IB')
+MAX_PLAYERS = 8
+MAX_POTS = 8
+
+PLAYERS_AT = HEADER.size
+POTS_AT = PLAYERS_AT + MAX_PLAYERS * PLAYER.size
+COPY_SIZE = POTS_AT + MAX_POTS * POT.size
+SLOT_SIZE = 2 * COPY_SIZE
+
+class Checkpoints:
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < SLOT_SIZE:
+            size = settings.CHECKPOINT_SLOTS * SLOT_SIZE
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.capacity = size // SLOT_SIZE
+        self.sequence = 0
+        self.slots: dict[int, int] = {} #Game id to slot
+        self.written: dict[int, list] = {} #Game id to what each copy holds, then the last header
+        self.bytes_written = 0
+        self.latest = [1] * self.capacity #The copy each slot last wrote
+        self.free: list[int] = []
+        self.sync_timer = None
+
+    def grow(self) -> None:
+        old = self.capacity
+        self.capacity *= 2
+        self.file.truncate(self.capacity * SLOT_SIZE)
+        self.map.resize(self.capacity * SLOT_SIZE)
+        self.latest.extend([1] * old)
+        self.free.extend(range(self.capacity - 1, old - 1, -1))
+
+    # Newest valid copy of every slot, as (slot, copy, header, body).
+    def read_slots(self) -> list[tuple]:
+        found = []
+        for slot in range(self.capacity):
+            best = None
+            for copy in range(2):
+                start = slot * SLOT_SIZE + copy * COPY_SIZE
+                header = HEADER.unpack_from(self.map, start)
+                if not header[1]:
+                    continue #Never written
+                player_count, pot_count = header[8:]
+                if player_count > MAX_PLAYERS or pot_count > MAX_POTS:
+                    continue
+                body = (
+                    self.map[start + PLAYERS_AT:start + PLAYERS_AT + player_count * PLAYER.size]
+                    + self.map[start + POTS_AT:start + POTS_AT + pot_count * POT.size]
+                )
+                crc = zlib.crc32(body, zlib.crc32(self.map[start + 4:start + HEADER.size]))
+                if crc == header[0] and (best is None or header[1] > best[2][1]):
+                    best = (slot, copy, header, body)
+            if best:
+                found.append(best)
+        return found
+
+    def restore(self) -> list[dict]:
+        tables = []
+        used = set()
+        for slot, copy, header, body in self.read_slots():
+            self.latest[slot] = copy
+            _, sequence, live, game_id, hand_no, button, sm_blind, buy_in, player_count, pot_count = header
+            self.sequence = max(self.sequence, sequence)
+            if not live:
+                continue
+            split = player_count * PLAYER.size
+            players = [
+                (seat, balance, bool(sit_out), str(name.rstrip(b'\0'), 'utf-8'))
+                for seat, balance, sit_out, name in PLAYER.iter_unpack(body[:split])
+            ]
+            tables.append({
+                'game_id': game_id,
+                'hand': hand_no,
+                'button': button,
+                'sm_blind': sm_blind,
+                'buy_in': buy_in,
+                'players': players,
+                'pots': list(POT.iter_unpack(body[split:])),
+            })
+            self.slots[game_id] = slot
+            self.written[game_id] = [[], [], None]
+            used.add(slot)
+        self.free = [slot for slot in range(self.capacity - 1, -1, -1) if slot not in used]
+        return tables
+
+    def write(self, game_id: int, header: tuple, entries: list[tuple[int, bytes]]) -> None:
+        slot = self.slots.get(game_id)
+        if slot is None:
+            if not self.free:
+                self.grow()
+            slot = self.slots[game_id] = self.free.pop()
+            self.written[game_id] = [[], [], None]
+        cache = self.written[game_id]
+        if cache[2] == header and cache[self.latest[slot]] == entries:
+            return #Nothing changed since the last checkpoint
+        self.sequence += 1
+        copy = self.latest[slot] ^ 1
+        self.latest[slot] = copy
+        start = slot * SLOT_SIZE + copy * COPY_SIZE
+        written = cache[copy]
+
+        for i, (offset, data) in enumerate(entries):
+            if i >= len(written) or written[i] != (offset, data):
+                self.map[start + offset:start + offset + len(data)] = data
+                self.bytes_written += len(data)
+        cache[copy], cache[2] = entries, header
+
+        fields = HEADER.pack(0, self.sequence, *header)[4:]
+        crc = zlib.crc32(b''.join(data for _, data in entries), zlib.crc32(fields))
+        self.map[start:start + HEADER.size] = crc.to_bytes(4) + fields
+        self.bytes_written += HEADER.size
+
+    def save(self, game) -> None:
+        players = game.players[:MAX_PLAYERS]
+        pots = game.pots[:MAX_POTS]
+        entries = [
+            (PLAYERS_AT + i * PLAYER.size, PLAYER.pack(p.seat, p.balance, p.sit_out, p.name.encode('utf-8')))
+            for i, p in enumerate(players)
+        ]
+        entries += [(POTS_AT + i * POT.size, POT.pack(pot.total, pot.seats)) for i, pot in enumerate(pots)]
+        hand_no = game.engine.hand_no if game.engine else 0
+        header = (1, game.id, hand_no, game.button, game.sm_blind, game.buy_in, len(players), len(pots))
+        with self.lock:
+            self.write(game.id, header, entries)
+
+    def release(self, game_id: int) -> None:
+        with self.lock:
+            if game_id not in self.slots:
+                return
+            self.write(game_id, (0, game_id, 0, -1, 0, 0, 0, 0), [])
+            self.free.append(self.slots.pop(game_id))
+            del self.written[game_id]
+
+    def sync(self) -> None:
+        with self.lock:
+            self.map.flush()
+        self.sync_timer = scheduler.call_later(settings.CHECKPOINT_SYNC_INTERVAL, self.sync)
+
+    def close(self) -> None:
+        scheduler.cancel(self.sync_timer)
+        with self.lock:
+            self.map.flush()
+            self.map.close()
+            self.file.close()
+
+checkpoints: Checkpoints | None = None
+
+# Opens (or creates) the checkpoint file and returns the tables it holds.
+def start(path: str) -> list[dict]:
+    global checkpoints
+    checkpoints = Checkpoints(path)
+    tables = checkpoints.restore()
+    checkpoints.sync_timer = scheduler.call_later(settings.CHECKPOINT_SYNC_INTERVAL, checkpoints.sync)
+    return tables
+
+def stop() -> None:
+    global checkpoints
+    if checkpoints:
+        checkpoints.close()
+        checkpoints = None
+
+# Call at hand boundaries only: mid-hand, bets are out of the balances.
+def save(game) -> None:
+    if checkpoints:
+        checkpoints.save(game)
+
+def release(game_id: int) -> None:
+    if checkpoints:
+        checkpoints.release(game_id)
+
+routing.on_close(release)
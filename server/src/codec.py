@@ -0,0 +1,134 @@
+from protocol import ProtocolError
+import struct
+
+# Messages between client and server. A frame's payload is a one byte opcode
+# followed by the message's fields: the fixed-size ones packed big-endian by
+# one precompiled Struct, then the strings (utf-8) and byte strings, each but
+# the last behind a 2 byte length (the last runs to the end of the frame).
+# SCHEMA is the only description of the wire format; the client and server
+# carry identical copies of this file, like protocol.py.
+#
+# Field types: 'B' u8, 'H' u16, 'I' u32, 's' string, 'y' bytes. Strings and
+# bytes come last.
+
+# Client to server
+USER = 1
+GAME_NEW = 2
+GAME_JOIN = 3
+GAME_WATCH = 4
+GAME_LEAVE = 5
+GAME_ACT = 6
+CHAT_SEND = 7
+TABLE_SYNC = 8
+
+# Server to client
+GAME_ID = 64
+CHAT_MSG = 65
+GAME_EVENT = 66
+ERROR = 67
+TABLE_SNAPSHOT = 68
+TABLE_DELTA = 69
+TABLE_HOLE = 70
+
+SCHEMA = {
+    USER: 's',              #username
+    GAME_NEW: 's',          #game type
+    GAME_JOIN: 'I',         #game id
+    GAME_WATCH: 'I',        #game id
+    GAME_LEAVE: 'I',        #game id
+    GAME_ACT: 'IBI',        #game id, ACTIONS index, amount
+    CHAT_SEND: 'Is',        #game id, text
+    TABLE_SYNC: 'I',        #game id
+    GAME_ID: 'I',           #game id
+    CHAT_MSG: 'ss',         #sender, text
+    GAME_EVENT: 's',        #table event, see logic.HoldemEngine
+    ERROR: 'Hs',            #code, message
+    TABLE_SNAPSHOT: 'IBy',  #version, your seat, tablestate changes
+    TABLE_DELTA: 'Iy',      #version, tablestate changes
+    TABLE_HOLE: 'y',        #your hole cards
+}
+
+ACTIONS = ('check', 'call', 'bet', 'raise', 'fold')
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+STRING = struct.Struct('!H')
+MAX_STRING = 0xFFFF
+
+# Lists indexed by opcode, so dispatch is one index and no hashing.
+def table(entries: dict) -> list:
+    lookup = [None] * 256
+    for opcode, entry in entries.items():
+        lookup[opcode] = entry
+    return lookup
+
+# Builds the encoder and decoder for one opcode up front, so encoding and
+# decoding a message is a single call with no per-message branching on the
+# schema.
+def compile_message(opcode: int, fields: str) -> tuple:
+    fixed_fields = fields.rstrip('sy')
+    tail = fields[len(fixed_fields):]
+    if 's' in fixed_fields or 'y' in fixed_fields:
+        raise ValueError(f'Strings and bytes must come last in {fields!r}.')
+    fixed = struct.Struct('!B' + fixed_fields)
+    pack, unpack_from, size = fixed.pack, fixed.unpack_from, fixed.size
+    count = len(fixed_fields)
+
+    match tail:
+        case '':
+            def encode(*values) -> bytes:
+                return pack(opcode, *values)
+            def decode(payload: bytes) -> tuple:
+                return unpack_from(payload)
+        case 's':
+            def encode(*values) -> bytes:
+                return pack(opcode, *values[:count]) + values[count].encode('utf-8')
+            def decode(payload: bytes) -> tuple:
+                return unpack_from(payload) + (str(payload[size:], 'utf-8'),)
+        case 'y':
+            def encode(*values) -> bytes:
+                return pack(opcode, *values[:count]) + values[count]
+            def decode(payload: bytes) -> tuple:
+                return unpack_from(payload) + (bytes(payload[size:]),)
+        case _:
+            def encode(*values) -> bytes:
+                parts = [pack(opcode, *values[:count])]
+                for kind, value in zip(tail, values[count:]):
+                    data = value.encode('utf-8') if kind == 's' else value
+                    if len(parts) == len(tail):
+                        parts.append(data) #The last one runs to the end
+                        break
+                    if len(data) > MAX_STRING:
+                        raise ProtocolError(f'Field of {len(data)} bytes exceeds {MAX_STRING}.')
+                    parts.append(STRING.pack(len(data)) + data)
+                return b''.join(parts)
+            def decode(payload: bytes) -> tuple:
+                message = unpack_from(payload)
+                offset = size
+                for kind in tail[:-1]:
+                    (length,) = STRING.unpack_from(payload, offset)
+                    offset += STRING.size
+                    if offset + length > len(payload):
+                        raise ProtocolError('Field runs past the end of the frame.')
+                    data = payload[offset:offset + length]
+                    message += (str(data, 'utf-8') if kind == 's' else bytes(data),)
+                    offset += length
+                data = payload[offset:]
+                return message + (str(data, 'utf-8') if tail[-1] == 's' else bytes(data),)
+    return encode, decode
+
+CODECS = table({opcode: compile_message(opcode, fields) for opcode, fields in SCHEMA.items()})
+ENCODERS = [entry and entry[0] for entry in CODECS]
+DECODERS = [entry and entry[1] for entry in CODECS]
+
+def encode(opcode: int, *fields) -> bytes:
+    return ENCODERS[opcode](*fields)
+
+# Returns (opcode, *fields).
+def decode(payload: bytes) -> tuple:
+    decoder = DECODERS[payload[0]] if payload else None
+    if decoder is None:
+        raise ProtocolError(f'Unknown opcode in {bytes(payload[:1])!r}.')
+    try:
+        return decoder(payload)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ProtocolError(str(e))
@@ -1,84 +1,128 @@
 from poker import logic
-import random
+import asyncio
+import checkpoint
+import codec
+import gameids
+import log
+import metrics
+import outbound
+import protocol
 import routing
+import shards
 import socket
+import threading
+from time import perf_counter_ns
+
+CONNECTIONS = log.category('connection')
+GAMES = log.category('game')
+ERRORS = log.category('error')
 
 clients = {}
+# Addresses of everyone in each game's room (seated players and spectators),
+# kept in step with join_game/leave_game so a broadcast needs no game call.
+rooms: dict[int, set[str]] = {}
 
 def handle_client(conn: socket.socket, addr: str, BUFFER_SIZE: int) -> None:
     addr = str(addr)
+    queued = outbound.QueuedConnection(conn)
+    frames = protocol.FrameBuffer(BUFFER_SIZE)
     while True:
         try:
-            raw_data = conn.recv(BUFFER_SIZE).decode('utf-8')
+            received = frames.recv_into(conn)
+            if not received: break
+            RECEIVED_BYTES.add(received)
+            for payload in frames:
+                dispatch(queued, addr, payload)
         except Exception as e:
-            print(e)
+            ERRORS('client', addr=addr, error=e)
             break
-        if not raw_data: break
-
-        attn, cmd, data = raw_data.split(':',2)
-        match attn:
-            case 'main':
-                if cmd == 'user': create_new_user(conn, addr, data); continue
-            case 'game':
-                match cmd:
-                    case 'msg':
-                        distribute_chat_message(addr, data)
-                        continue
-
-                    case 'new': 
-                        game_id = create_new_game(data)
-                        join_game(conn, addr, game_id)
-                        continue
-
-                    case 'join':
-                        join_game(conn, addr, data)
-                        continue
-
-                    case 'leave':
-                        leave_game(addr, data)
-                        continue
-
-    game_id = clients[addr]['game']
-    if game_id:
-        leave_game(addr, game_id)
 
-    conn.close()
-    print(f'Closed connection with {clients[addr]['username']}\n')
-    del clients[addr]
+    close_client(queued, addr)
+
+async def handle_client_async(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, BUFFER_SIZE: int) -> None:
+    conn = outbound.StreamConnection(writer)
+    addr = str(writer.get_extra_info('peername'))
+    frames = protocol.FrameBuffer(BUFFER_SIZE)
+    while True:
+        try:
+            data = await reader.read(BUFFER_SIZE)
+            if not data: break
+            RECEIVED_BYTES.add(len(data))
+            frames.feed(data)
+            for payload in frames:
+                dispatch(conn, addr, payload)
+            await writer.drain()
+        except Exception as e:
+            ERRORS('client', addr=addr, error=e)
+            break
+
+    close_client(conn, addr)
+
+def dispatch(conn: socket.socket, addr: str, payload: bytes) -> None:
+    opcode, *fields = codec.decode(payload)
+    handler = handlers[opcode]
+    if handler:
+        start = perf_counter_ns() if metrics.sampling else 0
+        handler(conn, addr, *fields)
+        if start:
+            dispatch_times[opcode].observe(perf_counter_ns() - start)
 
-def send_message(conn: socket.socket, message: str) -> None:
+def close_client(conn: socket.socket, addr: str) -> None:
+    client = clients.pop(addr, None)
     try:
-        message = message.encode('utf-8')
-        conn.sendall(message)
+        if client and client['game']:
+            leave_game(addr, client['game'])
+    finally:
+        conn.close()
+    if client:
+        CONNECTIONS('closed', addr=addr, user=client['username'])
+
+def send_message(conn: socket.socket, message: bytes, key: str | None = None, droppable: bool = False) -> None:
+    try:
+        conn.sendall(protocol.encode_frame(message), key, droppable)
     except Exception as e:
-        print(e)
+        ERRORS('send', error=e)
 
 # msg:
-def distribute_chat_message(addr: str, data: str) -> None:
-    game_id, message = data.split(':', 1)
+def distribute_chat_message(addr: str, game_id: int, message: str) -> None:
     try:
-        router = routing.get_router(int(game_id))
-        player_addresses = router.send_msg_to_game('get:players:')
+        members = rooms[game_id]
         sender = clients[addr]['username']
-        response = f'chat:msg:{sender}: {message}'
-        print('sending')
-        for address in player_addresses:
-            conn = clients[address]['connection']
-            send_message(conn, response)
-        print('sent')
     except Exception as e:
-        print(e)
+        ERRORS('chat', addr=addr, game=game_id, error=e)
+        return
+    broadcast(members, codec.encode(codec.CHAT_MSG, sender, message), True)
+
+# Frames the message once and queues it on every member's connection.
+def broadcast(members: set[str], message: bytes, droppable: bool = False) -> None:
+    frame = protocol.encode_frame(message)
+    for address in tuple(members):
+        client = clients.get(address)
+        if client:
+            try:
+                client['connection'].sendall(frame, None, droppable)
+            except Exception as e:
+                ERRORS('send', addr=address, error=e)
 
 # user:
 def create_new_user(conn:socket.socket, addr: str, username: str) -> None:
+    # Seats are checkpointed by username, in NAME_SIZE bytes.
+    if len(username.encode('utf-8')) > checkpoint.NAME_SIZE:
+        send_message(conn, codec.encode(codec.ERROR, 400, 'Username too long'))
+        return
     clients[addr] = {'username': username, 'connection': conn, 'game': None}
 
 # game:
+def new_game(conn: socket.socket, addr: str, type: str) -> None:
+    game_id = create_new_game(type)
+    if game_id:
+        join_game(conn, addr, game_id)
+
 def create_new_game(type: str):
-    game_id = random.randint(10000, 99999)
-    all_game_ids = [router.send_msg_to_game('get:id:') for router in routing.get_all_routers()]
-    while game_id in all_game_ids:
-        game_id = random.randint(10000, 99999)
+    game_id = gameids.allocate()
+    if game_id is None:
+        GAMES('no_free_ids')
+        return None
 
     logic.create_game(type, game_id)
     router = routing.get_router(game_id)
@@ -90,34 +134,156 @@ def join_game(conn: socket.socket, addr: str, game_id: int) -> str:
         game_id = int(game_id)
         router = routing.get_router(game_id)
     except Exception as e:
-        print(e)
+        ERRORS('join', addr=addr, game=game_id, error=e)
         return
     
     prev_game_id = clients[addr]['game']
     if prev_game_id:
         leave_game(addr, prev_game_id)
-    game_message = f'player:add:{addr}'
-    response = router.send_msg_to_game(game_message)
+    game_message = f'player:add:{addr}|{clients[addr]['username']}'
+
+    # Runs when the game answers, which with an async router is later and
+    # on a router worker.
+    def joined(response: dict) -> None:
+        if response['code'] == '400':
+            client_message = codec.encode(codec.ERROR, 400, response['message'])
+            send_message(conn, client_message)
+            return
+        if addr not in clients:
+            router.post_to_game(f'player:rmv:{addr}')
+            return
+
+        join_room(addr, game_id)
+        client_message = codec.encode(codec.GAME_ID, game_id)
+        send_message(conn, client_message)
+        sync_table(conn, addr, game_id)
 
-    if response['code'] == '400':
-        client_message = f'error:{response['message']}'
+    router.post_to_game(game_message, joined)
+
+# Joins a game's room as a spectator: chat and broadcasts, but no seat.
+def watch_game(conn: socket.socket, addr: str, game_id: str) -> None:
+    try:
+        game_id = int(game_id)
+        routing.get_router(game_id)
+    except Exception as e:
+        ERRORS('watch', addr=addr, game=game_id, error=e)
         return
 
+    prev_game_id = clients[addr]['game']
+    if prev_game_id:
+        leave_game(addr, prev_game_id)
+    join_room(addr, game_id)
+    send_message(conn, codec.encode(codec.GAME_ID, game_id))
+    sync_table(conn, addr, game_id)
+
+# Sends the table's current state, which the client then keeps up to date
+# from the deltas broadcast to the room. Also how a client that missed a
+# delta catches up.
+def sync_table(conn: socket.socket, addr: str, game_id: int) -> None:
+    try:
+        router = routing.get_router(game_id)
+    except Exception as e:
+        ERRORS('sync', addr=addr, game=game_id, error=e)
+        return
+
+    def synced(state: tuple | None) -> None:
+        if not state:
+            return
+        version, seat, changes, hole = state
+        send_message(conn, codec.encode(codec.TABLE_SNAPSHOT, version, seat, changes))
+        if hole:
+            send_message(conn, codec.encode(codec.TABLE_HOLE, hole))
+
+    router.post_to_game(f'get:state:{addr}', synced)
+
+def join_room(addr: str, game_id: int) -> None:
     clients[addr]['game'] = game_id
-    client_message = f'main:game_id:{game_id}'
-    send_message(conn, client_message)
+    rooms.setdefault(game_id, set()).add(addr)
+
+# A reaped table takes its room with it. Members still pointing at it are
+# let go, so a later join or disconnect does not go looking for its router.
+def close_room(game_id: int) -> None:
+    for addr in rooms.pop(game_id, ()):
+        client = clients.get(addr)
+        if client and client['game'] == game_id:
+            client['game'] = None
+
+def leave_room(addr: str, game_id: int) -> None:
+    members = rooms.get(game_id)
+    if members:
+        members.discard(addr)
+    client = clients.get(addr)
+    if client and client['game'] == game_id:
+        client['game'] = None
 
 def leave_game(addr: str, game_id: str) -> None:
     try:
         game_id = int(game_id)
     except Exception as e:
-        print(e)
+        ERRORS('leave', addr=addr, game=game_id, error=e)
         return
-    message = f'player:rmv:{addr}'
-    router = routing.get_router(game_id)
-    response = router.send_msg_to_game(message)
+    leave_room(addr, game_id)
+    try:
+        router = routing.get_router(game_id)
+    except Exception as e:
+        ERRORS('leave', addr=addr, game=game_id, error=e)
+        return
+    router.post_to_game(f'player:rmv:{addr}')
+
+# action:
+def act_in_game(addr: str, game_id: int, action: int, amount: int) -> None:
+    try:
+        router = routing.get_router(game_id)
+        action = codec.ACTIONS[action]
+    except Exception as e:
+        ERRORS('act', addr=addr, game=game_id, error=e)
+        return
+    router.post_to_game(f'player:act:{action}:{amount}:{addr}')
+
+# Game events (showdowns, winnings, errors) arrive as '{addr}:game:{event}',
+# table state from poker.publisher as tuples.
+def handle_game(data: str | tuple) -> None:
+    match data:
+        case str():
+            addr, _, event = data.partition(':game:')
+            client = clients.get(addr)
+            if client:
+                send_message(client['connection'], codec.encode(codec.GAME_EVENT, event))
+        case ('delta', game_id, version, changes):
+            members = rooms.get(game_id)
+            if members:
+                broadcast(members, codec.encode(codec.TABLE_DELTA, version, changes))
+        case ('hole', addr, cards):
+            client = clients.get(addr)
+            if client:
+                send_message(client['connection'], codec.encode(codec.TABLE_HOLE, cards))
+
+handlers = codec.table({
+    codec.USER: create_new_user,
+    codec.GAME_NEW: new_game,
+    codec.GAME_JOIN: join_game,
+    codec.GAME_WATCH: watch_game,
+    codec.GAME_LEAVE: lambda conn, addr, game_id: leave_game(addr, game_id),
+    codec.GAME_ACT: lambda conn, addr, *fields: act_in_game(addr, *fields),
+    codec.CHAT_SEND: lambda conn, addr, *fields: distribute_chat_message(addr, *fields),
+    codec.TABLE_SYNC: sync_table,
+})
 
+RECEIVED_BYTES = metrics.counter('socket.received_bytes')
+# How long each client message's handler takes, by opcode.
+dispatch_times = codec.table({
+    opcode: metrics.histogram(f'dispatch.{name.lower()}')
+    for name, opcode in vars(codec).items()
+    if type(opcode) is int and opcode in codec.SCHEMA and handlers[opcode]
+})
+metrics.gauge('outbound', outbound.metrics)
+metrics.gauge('clients', lambda: len(clients))
+metrics.gauge('rooms', lambda: len(rooms))
 
+# Tables brought back from a checkpoint, here or in a shard.
+def restore_tables(game_ids: list[int]) -> None:
+    for game_id in game_ids:
+        routing.get_router(game_id).register_server_handler(handle_game)
 
-def handle_game(data: str) -> None:
-    pass
\ No newline at end of file
+routing.on_close(close_room)
+shards.on_restore(lambda game_id: restore_tables([game_id]))
\ No newline at end of file
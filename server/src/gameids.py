@@ -0,0 +1,46 @@
+from array import array
+import random
+import routing
+import threading
+
+# Hands out the 5 digit game ids from a shuffled free-list, so creating a
+# table is O(1) however many are open. Ids come back when the table's router
+# closes and are swapped into a random slot, keeping the order unguessable.
+
+FIRST_ID = 10000
+LAST_ID = 99999
+
+free = array('I')
+filled = False
+lock = threading.Lock()
+rng = random.Random()
+
+def fill() -> None:
+    global filled
+    filled = True
+    free.extend(range(FIRST_ID, LAST_ID + 1))
+    for i in range(len(free) - 1, 0, -1):
+        j = rng.randint(0, i)
+        free[i], free[j] = free[j], free[i]
+
+# Returns None once every id is in use.
+def allocate() -> int | None:
+    with lock:
+        if not filled:
+            fill()
+        while free:
+            game_id = free.pop()
+            # Skips ids someone registered without going through here.
+            if game_id not in routing.routers:
+                return game_id
+        return None
+
+def release(game_id: int) -> None:
+    if not filled or not FIRST_ID <= game_id <= LAST_ID:
+        return
+    with lock:
+        free.append(game_id)
+        i = rng.randint(0, len(free) - 1)
+        free[i], free[-1] = free[-1], free[i]
+
+routing.on_close(release)
@@ -0,0 +1,210 @@
+import mmap
+import os
+import queue
+import settings
+import struct
+import threading
+import time
+from itertools import starmap
+
+# Append-only hand history. The engine hands each finished hand to record(),
+# which only queues it; one writer thread encodes the hands, appends them to
+# '{name}-{sequence}.hands' and fsyncs at most every HISTORY_FSYNC_INTERVAL
+# seconds. Files rotate at HISTORY_MAX_BYTES, and a restart always begins a
+# new file, so a torn tail is never written after.
+#
+# A hand is one record of fixed layouts:
+#   RECORD   size, game id, hand number, time, button, seat count, board
+#            (padded with NO_CARD), action count
+#   SEAT     per seat: seat, balance before and after the hand, hole cards
+#   ACTION   per action: street, seat, ACTIONS index, bet after the action
+# Each data file has a sidecar '.idx' of INDEX entries (game id, hand number,
+# offset), so HandLog can mmap the data and jump straight to any hand. Game
+# ids are recycled and a new table starts again at hand 1, so one game id and
+# hand number can name several hands; lookups return all of them, and their
+# times tell the tables apart.
+
+RECORD = struct.Struct('!IIIdBB5sH')
+SEAT = struct.Struct('!BII2s')
+ACTION = struct.Struct('!BBBI')
+INDEX = struct.Struct('!IIQ')
+
+NO_CARD = 255
+NO_CARDS = bytes((NO_CARD,))
+ACTIONS = ('check', 'call', 'bet', 'raise', 'fold', 'blind') #codec.ACTIONS, plus blinds
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+STREETS = ('preflop', 'flop', 'turn', 'river')
+
+def encode_hand(game_id: int, hand_no: int, when: float, button: int, board: list, seats: list, actions: list) -> bytes:
+    size = RECORD.size + len(seats) * SEAT.size + len(actions) * ACTION.size
+    cards = bytes(board).ljust(5, NO_CARDS)
+    parts = [RECORD.pack(size, game_id, hand_no, when, button, len(seats), cards, len(actions))]
+    for seat, before, after, hole in seats:
+        parts.append(SEAT.pack(seat, before, after, bytes(hole)))
+    parts.extend(starmap(ACTION.pack, actions))
+    return b''.join(parts)
+
+# Returns the hand at offset as a dict, and the offset of the next one. Seats
+# are (seat, before, after, hole bytes), actions are ACTION tuples.
+def decode_hand(data, offset: int) -> tuple[dict, int]:
+    size, game_id, hand_no, when, button, seat_count, board, _ = RECORD.unpack_from(data, offset)
+    start = offset + RECORD.size
+    middle = start + seat_count * SEAT.size
+    end = offset + size
+    hand = {
+        'game_id': game_id,
+        'hand': hand_no,
+        'time': when,
+        'button': button,
+        'board': board.rstrip(NO_CARDS),
+        'seats': list(SEAT.iter_unpack(data[start:middle])),
+        'actions': list(ACTION.iter_unpack(data[middle:end])),
+    }
+    return hand, end
+
+def file_path(directory: str, name: str, sequence: int, kind: str) -> str:
+    return os.path.join(directory, f'{name}-{sequence:06d}.{kind}')
+
+# Data files of one writer in the order they were written.
+def list_logs(directory: str, name: str = 'hands') -> list[str]:
+    files = sorted(f for f in os.listdir(directory) if f.startswith(f'{name}-') and f.endswith('.hands'))
+    return [os.path.join(directory, f) for f in files]
+
+class HistoryWriter:
+    def __init__(self, directory: str, name: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        existing = list_logs(directory, name)
+        self.sequence = int(existing[-1].rsplit('-', 1)[1].split('.')[0]) if existing else 0
+        self.data = self.index = None
+        self.offset = 0
+        self.queue = queue.SimpleQueue()
+        self.open_next()
+        self.thread = threading.Thread(target=self.run, name='history', daemon=True)
+        self.thread.start()
+
+    def open_next(self) -> None:
+        if self.data:
+            self.sync()
+            self.data.close()
+            self.index.close()
+        self.sequence += 1
+        self.data = open(file_path(self.directory, self.name, self.sequence, 'hands'), 'ab')
+        self.index = open(file_path(self.directory, self.name, self.sequence, 'idx'), 'ab')
+        self.offset = 0
+
+    def sync(self) -> None:
+        # Data first, so the index never points past what is on disk.
+        self.data.flush()
+        os.fsync(self.data.fileno())
+        self.index.flush()
+        os.fsync(self.index.fileno())
+
+    def run(self) -> None:
+        interval = settings.HISTORY_FSYNC_INTERVAL
+        dirty = False
+        last_sync = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=interval if dirty else None)
+            except queue.Empty:
+                item = ()
+            batch = [item]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            waiters = []
+            for item in batch:
+                match item:
+                    case (game_id, hand_no, *_):
+                        record = encode_hand(*item)
+                        self.data.write(record)
+                        self.index.write(INDEX.pack(game_id, hand_no, self.offset))
+                        self.offset += len(record)
+                        dirty = True
+                        if self.offset >= settings.HISTORY_MAX_BYTES:
+                            self.open_next()
+                    case threading.Event():
+                        waiters.append(item)
+
+            if dirty and (waiters or None in batch or time.monotonic() - last_sync >= interval):
+                self.sync()
+                dirty = False
+                last_sync = time.monotonic()
+            for waiter in waiters:
+                waiter.set()
+            if None in batch:
+                self.data.close()
+                self.index.close()
+                return
+
+    # Blocks until everything recorded so far is on disk.
+    def flush(self) -> None:
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+
+# Reads one data file through mmap. The index is loaded on first lookup.
+class HandLog:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.offsets = None
+
+    def load_index(self) -> dict[tuple[int, int], list[int]]:
+        with open(self.path[:-len('hands')] + 'idx', 'rb') as index:
+            entries = index.read()
+        whole = len(entries) - len(entries) % INDEX.size
+        offsets = {}
+        for game_id, hand_no, offset in INDEX.iter_unpack(entries[:whole]):
+            offsets.setdefault((game_id, hand_no), []).append(offset)
+        return offsets
+
+    # Every hand recorded under the game id and hand number, oldest first.
+    def hands(self, game_id: int, hand_no: int) -> list[dict]:
+        if self.offsets is None:
+            self.offsets = self.load_index()
+        return [decode_hand(self.data, offset)[0] for offset in self.offsets.get((game_id, hand_no), ())]
+
+    def __iter__(self):
+        data, offset, end = self.data, 0, len(self.data)
+        while offset + RECORD.size <= end:
+            size = RECORD.unpack_from(data, offset)[0]
+            if offset + size > end:
+                break #Torn tail from a crash
+            hand, offset = decode_hand(data, offset)
+            yield hand
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+writer: HistoryWriter | None = None
+
+def start(directory: str, name: str = 'hands') -> None:
+    global writer
+    if writer is None:
+        writer = HistoryWriter(directory, name)
+
+def stop() -> None:
+    global writer
+    if writer:
+        writer.stop()
+        writer = None
+
+# seats is [(seat, balance before, balance after, hole cards)], actions is
+# [(street, seat, ACTIONS index, bet after)]. Does nothing unless started.
+def record(game_id: int, hand_no: int, button: int, board: list, seats: list, actions: list) -> None:
+    if writer:
+        writer.queue.put((game_id, hand_no, time.time(), button, board, seats, actions))
@@ -0,0 +1,152 @@
+import atexit
+import itertools
+import json
+import queue
+import settings
+import sys
+import threading
+import time
+
+# Structured logging off the serving threads. A record is a category, an
+# event name and keyword fields. Calling a category only checks its
+# switches and queues the raw values; one writer thread turns the records
+# into JSON lines and writes them out. Nothing is formatted on the calling
+# thread, and a slow terminal or pipe backs up the queue instead of the
+# game: past LOG_QUEUE_LIMIT queued records, new ones are dropped and
+# counted, and the writer reports the drops.
+#
+# Each category is set from LOG_CATEGORIES:
+#   enabled  False skips the record before anything is built; call sites
+#            with costly fields can check it first
+#   sample   keep one record in N
+#   rate     at most this many records a second, 0 for no limit
+# The drop counts are kept without a lock, so they are best effort.
+
+BATCH = 1000 #Records formatted between writes
+
+records = queue.SimpleQueue()
+categories: dict[str, 'Category'] = {}
+writer: 'LogWriter | None' = None
+writer_lock = threading.Lock()
+
+class Category:
+    __slots__ = ('name', 'enabled', 'sample', 'rate', 'ticks', 'second', 'in_second', 'dropped')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ticks = itertools.count()
+        self.second = 0
+        self.in_second = 0
+        self.dropped = 0
+        self.set()
+
+    def set(self, enabled: bool = True, sample: int = 1, rate: int = 0) -> None:
+        self.enabled = enabled
+        self.sample = sample
+        self.rate = rate
+
+    def __call__(self, event: str, **fields) -> None:
+        if not self.enabled:
+            return
+        if self.sample > 1 and next(self.ticks) % self.sample:
+            return
+        if self.rate:
+            second = int(time.monotonic())
+            if second != self.second:
+                self.second, self.in_second = second, 0
+            if self.in_second >= self.rate:
+                self.dropped += 1
+                return
+            self.in_second += 1
+        if records.qsize() >= settings.LOG_QUEUE_LIMIT:
+            self.dropped += 1
+            return
+        if writer is None:
+            start()
+        records.put((time.time(), self.name, event, fields))
+
+def category(name: str) -> Category:
+    if name not in categories:
+        categories[name] = Category(name)
+        categories[name].set(**settings.LOG_CATEGORIES.get(name, {}))
+    return categories[name]
+
+# Re-reads LOG_CATEGORIES into every category, after settings change.
+def apply_settings() -> None:
+    for name, entry in categories.items():
+        entry.set(**settings.LOG_CATEGORIES.get(name, {}))
+
+def describe(value) -> str:
+    if isinstance(value, BaseException):
+        return f'{type(value).__name__}: {value}'
+    return str(value)
+
+def format_record(when: float, name: str, event: str, fields: dict) -> str:
+    return json.dumps({'time': round(when, 3), 'category': name, 'event': event, **fields}, default=describe)
+
+class LogWriter:
+    def __init__(self, path: str):
+        self.file = open(path, 'a', encoding='utf-8') if path else None
+        self.stream = self.file or sys.stdout
+        self.reported = {}
+        self.thread = threading.Thread(target=self.run, name='log', daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while True:
+            batch = [records.get()]
+            while len(batch) < BATCH:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines, waiters = [], []
+            for item in batch:
+                match item:
+                    case (when, name, event, fields):
+                        lines.append(format_record(when, name, event, fields))
+                    case threading.Event():
+                        waiters.append(item)
+            dropped = {name: entry.dropped - self.reported.get(name, 0) for name, entry in list(categories.items())}
+            dropped = {name: count for name, count in dropped.items() if count}
+            if dropped:
+                self.reported.update({name: categories[name].dropped for name in dropped})
+                lines.append(format_record(time.time(), 'log', 'dropped', dropped))
+            try:
+                if lines:
+                    self.stream.write('\n'.join(lines) + '\n')
+                    self.stream.flush()
+            except (OSError, ValueError):
+                pass #Nowhere left to write to
+            for waiter in waiters:
+                waiter.set()
+            if None in batch:
+                if self.file:
+                    self.file.close()
+                return
+
+def start(path: str | None = None) -> None:
+    global writer
+    with writer_lock:
+        if writer is None:
+            writer = LogWriter(settings.LOG_PATH if path is None else path)
+
+# Blocks until everything logged so far is written, or timeout.
+def flush(timeout: float | None = None) -> None:
+    if writer:
+        done = threading.Event()
+        records.put(done)
+        done.wait(timeout)
+
+def stop() -> None:
+    global writer
+    if writer:
+        records.put(None)
+        writer.thread.join(1)
+        writer = None
+
+def summary() -> dict:
+    return {'queued': records.qsize(), 'dropped': {name: entry.dropped for name, entry in categories.items()}}
+
+atexit.register(flush, 1)
@@ -0,0 +1,141 @@
+import json
+import scheduler
+import settings
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import get_ident
+
+# Counters, gauges and latency histograms for the hot paths. Counters and
+# histograms keep one cell per thread that only that thread writes, so
+# recording is a dict lookup and an add with no lock; snapshot() sums the
+# cells. Histogram buckets are powers of two of nanoseconds, so a sample's
+# bucket is its bit length: bucket i holds samples under 2**i ns. Gauges are
+# functions called when a snapshot is taken.
+#
+# Reading the clock costs more than much of what it would time, so latency
+# is sampled in windows: once started, a timer turns 'sampling' on for
+# METRICS_WINDOW seconds out of every METRICS_SAMPLE windows, and the rest
+# of the time a hot path only checks the flag:
+#   start = perf_counter_ns() if metrics.sampling else 0
+#   ...
+#   if start:
+#       HISTOGRAM.observe(perf_counter_ns() - start)
+
+BUCKETS = 40 #The last one takes everything from 2**38 ns (about 4.6 minutes)
+
+sampling = False
+sample_timer = None
+
+registry_lock = threading.Lock()
+counters: dict[str, 'Counter'] = {}
+histograms: dict[str, 'Histogram'] = {}
+gauges: dict = {}
+
+class Counter:
+    __slots__ = ('cells',)
+
+    def __init__(self):
+        self.cells: dict[int, list[int]] = {}
+
+    def add(self, amount: int = 1) -> None:
+        cell = self.cells.get(get_ident())
+        if cell is None:
+            cell = self.cells[get_ident()] = [0]
+        cell[0] += amount
+
+    def value(self) -> int:
+        return sum(cell[0] for cell in list(self.cells.values()))
+
+class Histogram:
+    __slots__ = ('cells',)
+
+    def __init__(self):
+        self.cells: dict[int, list[int]] = {} #BUCKETS counts, then the total ns
+
+    def observe(self, ns: int) -> None:
+        cell = self.cells.get(get_ident())
+        if cell is None:
+            cell = self.cells[get_ident()] = [0] * (BUCKETS + 1)
+        bucket = ns.bit_length()
+        cell[bucket if bucket < BUCKETS else BUCKETS - 1] += 1
+        cell[BUCKETS] += ns
+
+    def totals(self) -> list[int]:
+        return [sum(column) for column in zip(*list(self.cells.values()))] or [0] * (BUCKETS + 1)
+
+    # Samples, mean and the bucket bounds holding each percentile, in seconds.
+    def summary(self) -> dict:
+        totals = self.totals()
+        count = sum(totals[:BUCKETS])
+        summary = {'samples': count, 'mean': totals[BUCKETS] / count / 1e9 if count else 0.0}
+        for pct in (50, 90, 99, 100):
+            rank, seen = count * pct / 100, 0
+            for bucket, samples in enumerate(totals[:BUCKETS]):
+                seen += samples
+                if samples and seen >= rank:
+                    summary[f'p{pct}' if pct < 100 else 'max'] = (1 << bucket) / 1e9
+                    break
+        summary['buckets'] = {f'{(1 << bucket) / 1e9:g}': samples for bucket, samples in enumerate(totals[:BUCKETS]) if samples}
+        return summary
+
+# Instruments are looked up once, at import, by the module that records them.
+def counter(name: str) -> Counter:
+    with registry_lock:
+        return counters.setdefault(name, Counter())
+
+def histogram(name: str) -> Histogram:
+    with registry_lock:
+        return histograms.setdefault(name, Histogram())
+
+def gauge(name: str, read) -> None:
+    gauges[name] = read
+
+def snapshot() -> dict:
+    return {
+        'counters': {name: counter.value() for name, counter in sorted(counters.items())},
+        'gauges': {name: read() for name, read in sorted(gauges.items())},
+        'histograms': {name: histogram.summary() for name, histogram in sorted(histograms.items())},
+        'sampled': f'{settings.METRICS_WINDOW}s in every {settings.METRICS_WINDOW * settings.METRICS_SAMPLE:g}s',
+    }
+
+def reset() -> None:
+    for instrument in (*counters.values(), *histograms.values()):
+        instrument.cells.clear()
+
+def flip() -> None:
+    global sampling, sample_timer
+    sampling = not sampling
+    windows = 1 if sampling else settings.METRICS_SAMPLE - 1
+    sample_timer = scheduler.call_later(settings.METRICS_WINDOW * windows, flip)
+
+def start() -> None:
+    if sample_timer is None:
+        flip()
+
+def stop() -> None:
+    global sampling, sample_timer
+    scheduler.cancel(sample_timer)
+    sampling, sample_timer = False, None
+
+# GET /stats on the stats port answers with snapshot() as JSON.
+class StatsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.rstrip('/') not in ('', '/stats'):
+            self.send_error(404)
+            return
+        body = json.dumps(snapshot(), indent=1).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+def serve(host: str, port: int) -> ThreadingHTTPServer:
+    start()
+    server = ThreadingHTTPServer((host, port), StatsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stats', daemon=True).start()
+    return server
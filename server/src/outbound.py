@@ -0,0 +1,212 @@
+from abc import ABC, abstractmethod
+import asyncio
+import collections
+import metrics as stats
+import settings
+import socket
+import threading
+import time
+from time import perf_counter_ns
+
+# Outbound side of every client connection. Both connection types take
+# frames through sendall(data, key, droppable) and keep what the client has
+# not read yet bounded:
+#   - a keyed frame (table state) replaces a still-queued frame with the
+#     same key instead of queueing behind it;
+#   - above SEND_QUEUE_HIGH bytes, droppable frames (chat) are dropped;
+#   - a client that stays above the high watermark for SLOW_CLIENT_TIMEOUT
+#     seconds, or reaches SEND_QUEUE_LIMIT, is evicted;
+#   - dropping back to SEND_QUEUE_LOW clears the slow state.
+
+# Lets sendall try the socket without blocking while the reader thread keeps
+# its blocking recv. Where the flag does not exist (Windows), sendall never
+# writes to the socket itself and every frame goes through the writer.
+MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', None)
+
+totals = {'dropped': 0, 'coalesced': 0, 'evicted': 0}
+totals_lock = threading.Lock()
+connections = set()
+# Writer threads' socket writes, sampled like the other hot paths. The
+# non-blocking send in sendall runs once per frame per recipient, the most
+# of any line in the server, so it is not timed; like the asyncio writes it
+# only adds to the connection's sent bytes.
+WRITER_SEND = stats.histogram('socket.writer_send')
+WRITER_BYTES = stats.counter('socket.writer_bytes')
+
+def count(name: str, amount: int = 1) -> None:
+    with totals_lock:
+        totals[name] += amount
+
+# Queue depth across open connections plus drop and eviction counts.
+def metrics() -> dict:
+    depths = [conn.depth() for conn in list(connections)]
+    return {
+        'connections': len(depths),
+        'queued_bytes': sum(depths),
+        'max_queued_bytes': max(depths, default=0),
+        'slow_clients': sum(depth > settings.SEND_QUEUE_HIGH for depth in depths),
+        'sent_bytes': sum(conn.sent for conn in list(connections)),
+        **totals,
+    }
+
+class Backpressure(ABC):
+    def __init__(self):
+        self.slow_since = None
+        self.sent = 0 #Bytes handed to the socket or transport
+
+    # Returns False when the frame should not be queued.
+    def admit(self, depth: int, size: int, droppable: bool) -> bool:
+        if depth + size <= settings.SEND_QUEUE_HIGH:
+            return True
+        now = time.monotonic()
+        if self.slow_since is None:
+            self.slow_since = now
+        if depth + size > settings.SEND_QUEUE_LIMIT or now - self.slow_since > settings.SLOW_CLIENT_TIMEOUT:
+            self.evict()
+            return False
+        if droppable:
+            count('dropped')
+            return False
+        return True
+
+    def drained(self, depth: int) -> None:
+        if depth <= settings.SEND_QUEUE_LOW:
+            self.slow_since = None
+
+    # Drops the client, which admit() has found too slow.
+    @abstractmethod
+    def evict(self) -> None:
+        ...
+
+# Threaded mode. sendall writes straight to the socket while it has room and
+# otherwise queues the rest for a writer thread per connection, so a stalled
+# client holds up only its own writer instead of whoever is broadcasting.
+class QueuedConnection(Backpressure):
+    def __init__(self, conn: socket.socket):
+        super().__init__()
+        self.conn = conn
+        self.condition = threading.Condition()
+        self.frames = collections.deque() #[key, data] entries
+        self.keyed: dict[str, list] = {}
+        self.queued = 0
+        self.closed = False
+        self.evicted = False
+        self.writer = threading.Thread(target=self.write, daemon=True)
+        self.writer.start()
+        connections.add(self)
+
+    def depth(self) -> int:
+        return self.queued
+
+    def sendall(self, data: bytes, key: str | None = None, droppable: bool = False) -> None:
+        with self.condition:
+            if self.closed:
+                return
+            if not self.queued and MSG_DONTWAIT is not None:
+                try:
+                    sent = self.conn.send(data, MSG_DONTWAIT)
+                except BlockingIOError:
+                    sent = 0
+                except OSError:
+                    return
+                self.sent += sent
+                if sent == len(data):
+                    return
+                data = data[sent:]
+                key = None #A partly sent frame must go out as is
+
+            entry = self.keyed.get(key) if key else None
+            if entry:
+                self.queued += len(data) - len(entry[1])
+                entry[1] = data
+                count('coalesced')
+                return
+            if not self.admit(self.queued, len(data), droppable):
+                return
+            entry = [key, data]
+            self.frames.append(entry)
+            if key:
+                self.keyed[key] = entry
+            self.queued += len(data)
+            self.condition.notify()
+
+    def write(self) -> None:
+        while True:
+            with self.condition:
+                while not self.frames and not self.closed:
+                    self.condition.wait()
+                if self.evicted or not self.frames:
+                    break
+                # Everything queued so far goes out in one write.
+                batch = b''.join(entry[1] for entry in self.frames)
+                self.frames.clear()
+                self.keyed.clear()
+            start = perf_counter_ns() if stats.sampling else 0
+            try:
+                self.conn.sendall(batch)
+            except OSError:
+                break
+            if start:
+                WRITER_SEND.observe(perf_counter_ns() - start)
+            WRITER_BYTES.add(len(batch))
+            with self.condition:
+                self.sent += len(batch)
+                self.queued -= len(batch)
+                self.drained(self.queued)
+        connections.discard(self)
+        self.conn.close()
+
+    def evict(self) -> None:
+        self.evicted = True
+        self.close()
+        count('evicted')
+        # Wakes the reader so the client is torn down like any disconnect.
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+# Asyncio mode. The transport already buffers without blocking; this gives
+# the StreamWriter the socket methods used by send_message and applies the
+# same limits to the transport's write buffer. Frames are not coalesced once
+# they are in the transport.
+class StreamConnection(Backpressure):
+    def __init__(self, writer: asyncio.StreamWriter):
+        super().__init__()
+        self.writer = writer
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        connections.add(self)
+
+    def depth(self) -> int:
+        return self.writer.transport.get_write_buffer_size()
+
+    def sendall(self, data: bytes, key: str | None = None, droppable: bool = False) -> None:
+        # Game events can be sent from the scheduler thread.
+        if threading.get_ident() == self.thread_id:
+            self.write(data, droppable)
+        else:
+            self.loop.call_soon_threadsafe(self.write, data, droppable)
+
+    def write(self, data: bytes, droppable: bool) -> None:
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        depth = transport.get_write_buffer_size()
+        self.drained(depth)
+        if self.admit(depth, len(data), droppable):
+            self.writer.write(data)
+            self.sent += len(data)
+
+    def evict(self) -> None:
+        count('evicted')
+        self.writer.transport.abort()
+
+    def close(self) -> None:
+        connections.discard(self)
+        self.writer.close()
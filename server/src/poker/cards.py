@@ -0,0 +1,108 @@
+from array import array
+import random
+
+# A card is an int 0-51, rank * 4 + suit, matching poker.evaluator. Sets of
+# cards (hands, boards, dead cards) are 52 bit masks with bit n for card n.
+
+class Card(int):
+    __slots__ = ()
+
+    rank_reprs = {
+        0 : "2", 1 : "3",
+        2 : "4", 3 : "5",
+        4 : "6", 5 : "7",
+        6 : "8", 7 : "9",
+        8 : "10", 9 : "J",
+        10 : "Q", 11 : "K",
+        12 : "A",
+    }
+
+    suit_reprs = {
+        0 : "\u2660",
+        1 : "\u2663",
+        2 : "\u2665",
+        3 : "\u2666",
+    }
+
+    def __new__(cls, rank: int, suit: int):
+        return super().__new__(cls, rank * 4 + suit)
+
+    @property
+    def rank(self) -> int:
+        return self >> 2
+
+    @property
+    def suit(self) -> int:
+        return self & 3
+
+    def __repr__(self):
+        return f'{self.suit_reprs[self.suit]}{self.rank_reprs[self.rank]}'
+
+CARDS = [Card(code >> 2, code & 3) for code in range(52)]
+
+def to_mask(cards: list[int]) -> int:
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+    return mask
+
+def from_mask(mask: int) -> list[Card]:
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(CARDS[low.bit_length() - 1])
+        mask ^= low
+    return cards
+
+# The deck keeps all 52 cards in one preallocated array. Dealing swaps a
+# random undealt card to the top and advances past it (a partial
+# Fisher-Yates shuffle), so reset only has to rewind the top index.
+class Deck:
+    __slots__ = ('cards', 'top', 'random')
+
+    def __init__(self, rng: random.Random | None = None):
+        self.cards = array('B', range(52))
+        self.top = 0
+        self.random = (rng or random).random
+
+    def __len__(self) -> int:
+        return 52 - self.top
+
+    def deal(self) -> Card:
+        top = self.top
+        if top == 52:
+            raise IndexError('The deck is empty.')
+        cards = self.cards
+        pick = top + int(self.random() * (52 - top))
+        cards[top], cards[pick] = cards[pick], cards[top]
+        self.top = top + 1
+        return CARDS[cards[top]]
+
+    def deal_many(self, count: int) -> list[Card]:
+        start = self.top
+        if start + count > 52:
+            raise IndexError('Not enough cards left in the deck.')
+        cards, rand = self.cards, self.random
+        dealt = []
+        for top in range(start, start + count):
+            pick = top + int(rand() * (52 - top))
+            cards[top], cards[pick] = cards[pick], cards[top]
+            dealt.append(CARDS[cards[top]])
+        self.top = start + count
+        return dealt
+
+    # Moves the cards in mask (e.g. known hole cards) out of the undealt
+    # part of the deck.
+    def remove(self, mask: int) -> None:
+        cards = self.cards
+        for index in range(self.top, 52):
+            if mask >> cards[index] & 1:
+                top = self.top
+                cards[top], cards[index] = cards[index], cards[top]
+                self.top = top + 1
+
+    def dealt(self) -> int:
+        return to_mask(self.cards[:self.top])
+
+    def reset(self) -> None:
+        self.top = 0
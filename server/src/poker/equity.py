@@ -0,0 +1,153 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, islice
+from math import comb, sqrt
+from poker import evaluator
+import os
+import random
+from statistics import NormalDist
+
+# Runout counts up to EXHAUSTIVE_LIMIT are enumerated instead of sampled, and
+# anything up to INLINE_LIMIT runouts is cheaper to score in-process than to
+# ship to the pool.
+EXHAUSTIVE_LIMIT = 50000
+INLINE_LIMIT = 5000
+BATCH_SIZE = 2000
+DEFAULT_TRIALS = 100000
+
+pool: ProcessPoolExecutor | None = None
+pool_workers = 0
+
+class Equity:
+    def __init__(self, shares: list[float], trials: int, margin: float, exhaustive: bool):
+        self.equities = [share / trials for share in shares]
+        self.trials = trials
+        self.margin = margin
+        self.exhaustive = exhaustive
+
+    def __repr__(self):
+        equities = ', '.join(f'{e:.3f}' for e in self.equities)
+        return f'Equity([{equities}], trials={self.trials}, margin={self.margin:.4f})'
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    global pool, pool_workers
+    if pool is None or pool_workers != workers:
+        if pool:
+            pool.shutdown()
+        pool = ProcessPoolExecutor(max_workers=workers)
+        pool_workers = workers
+    return pool
+
+def shutdown() -> None:
+    global pool
+    if pool:
+        pool.shutdown()
+        pool = None
+
+# Scores runouts for every hole and returns each seat's summed pot share,
+# ties splitting a share evenly.
+def score(holes: list[list[int]], board: list[int], runouts) -> tuple[list[float], int]:
+    evaluate = evaluator.evaluate
+    shares = [0.0] * len(holes)
+    count = 0
+    for runout in runouts:
+        cards = board + list(runout)
+        best = -1
+        winners = []
+        for seat, hole in enumerate(holes):
+            strength = evaluate(hole + cards)
+            if strength > best:
+                best = strength
+                winners = [seat]
+            elif strength == best:
+                winners.append(seat)
+        share = 1 / len(winners)
+        for seat in winners:
+            shares[seat] += share
+        count += 1
+    return shares, count
+
+def score_range(holes: list[list[int]], board: list[int], stub: list[int], needed: int, start: int, stop: int) -> tuple[list[float], int]:
+    return score(holes, board, islice(combinations(stub, needed), start, stop))
+
+def score_sample(holes: list[list[int]], board: list[int], stub: list[int], needed: int, seed: int, index: int, count: int) -> tuple[list[float], int]:
+    # String seeds hash the same in every process, so batch results do not
+    # depend on which worker runs them.
+    rng = random.Random(f'{seed}:{index}')
+    return score(holes, board, (rng.sample(stub, needed) for _ in range(count)))
+
+def equity(
+    holes: list[list[int]],
+    board: list[int] = (),
+    dead: list[int] = (),
+    trials: int | None = None,
+    target_ci: float | None = None,
+    confidence: float = 0.95,
+    seed: int = 0,
+    workers: int | None = None,
+) -> Equity:
+    holes = [list(hole) for hole in holes]
+    board = list(board)
+    used = [card for hole in holes for card in hole] + board + list(dead)
+    if len(holes) < 2:
+        raise ValueError('Equity needs at least two hands.')
+    if len(board) > 5:
+        raise ValueError('The board has at most five cards.')
+    if len(set(used)) != len(used) or not all(0 <= card < 52 for card in used):
+        raise ValueError('Cards must be distinct integers 0-51.')
+
+    taken = set(used)
+    stub = [card for card in range(52) if card not in taken]
+    needed = 5 - len(board)
+    workers = workers or os.cpu_count() or 1
+
+    runouts = comb(len(stub), needed)
+    if trials is None and runouts <= EXHAUSTIVE_LIMIT:
+        return exhaustive(holes, board, stub, needed, runouts, workers)
+    return sampled(holes, board, stub, needed, trials or DEFAULT_TRIALS, target_ci, confidence, seed, workers)
+
+def exhaustive(holes: list[list[int]], board: list[int], stub: list[int], needed: int, runouts: int, workers: int) -> Equity:
+    if workers == 1 or runouts <= INLINE_LIMIT:
+        shares, count = score_range(holes, board, stub, needed, 0, runouts)
+        return Equity(shares, count, 0.0, True)
+
+    step = -(-runouts // workers)
+    executor = get_pool(workers)
+    futures = [
+        executor.submit(score_range, holes, board, stub, needed, start, min(start + step, runouts))
+        for start in range(0, runouts, step)
+    ]
+    shares = [0.0] * len(holes)
+    for future in futures:
+        for seat, share in enumerate(future.result()[0]):
+            shares[seat] += share
+    return Equity(shares, runouts, 0.0, True)
+
+def sampled(holes: list[list[int]], board: list[int], stub: list[int], needed: int, trials: int, target_ci: float | None, confidence: float, seed: int, workers: int) -> Equity:
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    batches = [min(BATCH_SIZE, trials - start) for start in range(0, trials, BATCH_SIZE)]
+    executor = get_pool(workers) if workers > 1 else None
+
+    shares = [0.0] * len(holes)
+    count = 0
+    margin = 1.0
+    # Batches are folded strictly in index order and the stopping rule is
+    # checked after each one, so a seed gives the same answer for any number
+    # of workers; a wave's batches past the stopping point are discarded.
+    for wave in range(0, len(batches), workers):
+        indexes = range(wave, min(wave + workers, len(batches)))
+        if executor:
+            futures = [executor.submit(score_sample, holes, board, stub, needed, seed, i, batches[i]) for i in indexes]
+            results = [future.result() for future in futures]
+        else:
+            results = [score_sample(holes, board, stub, needed, seed, i, batches[i]) for i in indexes]
+
+        for batch_shares, batch_count in results:
+            for seat, share in enumerate(batch_shares):
+                shares[seat] += share
+            count += batch_count
+
+            # A pot share lies in [0, 1], so p(1 - p) bounds its variance.
+            margin = max(z * sqrt(p * (1 - p) / count) for p in (share / count for share in shares))
+            if target_ci is not None and margin <= target_ci:
+                return Equity(shares, count, margin, False)
+    return Equity(shares, count, margin, False)
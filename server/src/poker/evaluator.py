@@ -0,0 +1,150 @@
+from itertools import combinations
+
+# Cards are integers 0-51: rank * 4 + suit, with ranks 0-12 (2 through Ace)
+# and suits 0-3, the same ranks and suits used by objects.Card.
+#
+# A hand's strength is a single integer, larger is better:
+#   category << 20 | five tiebreak ranks, 4 bits each, most significant first
+
+HIGH_CARD = 0
+PAIR = 1
+TWO_PAIR = 2
+THREE_OF_A_KIND = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+FOUR_OF_A_KIND = 7
+STRAIGHT_FLUSH = 8
+
+CATEGORY_NAMES = {
+    HIGH_CARD: 'High Card',
+    PAIR: 'Pair',
+    TWO_PAIR: 'Two Pair',
+    THREE_OF_A_KIND: '3 of a Kind',
+    STRAIGHT: 'Straight',
+    FLUSH: 'Flush',
+    FULL_HOUSE: 'Full House',
+    FOUR_OF_A_KIND: '4 of a Kind',
+    STRAIGHT_FLUSH: 'Straight Flush',
+}
+
+ACE = 12
+WHEEL = 1 << ACE | 0b1111
+
+# Rank counts are packed 3 bits per rank, so the sum of RANK_KEY over a hand
+# is a perfect hash of its rank multiset. Suit counts are packed 4 bits per
+# suit starting at 3, so bit 3 of a nibble is set once a suit reaches five.
+RANK_KEY = [1 << 3 * (card >> 2) for card in range(52)]
+RANK_BIT = [1 << (card >> 2) for card in range(52)]
+SUIT_KEY = [1 << 4 * (card & 3) for card in range(52)]
+SUIT_START = 0x3333
+FLUSH_BITS = 0x8888
+FLUSH_SUIT = {0x8 << 4 * suit: suit for suit in range(4)}
+
+def make_strength(category: int, ranks: list[int]) -> int:
+    strength = category
+    for i in range(5):
+        strength = strength << 4 | (ranks[i] if i < len(ranks) else 0)
+    return strength
+
+def straight_high(mask: int) -> int:
+    for high in range(ACE, 3, -1):
+        run = 0b11111 << high - 4
+        if mask & run == run:
+            return high
+    if mask & WHEEL == WHEEL:
+        return 3
+    return -1
+
+STRAIGHT_HIGH = [straight_high(mask) for mask in range(1 << 13)]
+
+def best_flush(mask: int) -> int:
+    high = STRAIGHT_HIGH[mask]
+    if high >= 0:
+        return make_strength(STRAIGHT_FLUSH, [high])
+    ranks = [rank for rank in range(ACE, -1, -1) if mask >> rank & 1]
+    return make_strength(FLUSH, ranks[:5])
+
+def best_unsuited(counts: list[int]) -> int:
+    # Ranks ordered by how many of them there are, then by rank.
+    ranks = [rank for rank in range(ACE, -1, -1) if counts[rank]]
+    ordered = sorted(ranks, key=counts.__getitem__, reverse=True)
+    first, second = ordered[0], ordered[1]
+    top = counts[first]
+
+    if top == 4:
+        return make_strength(FOUR_OF_A_KIND, [first] + [r for r in ranks if r != first][:1])
+    if top == 3 and counts[second] >= 2:
+        return make_strength(FULL_HOUSE, [first, second])
+
+    high = STRAIGHT_HIGH[sum(1 << rank for rank in ranks)]
+    if high >= 0:
+        return make_strength(STRAIGHT, [high])
+
+    if top == 3:
+        return make_strength(THREE_OF_A_KIND, [first] + [r for r in ranks if r != first][:2])
+    if top == 2 and counts[second] == 2:
+        return make_strength(TWO_PAIR, [first, second] + [r for r in ranks if r != first and r != second][:1])
+    if top == 2:
+        return make_strength(PAIR, [first] + [r for r in ranks if r != first][:3])
+    return make_strength(HIGH_CARD, ranks[:5])
+
+def build_rank_table() -> dict[int, int]:
+    table = {}
+    counts = [0] * 13
+
+    def fill(rank: int, total: int, key: int) -> None:
+        if total >= 5:
+            table[key] = best_unsuited(counts)
+        if rank == 13 or total == 7:
+            return
+        for count in range(min(4, 7 - total) + 1):
+            counts[rank] = count
+            fill(rank + 1, total + count, key + (count << 3 * rank))
+        counts[rank] = 0
+
+    fill(0, 0, 0)
+    return table
+
+FLUSH_TABLE = [best_flush(mask) if mask.bit_count() >= 5 else 0 for mask in range(1 << 13)]
+RANK_TABLE = build_rank_table()
+
+# Returns the strength of the best five card hand in 5 to 7 cards. With at
+# most seven cards a flush rules out quads and full houses, so the flush
+# table alone decides suited hands.
+def evaluate(cards: list[int]) -> int:
+    key = 0
+    suits = SUIT_START
+    for card in cards:
+        key += RANK_KEY[card]
+        suits += SUIT_KEY[card]
+
+    flush = suits & FLUSH_BITS
+    if flush:
+        suit = FLUSH_SUIT[flush]
+        mask = 0
+        for card in cards:
+            if card & 3 == suit:
+                mask |= RANK_BIT[card]
+        return FLUSH_TABLE[mask]
+    return RANK_TABLE[key]
+
+def category(strength: int) -> int:
+    return strength >> 20
+
+def describe(strength: int) -> str:
+    return CATEGORY_NAMES[category(strength)]
+
+def best_hand(cards: list[int]) -> list[int]:
+    strength = evaluate(cards)
+    for hand in combinations(cards, 5):
+        if evaluate(hand) == strength:
+            return list(hand)
+
+# The (suit, rank) tuples of the original find_rank, kept for comparing
+# against it: suits 1-4 and ranks 1-13, 13 being the Ace.
+def card_from_tuple(card: tuple[int, int]) -> int:
+    return (card[1] - 1) * 4 + card[0] - 1
+
+def card_to_tuple(card: int) -> tuple[int, int]:
+    return ((card & 3) + 1, (card >> 2) + 1)
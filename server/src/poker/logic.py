@@ -1,204 +1,357 @@
-import ast
+from poker import evaluator
+from poker.cards import Deck
+from poker.publisher import TablePublisher
 import poker.objects as poker
 from poker.objects import (
-    Card, 
-    Player, 
-    PokerGame, 
-    Pot, 
+    Card,
+    Player,
+    PokerGame,
+    Pot,
+    build_pots,
+    pot_winners,
 )
-import random
+import checkpoint
+import history
 import routing
-import threading
-import time
+import scheduler
+import settings
+import shards
+
+WAITING = 'waiting'
+BLINDS = 'blinds'
+PREFLOP = 'preflop'
+FLOP = 'flop'
+TURN = 'turn'
+RIVER = 'river'
+SHOWDOWN = 'showdown'
+
+BETTING = (PREFLOP, FLOP, TURN, RIVER)
+MAX_SEATS = 8
+NEXT_STREET = {PREFLOP: (FLOP, 3), FLOP: (TURN, 1), TURN: (RIVER, 1), RIVER: (SHOWDOWN, 0)}
 
 def create_game(name: str, game_id: int) -> None:
+    if shards.active():
+        shards.create_game(name, game_id)
+    else:
+        create_local_game(name, game_id)
+
+def create_local_game(name: str, game_id: int) -> None:
     game = PokerGame(game_id)
     router = routing.new_router(game_id)
     router.register_game_handler(game.handle_message)
+    game.engine = HoldemEngine(game, router.post_to_server)
+    game.engine.publisher = TablePublisher(game, router.post_to_server)
     poker.games[game_id] = game
-    
-    # game_thread = threading.Thread(target=run_game, args=(game))
-    # game_thread.start()
 
-def run_game(game: PokerGame) -> None:
+# Recreates tables from checkpoint.start(). The players' connections died with
+# the old process, so they come back sitting out with no address, chips and
+# seats intact, for the same usernames to reclaim by joining. Seats still
+# unclaimed after RESTORE_CLAIM_PERIOD are released, and an emptied table is
+# reaped as usual.
+def restore_games(tables: list[dict]) -> list[int]:
+    for table in tables:
+        create_local_game('holdem', table['game_id'])
+        game = poker.games[table['game_id']]
+        game.button = table['button']
+        game.sm_blind = table['sm_blind']
+        game.buy_in = table['buy_in']
+        game.engine.hand_no = table['hand']
+        for seat, balance, _, name in table['players']:
+            player = Player(seat, '', name)
+            player.balance = balance
+            player.sit()
+            game.players.append(player)
+        for total, seats in table['pots']:
+            pot = Pot([])
+            pot.total, pot.seats = total, seats
+            game.pots.append(pot)
+        if game.players:
+            scheduler.cancel(game.reap_timer)
+            game.reap_timer = None
+            router = routing.get_router(game.id)
+            game.release_timer = scheduler.call_later(settings.RESTORE_CLAIM_PERIOD, router.post_to_game, 'player:release:')
+        game.engine.publish()
+    return [table['game_id'] for table in tables]
+
+# Runs hands at one table as a state machine. Nothing here blocks: player
+# actions arrive through PokerGame.handle_message, delays and action clocks
+# run on the shared scheduler. The publisher, if any, sends every change to
+# the table as state deltas; only what the state cannot show (cards shown at
+# showdown, winnings, rejected actions) is emitted as '{addr}:game:{event}'
+# through emit (the router's post_to_server).
+class HoldemEngine:
+    __slots__ = (
+        'game', 'emit', 'lock', 'state', 'hand_no', 'seats', 'in_hand',
+        'turn', 'last_bet', 'min_raise', 'pending', 'start_timer', 'action_timer',
+        'publisher', 'starting', 'actions',
+    )
+
+    def __init__(self, game: PokerGame, emit=None):
+        self.game = game
+        self.emit = emit
+        self.lock = game.lock #Seat changes and the engine's timers see one table
+        self.state = WAITING
+        self.hand_no = 0
+        self.seats: list[int] = [] #Seats dealt into the current hand
+        self.in_hand: dict[int, Player] = {}
+        self.turn = -1
+        self.last_bet = 0
+        self.min_raise = 0
+        self.pending = 0 #Bitset of seats still to act this street
+        self.start_timer = None
+        self.action_timer = None
+        self.publisher = None
+        self.starting: dict[int, int] = {} #Balance of each seat when the hand began
+        self.actions: list[tuple] = [] #This hand's actions for the history
+
+    def send(self, player: Player, event: str) -> None:
+        if self.emit:
+            self.emit(f'{player.addr}:game:{event}')
+
+    def broadcast(self, event: str) -> None:
+        for player in self.game.players:
+            self.send(player, event)
+
+    def reject(self, player: Player, message: str) -> dict:
+        self.send(player, f'error:{message}')
+        return {'code': '400', 'message': message}
+
+    def publish(self) -> None:
+        with self.lock:
+            if self.publisher:
+                self.publisher.publish()
+
+    def checkpoint(self) -> None:
+        with self.lock:
+            if self.state == WAITING:
+                checkpoint.save(self.game)
+
+    def acting(self) -> bool:
+        return self.state in BETTING
+
+    def on_player_added(self) -> None:
+        with self.lock:
+            if self.state == WAITING:
+                self.schedule_start()
+
+    def on_player_removed(self, player: Player) -> None:
+        with self.lock:
+            if self.state in BETTING and self.in_hand.get(player.seat) is player and player.pots:
+                player.fold()
+                self.pending &= ~(1 << player.seat)
+                self.log_action(player, 'fold')
+                # Only a player on the clock moves the hand on, unless the
+                # fold leaves one live hand.
+                if player.seat == self.turn or sum(1 for p in self.in_hand.values() if p.pots) == 1:
+                    scheduler.cancel(self.action_timer)
+                    self.action_timer = None
+                    self.advance()
+
+    def schedule_start(self) -> None:
+        if self.start_timer is None and len(self.ready_players()) >= 2:
+            self.start_timer = scheduler.call_later(settings.HAND_START_DELAY, self.start_hand)
+
+    def ready_players(self) -> list[Player]:
+        return [p for p in self.game.players if not p.sit_out and p.balance > 0]
 
-    router = routing.get_router(game.id)
+    def actors(self) -> list[Player]:
+        return [p for p in self.in_hand.values() if p.pots and p.balance > 0]
 
-    players = game.players
-    deck = game.deck
-    button = game.button
-    ftr = game.cards
-    pots = game.pots
-    sm_blind = game.sm_blind
-    bg_blind = sm_blind * 2
+    def start_hand(self) -> None:
+        with self.lock:
+            self.start_timer = None
+            players = self.ready_players()
+            if self.state != WAITING or len(players) < 2:
+                return
 
-    while True:
+            game = self.game
+            self.state = BLINDS
+            self.hand_no += 1
+            self.seats = [p.seat for p in players]
+            self.in_hand = {p.seat: p for p in players}
+            self.starting = {p.seat: p.balance for p in players}
+            self.actions = []
+            game.button = next_seat(self.seats, game.button)
+            game.deck.reset()
+            game.cards.clear()
+            game.pots = [Pot(self.seats)]
+            for player in players:
+                player.clear_hand()
 
-        wait_for_players(players)
+            bg_blind = game.sm_blind * 2
+            sm_seat, bg_seat = get_blind_seats(self.seats, game.button)
+            for seat, blind in ((sm_seat, game.sm_blind), (bg_seat, bg_blind)):
+                self.in_hand[seat].pay_blind(blind)
+                self.log_action(self.in_hand[seat], 'blind')
+            self.last_bet = max(p.cur_bet for p in players)
+            self.min_raise = bg_blind
 
-        seats = get_active_seats(players)
-        pots.append(Pot(seats))
-        set_btn_position(button, seats)
+            for player in players:
+                player.deal(take_hand(game.deck, game.hand_size))
 
-        for seat in get_blind_seats(seats, button):
-            players[seat].pay_blind(sm_blind)
-        
-        for s in seats:
-            hand = take_hand(deck, game.hand_size)
-            players[s].deal(hand)
-        
-        # Send message to app
-        print("Cards dealt."); print("")
+            self.state = PREFLOP
+            self.pending = sum(1 << p.seat for p in self.actors())
+            self.turn = bg_seat
+            self.advance()
+            self.publish()
 
-        turn = increment_seat(seats, button, 3)
-        turn_count = 0 
-        last_bet = bg_blind
+    def act(self, addr: str, action: str, amount: int = 0) -> dict:
+        with self.lock:
+            player = self.in_hand.get(self.turn)
+            if self.state not in BETTING or player is None or player.addr != addr:
+                for p in self.game.players:
+                    if p.addr == addr:
+                        return self.reject(p, 'Not your turn')
+                return {'code': '400', 'message': 'Player not found'}
 
+            to_call = self.last_bet - player.cur_bet
+            match action:
+                case 'check':
+                    if to_call:
+                        return self.reject(player, f'Check is not allowed, {to_call} to call')
+                case 'call':
+                    if not to_call:
+                        return self.reject(player, 'Nothing to call')
+                    player.bet(to_call)
+                case 'bet' | 'raise':
+                    if (action == 'bet') != (self.last_bet == 0):
+                        return self.reject(player, f'{action.capitalize()} is not allowed')
+                    all_in = player.cur_bet + player.balance
+                    amount = min(amount, all_in)
+                    minimum = self.last_bet + self.min_raise if self.last_bet else self.game.sm_blind * 2
+                    if amount <= self.last_bet or (amount < minimum and amount < all_in):
+                        return self.reject(player, f'{action.capitalize()} must be to at least {minimum}')
+                    self.min_raise = max(self.min_raise, amount - self.last_bet)
+                    self.last_bet = amount
+                    player.bet(amount - player.cur_bet)
+                    # A bet or raise reopens the action for everyone else.
+                    self.pending = sum(1 << p.seat for p in self.actors())
+                case 'fold':
+                    player.fold()
+                case _:
+                    return self.reject(player, f'Unknown action {action}')
+
+            scheduler.cancel(self.action_timer)
+            self.action_timer = None
+            self.pending &= ~(1 << player.seat)
+            self.log_action(player, action)
+            self.advance()
+            return {'code': '200', 'message': 'Action taken'}
+
+    def timeout(self, hand_no: int, seat: int) -> None:
+        with self.lock:
+            if hand_no != self.hand_no or seat != self.turn or self.state not in BETTING:
+                return
+            player = self.in_hand[seat]
+            self.action_timer = None
+            self.act(player.addr, 'fold' if self.last_bet > player.cur_bet else 'check')
+            self.publish()
+
+    # Moves the hand forward until someone has to act or the hand is over.
+    def advance(self) -> None:
         while True:
-            
-            if not players[turn].in_pot[active_pot]: turn += 1; continue
-
-            #If all bets are equal and not first turn of the round
-            if last_bet == players[turn].total_bet and turn_count >= len(seats):
-                    
-                for player in players.values():
-                    player.reset_bet()
-
-                #Display pot total.
-                print(f"The pot is ${pots[0]}."); print("")
-                turn_count = 0
-
-                #Flip next card(s)
-                if len(ftr) == 0: flip_cards(game, 3)
-                elif len(ftr) <= 4: flip_cards(game, 1)
-                else: break
-                
-                for cards in ftr:
-                    print(f"{suitDict[cards[0]]}{valDict[cards[1]]}")
-                print("")
-
-                turn = (button + 1) % len(seats)
-                last_bet = 0
-                continue
-            
-            #Display current bet
-            print(f"The bet is ${last_bet}"); print("")
-            
-            #Decide available actions
-            actions = [[True,"check"], [True,"bet"], [True,f"call (${last_bet-players[turn].total_bet} more)"], [True,"raise"], [True,"fold"]]
-
-            if turn_count == 0:
-                if len(ftr): actions[2][0], actions[3][0] = False, False
-                else: actions[1][0] = False
-                    
-            if last_bet > players[turn].total_bet: actions[0][0], actions[1][0] = False, False
-            elif last_bet == players[turn].total_bet and (not turn_count == 0 or len(ftr) == 0): actions[1][0], actions[2][0] = False, False
-            if last_bet >= players[turn].balance: actions[3][0] = False
-
-            #Display options, get & execute action
-            while True:
-                for a in actions:
-                    if a[0]: print(f"-- {a[1]}")
-                print("")
-                action = input(f"{players[turn].name}, pick an above action: ")
-
-                #Execute Action
-                if action == "check" and actions[0][0]:
-                    print(f"{players[turn].name} checks."); print("")
-                    break
-                    
-                elif action == "bet" and actions[1][0]:
-                    bet = int(input("How much do you want to bet?"))
-                    [pots, last_bet] = players[turn].bet(bet, last_bet, bg_blind, pots)
-                    break
-                
-                elif action == "call" and actions[2][0]:
-                    [pots, last_bet] = players[turn].bet(last_bet-players[turn].total_bet, last_bet, bg_blind, pots)
-                    break
-                    
-                elif action == "raise" and actions[3][0]:
-                    newRaise = int(input("How much more do you want to raise by?"))
-                    [pots, last_bet] = players[turn].bet(newRaise+last_bet-players[turn].total_bet, last_bet, bg_blind, pots)
-                    break
-                    
-                elif action == "fold" and actions[4][0]:
-                    players[turn].fold()
-                    break
-                    
-                else: print("Action is invalid."); print("")
-            
-            #Next players turn
-            turn = increment_seat(seats, turn, 1)
-            turn_count += 1
-
-        #Cycle through active players and determine score ("rank")
-        ranked_players = []
-        for p in players.values():
-            
-            #Skip folded players, else score the cards
-            if p.in_pot == [False]: continue
-            else: p.find_rank(p.hole+ftr)
-
-            #Rank hand and display result
-            ranked_players.append(p)
-            print(f"{p.name}'s Hand: {p.rHand} Type: {rankDict[p.rank[0]]}")
-
-        #Sort ranked players by hand type, then strength of type
-        print("")
-        ranked_players = sorted(ranked_players, key = lambda y: (y.rank[0], y.rank[1]), reverse=True)
-        
-        #Pay winners and reset pot
-        payWinners(ranked_players, pots, players)
-        pots = [0]
-
-        #Reset pot; return Flop, Turn, River, and hole cards to deck
-        print("")
-        pots = [0]
-        for i in range(len(ftr)):
-            deck.append(ftr.pop())
-        for p in players:
-            p.inPot = [True]
-            deck = p.cardsToDeck(deck)
-
-        #Check to play another hand
-        anotherOne = input("Would you like to play another hand? (y/n): ")
-        if anotherOne == "y": break
-        elif anotherOne == "n": play = False; break
-        else: print("Invalid Response")
-        
-        #Move button to next player
-        button = (button+1)%len(players)
-        print(f"The button moves to {players[button].name}."); print("")
-
-    for p in players: del p
-
-def wait_for_players(players):
-    while len(players) < 2:
-        continue
-    time.sleep(30)
-
-def set_btn_position(button: int, seats: list[int]) -> None:
-    if button == -1:
-        button = seats[random.randint(0, len(seats))]
-    button = increment_seat(seats, button, 1)
-    
+            live = [p for p in self.in_hand.values() if p.pots]
+            if len(live) == 1:
+                self.collect_bets()
+                self.finish_hand([live])
+                return
+
+            actors = self.actors()
+            if len(actors) == 1 and actors[0].cur_bet >= self.last_bet:
+                self.pending = 0
+            for _ in range(len(self.seats)):
+                self.turn = next_seat(self.seats, self.turn)
+                player = self.in_hand[self.turn]
+                if self.pending >> self.turn & 1 and player.pots and player.balance > 0:
+                    self.action_timer = scheduler.call_later(settings.ACTION_TIMEOUT, self.timeout, self.hand_no, self.turn)
+                    return
+            self.pending = 0
+
+            self.collect_bets()
+            self.state, count = NEXT_STREET[self.state]
+            if self.state == SHOWDOWN:
+                self.showdown(live)
+                return
+            flip_cards(self.game, count)
+            self.last_bet = 0
+            self.min_raise = self.game.sm_blind * 2
+            self.pending = sum(1 << p.seat for p in self.actors())
+            self.turn = self.game.button
+
+    def log_action(self, player: Player, action: str) -> None:
+        street = BETTING.index(self.state) if self.state in BETTING else 0
+        self.actions.append((street, player.seat, history.ACTION_CODES[action], player.cur_bet))
+
+    def collect_bets(self) -> None:
+        pot = self.game.pots[0]
+        for player in self.in_hand.values():
+            pot.add(player.cur_bet)
+            player.reset_bet()
+
+    def showdown(self, live: list[Player]) -> None:
+        board = self.game.cards
+        for player in live:
+            player.find_rank(player.hole + board)
+            self.broadcast(f'show:{player.seat}:{format_cards(player.hole)}:{player.rank}')
+        players = list(self.in_hand.values())
+        self.game.pots = build_pots(players)
+        self.finish_hand(pot_winners(self.game.pots, players))
+
+    def finish_hand(self, winners: list[list[Player]]) -> None:
+        for pot, pot_winners in zip(self.game.pots, winners):
+            for player, share in pot_shares(pot, pot_winners, self.game.button):
+                player.balance += share
+                self.broadcast(f'win:{player.seat}:{share}')
+            pot.reset()
+
+        history.record(
+            self.game.id, self.hand_no, self.game.button, self.game.cards,
+            [(seat, self.starting[seat], p.balance, p.hole) for seat, p in self.in_hand.items()],
+            self.actions,
+        )
+        self.state = WAITING
+        self.turn = -1
+        self.in_hand = {}
+        for player in self.game.players:
+            if player.balance == 0:
+                player.sit()
+        checkpoint.save(self.game)
+        self.schedule_start()
+
+# Each winner's share of a pot, odd chips first to the winners nearest the
+# button's left.
+def pot_shares(pot: Pot, winners: list[Player], button: int) -> list[tuple[Player, int]]:
+    winners = sorted(winners, key=lambda p: (p.seat - button - 1) % MAX_SEATS)
+    return list(zip(winners, pot.split(len(winners))))
+
 def get_active_seats(players: list[Player]) -> list[int]:
     seats = [player.seat for player in players if player.sit_out == False]
     return seats
 
 def get_blind_seats(seats: list[int], button: int) -> list[int]:
-    n = len(seats)
-    sm_blind_pos = (button + 1) % n
-    bg_blind_pos = (button + 2) % n
+    # Heads up, the button posts the small blind.
+    sm_blind_pos = button if len(seats) == 2 else increment_seat(seats, button, 1)
+    bg_blind_pos = increment_seat(seats, sm_blind_pos, 1)
     return [sm_blind_pos, bg_blind_pos]
 
 def flip_cards(game, count: int) -> None:
     for _ in range(count):
-        game.cards.append(game.deck.pop(random.randint(0,len(game.deck)-1)))
+        game.cards.append(game.deck.deal())
 
 def increment_seat(seats: list[int], cur: int, count: int) -> int:
     new_seat = seats[(seats.index(cur) + count) % len(seats)]
     return new_seat
 
-def take_hand(deck: list[list[int]], hand_size: int) -> list[list[int, int]]:
-    return [deck.pop(random.randint(0,len(deck)-1)) for _ in hand_size]
\ No newline at end of file
+# Like increment_seat, but cur need not be one of seats (e.g. the button's
+# old seat after that player left).
+def next_seat(seats: list[int], cur: int) -> int:
+    for seat in seats:
+        if seat > cur:
+            return seat
+    return seats[0]
+
+def take_hand(deck: Deck, hand_size: int) -> list[Card]:
+    return deck.deal_many(hand_size)
+
+def format_cards(cards: list[Card]) -> str:
+    return ','.join(str(int(card)) for card in cards)
\ No newline at end of file
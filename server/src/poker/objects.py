@@ -1,90 +1,142 @@
-import time
-import threading
+from poker import equity, evaluator
+from poker.cards import Card, Deck
+import metrics
 import routing
+import scheduler
+import settings
+import threading
+from time import perf_counter_ns
 
 games = {}
 
 class PokerGame:
-    hand_strengths = {
-        0 : "High Card",
-        3 : "Pair",
-        6 : "Two Pair",
-        7 : "3 of a Kind",
-        8 : "Straight",
-        9 : "Flush",
-        10 : "Full House",
-        12 : "4 of a Kind",
-        17 : "Straight Flush",
-        18 : "Royal Flush"
-    }
+    __slots__ = ('id', 'players', 'deck', 'hand_size', 'sm_blind', 'buy_in', 'button', 'pots', 'cards', 'reap_timer', 'release_timer', 'engine', 'lock', 'closed')
+
+    hand_strengths = evaluator.CATEGORY_NAMES
 
     def __init__(self, id: int):
         self.id: str = id
         self.players: list[Player] = []
-        self.deck: list[list[int]] = [(i, j) for j in range(1,14) for i in range(1, 5)]
+        self.deck: Deck = Deck()
         self.hand_size = 2
         self.sm_blind: int = 100
-        self.button: int = 0
+        self.buy_in: int = settings.BUY_IN
+        self.button: int = -1
         self.pots: list[Pot] = []
         self.cards: list[Card] = []
+        self.engine = None
+        # Seat changes and the reap check hold this; the engine shares it.
+        self.lock = threading.RLock()
+        self.closed = False
 
-        self.actions_map = {
-            'player': {
-                'add': self.add_player, 
-                'rmv': self.rmv_player, 
-                'sitout': self.sitout_player, 
-                'sitin': self.sitin_player, 
-            }, 
-            'get': {
-                'players': self.get_players, 
-                'id': self.get_id
-            }
-        }
-
-        seppuku = threading.Thread(target=self.destruct)
-        seppuku.start()
+        self.reap_timer = scheduler.call_later(settings.TABLE_GRACE_PERIOD, self.reap)
+        self.release_timer = None
 
     def handle_message(self, message: str) -> None:
         type, cmd, data = message.split(':', 2)
-        return self.actions_map[type][cmd](data)
-
-    def destruct(self):
-        while True:
-            clock = 0
-            while len(self.players) == 0:
-                time.sleep(1)
-                clock += 1
-                if clock == 30:
-                    routing.close_router(self.id)
-                    del games[self.id]
-            time.sleep(10)
-
-    def add_player(self, client_address: str):
-        if len(self.players) == 8:
-            return {'code': '400', 'message': 'Game is Full'}
+        start = perf_counter_ns() if metrics.sampling else 0
+        response = self.actions_map[type][cmd](self, data)
+        if type == 'player' and self.engine:
+            self.engine.publish()
+            self.engine.checkpoint()
+        if start:
+            message_times[type].observe(perf_counter_ns() - start)
+        return response
+
+    def reap(self):
+        with self.lock:
+            if self.players:
+                return
+            scheduler.cancel(self.release_timer)
+            self.closed = True
+            routing.close_router(self.id)
+            games.pop(self.id, None)
+
+    # data is '{addr}|{username}', or just the address. A username matching
+    # a seat restored from a checkpoint takes that seat and its chips back.
+    def add_player(self, data: str):
+        client_address, _, name = data.partition('|')
+        with self.lock:
+            if self.closed:
+                return {'code': '400', 'message': 'Game is closed'}
+            if name:
+                for player in self.players:
+                    if not player.addr and player.name == name:
+                        player.addr = client_address
+                        player.sit_out = player.balance == 0
+                        if self.engine:
+                            self.engine.on_player_added()
+                        return {'code': '200', 'message': 'Seat reclaimed'}
+
+            if len(self.players) == 8:
+                return {'code': '400', 'message': 'Game is Full'}
+
+            scheduler.cancel(self.reap_timer)
+            self.reap_timer = None
         
-        new_seat = len(self.players)
-        for seat, player in enumerate(self.players):
-            if seat != player.seat:
-                new_seat = seat
-
-        player = Player(new_seat, client_address)
-        self.players.append(player)
-        self.players.sort(key=lambda p: p.seat)
-        return {'code': '200', 'message': 'Player added'}
+            # The engine keys hands and pots by seat, so take the lowest seat
+            # free both at the table and in the hand being played, which may
+            # still hold a player who left.
+            taken = {p.seat for p in self.players}
+            if self.engine:
+                taken.update(self.engine.in_hand)
+            new_seat = next(seat for seat in range(8) if seat not in taken)
+
+            player = Player(new_seat, client_address, name)
+            player.balance = self.buy_in
+            self.players.append(player)
+            self.players.sort(key=lambda p: p.seat)
+            if self.engine:
+                self.engine.on_player_added()
+            return {'code': '200', 'message': 'Player added'}
 
     def rmv_player(self, rmv_addr: str):
-        for seat, player in enumerate(self.players):
-            if player.addr == rmv_addr:
-                self.players.pop(seat)
-                return {'code': '200', 'message': 'Player removed'}
-        return {'code': '400', 'message': 'Player not found'}
+        with self.lock:
+            for seat, player in enumerate(self.players):
+                if player.addr == rmv_addr:
+                    self.players.pop(seat)
+                    if self.engine:
+                        self.engine.on_player_removed(player)
+                    if not self.players:
+                        self.reap_timer = scheduler.call_later(settings.TABLE_GRACE_PERIOD, self.reap)
+                    return {'code': '200', 'message': 'Player removed'}
+            return {'code': '400', 'message': 'Player not found'}
     
+    # Seats restored from a checkpoint that nobody reclaimed in time; an
+    # unclaimed seat has no address.
+    def release_unclaimed(self, _):
+        with self.lock:
+            self.release_timer = None
+            for _ in [p for p in self.players if not p.addr]:
+                self.rmv_player('')
+            return {'code': '200', 'message': 'Unclaimed seats released'}
+
     def sitout_player(self, addr: str):
-        pass
+        with self.lock:
+            for player in self.players:
+                if player.addr == addr:
+                    player.sit()
+                    return {'code': '200', 'message': 'Player sitting out'}
+            return {'code': '400', 'message': 'Player not found'}
 
     def sitin_player(self, addr: str):
-        pass
+        with self.lock:
+            for player in self.players:
+                if player.addr == addr:
+                    if player.balance == 0:
+                        return {'code': '400', 'message': 'No chips to play with'}
+                    player.sit_out = False
+                    if self.engine:
+                        self.engine.on_player_added()
+                    return {'code': '200', 'message': 'Player sitting in'}
+            return {'code': '400', 'message': 'Player not found'}
+
+    # data is '{action}:{amount}:{addr}'
+    def act_player(self, data: str):
+        action, amount, addr = data.split(':', 2)
+        if not self.engine:
+            return {'code': '400', 'message': 'Game is not running'}
+        return self.engine.act(addr, action, int(amount or 0))
 
     def get_players(self, _):
         return [p.addr for p in self.players]
@@ -92,26 +144,68 @@ class PokerGame:
     def get_id(self, _):
         return self.id
 
+    # data is the asking client's address
+    def get_state(self, addr: str):
+        if not self.engine or not self.engine.publisher:
+            return None
+        with self.engine.lock:
+            return self.engine.publisher.snapshot(addr)
+
+    # Runs on the router's thread, so it stays in-process and stops sampling
+    # once the estimate is within EQUITY_TARGET_CI; the cards are copied under
+    # the lock and the lock is not held while scoring.
+    def get_equity(self, _):
+        with self.lock:
+            in_hand = [(p.seat, list(p.hole)) for p in self.players if p.in_pot(0) and p.hole]
+            board = list(self.cards)
+        if len(in_hand) < 2:
+            return {}
+        result = equity.equity([hole for _, hole in in_hand], board, target_ci=settings.EQUITY_TARGET_CI, workers=1)
+        return {seat: share for (seat, _), share in zip(in_hand, result.equities)}
+
+    # Shared by every table, so the handlers are called unbound.
+    actions_map = {
+        'player': {
+            'add': add_player, 
+            'rmv': rmv_player, 
+            'sitout': sitout_player, 
+            'sitin': sitin_player, 
+            'act': act_player, 
+            'release': release_unclaimed,
+        }, 
+        'get': {
+            'players': get_players, 
+            'id': get_id, 
+            'equity': get_equity, 
+            'state': get_state, 
+        }
+    }
+
+# How long each game message takes, by message type.
+message_times = {type: metrics.histogram(f'game.{type}') for type in PokerGame.actions_map}
+metrics.gauge('games', lambda: len(games))
+
 class Player:
-    def __init__(self, seat: int, addr: str):
+    __slots__ = ('addr', 'name', 'seat', 'balance', 'cur_bet', 'total_bet', 'hole', 'ranked', 'rank', 'sit_out', 'pots')
+
+    def __init__(self, seat: int, addr: str, name: str = ''):
         self.addr = addr
+        self.name = name #Username, which outlives the connection's address
         self.seat = seat
         self.balance = 0
-        self.cur_bet = 0
-        self.hole = [[0,0],[0,0]]
-        self.hand = [] #Final hand out of 7 cards
-        self.rank = [0,0] #[Hand Type, Hand Type Strength] For scoring
+        self.cur_bet = 0 #Chips bet this street
+        self.total_bet = 0 #Chips put in the pot this hand
+        self.hole: list[Card] = []
+        self.ranked: list[Card] = [] #The 7 cards find_rank scored
+        self.rank = 0 #Hand strength from poker.evaluator, higher wins
         self.sit_out = False
-        self.in_pot = [False] #Array to allow for different bools for different pots
+        self.pots = 0 #Bitset of the pots this player can win, bit 0 is the main pot
 
     def __repr__(self):
         return f"Name: {self.name}; Balance: ${self.balance}; Hole Cards: {self.rHole}"
 
-    def pay_blind(self, blind: int):
-        if blind > self.balance:
-            blind = self.balance
-        self.cur_bet += blind
-        self.balance -= blind
+    def pay_blind(self, blind: int) -> int:
+        return self.bet(blind)
 
     def ante_up(self, ante: int):
         if ante > self.balance:
@@ -120,177 +214,62 @@ class Player:
         self.balance -= ante
 
     #Deal cards out of deck into player's hand
-    def deal(self, hand: list[list[int]]):
+    def deal(self, hand: list[Card]):
         self.hole = hand
 
-    #Take in proposed bet, call, or raise; check legality, transfer money, print & return result
-    def bet(self, betAdd, currBet, bb, pots):
-
-        totalBet = betAdd + self.cur_bet
-        
-        #Ensure legality of bet
-        if totalBet < bb: betAdd = bb - self.cur_bet; print("The first bet must be at least the BB"); print("")
-        elif totalBet > bb and totalBet < bb*2: betAdd = bb*2 - self.cur_bet; print("First raise must be twice BB."); print("")
-        if betAdd > self.balance:
-            betAdd = self.balance
-        pots[0] += betAdd
-        
-        #Transfer from balance to bet
-        self.balance -= betAdd
-        self.cur_bet += betAdd
-        
-        #Determine action and report.
-        if self.balance == 0: print(f"{self.name} goes All In for ${self.cur_bet} ")
-        elif self.cur_bet > currBet:
-            if first and round > 1: print(f"{self.name} bets ${self.cur_bet}")
-            else: print(f"{self.name} raises to ${self.cur_bet}")
-        elif self.cur_bet == currBet: print(f"{self.name} calls for ${betAdd}")
-        print("")
-        
-        return [pots, self.cur_bet] if self.cur_bet >= currBet else [pots, currBet]
+    #Move chips from balance to the current bet, going all in if short; returns the amount moved
+    def bet(self, amount: int) -> int:
+        amount = min(amount, self.balance)
+        self.balance -= amount
+        self.cur_bet += amount
+        self.total_bet += amount
+        return amount
     
     def reset_bet(self):
         self.cur_bet = 0
 
+    def in_pot(self, pot: int = 0) -> bool:
+        return bool(self.pots >> pot & 1)
+
+    def join_pot(self, pot: int) -> None:
+        self.pots |= 1 << pot
+
     def fold(self):
-        self.cur_bet = 0
-        self.in_pot = [False]
+        self.pots = 0
 
     def sit(self):
         self.sit_out = True
 
-    def all_in(self):
-        self.cur_bet = self.balance
-        self.balance = 0
-
-    def cardsToDeck(self, deck):
-        deck.extend(self.hole)
-        self.hole = [[0,0],[0,0]]
-        self.hand = []
-        self.inPot = [True]
-        return deck
-
-    #Use all possible cards to find best hand of 5 cards
-    def find_rank(self, allCards):
-
-        #Clear Rank
-        self.rank = [0,0]
-
-        #Sort Available Cards by Number
-        allCards = sorted(allCards, key=lambda x: x[1])
-        for i in allCards:
-            i.append(1)
-        [bestRank, bestHand] = [[0,0,0], []]
-            
-        #Cycle through all possible 5 out of 7 and determine rank [hand type, strength of type]
-        for i in range(0,6):
-            for j in range(i+1,7):
-
-                #Set Variables
-                _counts = [1,1,0,0,0,0]
-                prevCardVal = -1
-                pairs = 0
-                flushStr = [0,1]
-                [tempRank, tempHand] = [[0,0], []]
-
-                #Begin checking pick 5 of 7 cards
-                for card in allCards:
-                    
-                    #Skip new pair of cards, add used cards to temporary hand
-                    k = allCards.index(card)
-                    if k == i or k == j: continue
-
-                    #Add new card to temp hand
-                    tempHand.append(card)
-                    
-                    #Find X of a Kind (2, 3, 4, full house)
-                    if card[1] == prevCardVal: _counts[0] += 1
-                    else: _counts[0] = 1
-                    
-                    if _counts[0] == 2:
-                        tempRank[0] += 3
-                        tempRank[1] += card[1]*2*100**pairs
-                        card[2] = 0
-                        allCards[k-1][2] = 0
-                        pairs += 1
-                    elif _counts[0] == 3:
-                        tempRank[0] += 4
-                        tempRank[1] += card[1]*100
-                        card[2] = 0
-                    elif _counts[0] == 4:
-                        tempRank = [12, card[1]]
-                        card[2] = 0
-                    
-                    #Find Straight
-                    if card[1] == prevCardVal + 1: _counts[1] += 1
-                    elif len(tempHand) == 5 and card[1] == 13 and tempHand[0][1] == 1: _counts[1] += 1 #Check for wheel
-                    else: _counts[1] = 1
-                    if _counts[1] == 5: tempRank = [8, card[1]]
-
-                    #Update strength for flush (card5 * 2^4 + card4 * 2^3 +...)
-                    flushStr[0] += card[1]*flushStr[1]
-                    flushStr[1] *= 2
-
-                    #Find Flush
-                    _curSuit = card[0]
-                    _counts[_curSuit+1] += 1
-                    if _counts[_curSuit+1] == 5:
-                        tempRank[0] += 9
-                        tempRank[1] += flushStr[0]
-                        if tempRank == [17,13]: tempRank[0] == 18
-
-                    #Set last value for check against next card
-                    prevCardVal = card[1]
-
-                #Find kicker and add value to rank
-                if tempRank[0] < 8:
-                    kickerMax = 0
-                    for c in range(len(tempHand)):
-                        if tempHand[c][2] and tempHand[c][1] > kickerMax: kickerMax = tempHand[c][1]
-                        
-                    tempRank[1] += kickerMax
-
-                #If rank is better than last hand, update player's hand
-                if tempRank[0] > bestRank[0] or (tempRank[0] == bestRank[0] and tempRank[1] > bestRank[1]):
-                    [bestRank, bestHand] = [tempRank, tempHand]
-
-        #Remove kicker markers from cards ([x, x, 1] -> [x, x])
-        for card in allCards:
-            card.pop()
-
-        #Set player rank and hand to bests
-        [self.rank, self.hand] = [bestRank, bestHand]
-
-class Card:
-    rank_reprs = {
-        0 : "2", 1 : "3",
-        2 : "4", 3 : "5",
-        4 : "6", 5 : "7",
-        6 : "8", 7 : "9",
-        8 : "10", 9 : "J",
-        10 : "Q", 11 : "K",
-        12 : "A", 
-    }
-
-    suit_reprs = {
-        0 : "\u2660",
-        1 : "\u2663",
-        2 : "\u2665",
-        3 : "\u2666",
-    }
+    def all_in(self) -> int:
+        return self.bet(self.balance)
 
-    def __init__(self, rank: int, suit: int):
-        self.rank = rank
-        self.suit = suit
-    
-    def __repr__(self):
-        return f'{self.suit_reprs[self.suit]}{self.rank_reprs[self.rank]}'
+    def clear_hand(self):
+        self.cur_bet = 0
+        self.total_bet = 0
+        self.hole = []
+        self.ranked = []
+        self.rank = 0
+        self.pots = 1
+
+    #Use all possible cards to find the hand's strength
+    def find_rank(self, allCards: list[Card]):
+        self.rank = evaluator.evaluate(allCards)
+        self.ranked = allCards
+
+    #Best 5 of the ranked cards, which takes up to 22 evaluations, so only worked out when shown
+    @property
+    def hand(self) -> list[Card]:
+        return evaluator.best_hand(self.ranked) if self.ranked else []
 
 class Pot:
+    __slots__ = ('total', 'max_bet', 'seats')
+
     def __init__(self, seats: list[int]):
         self.total = 0
         self.max_bet = float('inf')
-        self.seats: set[int] = set(seats)
+        self.seats = 0 #Bitset of seats eligible for this pot
+        for seat in seats:
+            self.seats |= 1 << seat
 
     def add(self, bets: int) -> None:
         self.total += bets
@@ -298,41 +277,89 @@ class Pot:
     def split(self, ways: int) -> list[int]:
         pots = [self.total // ways] * ways
         remainder = self.total % ways
-        for pot in pots[:remainder]:
-            pot += 1
+        for i in range(remainder):
+            pots[i] += 1
         return pots
 
     def reset(self) -> None:
         self.total = 0
         self.max_bet = float('inf')
-        self.seats = set()
+        self.seats = 0
+
+    def has_player(self, seat: int) -> bool:
+        return bool(self.seats >> seat & 1)
 
     def remove_player(self, seat: int) -> None:
-        if seat in self.seats:
-            self.seats.remove(seat)
+        if self.has_player(seat):
+            self.seats &= ~(1 << seat)
             return
         raise Exception(f'Player in seat {seat} is not in the pot.')
-    
+
+# Layers a hand's chips into the main pot and side pots from what each player
+# put in (total_bet), in one pass over them sorted by that amount. Every live
+# (unfolded) player's total caps a pot (max_bet) that only players who put in
+# at least as much can win. Folded players' chips fall into the pots their
+# bets reached, and any above the biggest live total go to the last pot.
+# Also sets each live player's pots bitset. The sort dominates: O(n log n).
+def build_pots(players: list[Player]) -> list[Pot]:
+    contributors = sorted((p for p in players if p.total_bet), key=lambda p: p.total_bet)
+    live_from = [0] * (len(contributors) + 1) #Live seats at or after each index
+    for i in range(len(contributors) - 1, -1, -1):
+        player = contributors[i]
+        live_from[i] = live_from[i + 1] | (1 << player.seat if player.pots else 0)
+
+    pots = []
+    amount = level = 0
+    for i, player in enumerate(contributors):
+        amount += (player.total_bet - level) * (len(contributors) - i)
+        level = player.total_bet
+        if player.pots:
+            if amount:
+                pot = Pot([])
+                pot.total, pot.max_bet, pot.seats = amount, level, live_from[i]
+                pots.append(pot)
+                amount = 0
+            player.pots = (1 << len(pots)) - 1 #Every pot so far
+    if amount and pots:
+        pots[-1].total += amount
+    return pots
+
+# The players who win each of build_pots' pots: the best rank among those who
+# can win it. Each pot's players are the next one's plus the live players
+# capped between them, so one walk down from the last pot finds them all
+# (plus copying the winners out, which only ties make long).
+def pot_winners(pots: list[Pot], players: list[Player]) -> list[list[Player]]:
+    live = sorted((p for p in players if p.pots), key=lambda p: p.total_bet, reverse=True)
+    winners = [[] for _ in pots]
+    best, leaders, i = None, [], 0
+    for index in range(len(pots) - 1, -1, -1):
+        pot = pots[index]
+        while i < len(live) and live[i].total_bet >= pot.max_bet:
+            player = live[i]
+            if best is None or player.rank > best:
+                best, leaders = player.rank, [player]
+            elif player.rank == best:
+                leaders.append(player)
+            i += 1
+        winners[index] = leaders[:]
+    return winners
+
 class CardGame:
+    __slots__ = ('id', 'players', 'deck', 'hand_size', 'button', 'pots', 'cards', 'reap_timer')
+
     def __init__(self, id: int):
         self.id: int = id
         self.players: dict[int, Player] = {}
-        self.deck: list[list[int]] = [(i, j) for j in range(1,14) for i in range(1, 5)]
+        self.deck: Deck = Deck()
         self.hand_size = 2
         self.button: int = -1
         self.pots: list[Pot] = []
         self.cards: list[Card] = []
 
-        garbage_thread = threading.Thread(target=self.destruct)
-        garbage_thread.start()
-
-    def destruct(self):
-        while True:
-            clock = 0
-            while self and len(self.players) == 0:
-                time.sleep(1)
-                clock += 1
-                if clock == 30:
-                    routing.close_router(self.id)
-                    del self[self.id]
-            time.sleep(10)
\ No newline at end of file
+        self.reap_timer = scheduler.call_later(settings.TABLE_GRACE_PERIOD, self.reap)
+
+    def reap(self):
+        if self.players:
+            return
+        routing.close_router(self.id)
+        games.pop(self.id, None)
\ No newline at end of file
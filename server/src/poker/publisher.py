@@ -0,0 +1,64 @@
+import tablestate
+
+# Publishes what a table looks like, as tablestate changes against the last
+# version sent, instead of one event per change. Everything an action moves
+# (the bet, the pot, the board, whose turn it is) goes out as one delta.
+# Deltas are posted as ('delta', game_id, version, changes) and hole cards,
+# which only their owner may see, as ('hole', addr, cards).
+class TablePublisher:
+    __slots__ = ('game', 'emit', 'state', 'version', 'holes')
+
+    def __init__(self, game, emit=None):
+        self.game = game
+        self.emit = emit
+        self.state = tablestate.new_state()
+        self.version = 0
+        self.holes: dict[str, bytes] = {}
+
+    def capture(self) -> dict:
+        game, engine = self.game, self.game.engine
+        seats = {}
+        for player in game.players:
+            flags = 0
+            if engine.in_hand.get(player.seat) is player and player.pots:
+                flags |= tablestate.IN_HAND
+                if player.balance == 0:
+                    flags |= tablestate.ALL_IN
+            if player.sit_out:
+                flags |= tablestate.SITTING_OUT
+            seats[player.seat] = (player.balance, player.cur_bet, flags)
+        return {
+            'hand': engine.hand_no,
+            'button': game.button if game.button >= 0 else tablestate.NO_SEAT,
+            'turn': engine.turn if engine.turn >= 0 and engine.acting() else tablestate.NO_SEAT,
+            'pot': sum(pot.total for pot in game.pots),
+            'board': tuple(int(card) for card in game.cards),
+            'seats': seats,
+        }
+
+    # Called with the engine lock held, after anything that may change the table.
+    def publish(self) -> None:
+        state = self.capture()
+        changes = tablestate.diff(self.state, state)
+        if changes:
+            self.state = state
+            self.version += 1
+            self.post(('delta', self.game.id, self.version, changes))
+
+        for player in self.game.players:
+            cards = bytes(player.hole)
+            if self.holes.get(player.addr, b'') != cards:
+                self.holes[player.addr] = cards
+                self.post(('hole', player.addr, cards))
+        if len(self.holes) > len(self.game.players):
+            addrs = {player.addr for player in self.game.players}
+            self.holes = {addr: cards for addr, cards in self.holes.items() if addr in addrs}
+
+    def post(self, message: tuple) -> None:
+        if self.emit:
+            self.emit(message)
+
+    # What a newcomer needs: (version, their seat, full state, their hole cards).
+    def snapshot(self, addr: str) -> tuple:
+        seat = next((p.seat for p in self.game.players if p.addr == addr), tablestate.NO_SEAT)
+        return self.version, seat, tablestate.snapshot(self.state), self.holes.get(addr, b'')
@@ -0,0 +1,227 @@
+from concurrent.futures import ProcessPoolExecutor
+from poker import logic
+from poker.objects import PokerGame
+import random
+import scheduler
+import settings
+import time
+
+# Self-play: HoldemEngine tables driven in process by bots, with no sockets,
+# routers or client messages, checking after every action and every hand
+# that the engine kept the rules:
+#   chips    no chip is made or lost: balances, this street's bets and the
+#            pot always add up to what the table started with (plus rebuys)
+#   bets     what everyone put in this hand (total_bet) is in the pot or
+#            still in front of them (cur_bet)
+#   turn     the player to act is dealt in, has not folded and has chips
+#   legal    every action from legal_actions() is accepted, and the illegal
+#            ones tried with probability `illegal` are rejected without
+#            changing anything
+#   cards    no card is dealt twice, and a showdown has a full board
+#   ends     a hand finishes within MAX_ACTIONS actions
+# A broken rule raises Violation; the table is recorded and replaced.
+#
+# A policy is a function (engine, player, legal, rng) -> (action, amount),
+# where legal is the list of (action, lowest, highest) amounts the player
+# may choose from. run() spreads tables over worker processes, so policies
+# passed to it must be picklable: module level functions or Script().
+
+MAX_ACTIONS = 1000
+MAX_VIOLATIONS = 20 #Kept per worker, with the seed and hand to replay them
+
+class Violation(Exception):
+    pass
+
+# What the player to act may do, as (action, lowest, highest); the amount
+# of a bet or raise is what the player's bet this street becomes.
+def legal_actions(engine: logic.HoldemEngine) -> list[tuple[str, int, int]]:
+    player = engine.in_hand[engine.turn]
+    to_call = engine.last_bet - player.cur_bet
+    all_in = player.cur_bet + player.balance
+    legal = [('fold', 0, 0), ('call', 0, 0)] if to_call else [('check', 0, 0)]
+    if all_in > engine.last_bet:
+        minimum = engine.last_bet + engine.min_raise if engine.last_bet else engine.game.sm_blind * 2
+        legal.append(('raise' if engine.last_bet else 'bet', min(minimum, all_in), all_in))
+    return legal
+
+def random_policy(engine, player, legal, rng: random.Random) -> tuple[str, int]:
+    action, lowest, highest = rng.choice(legal)
+    return action, rng.randint(lowest, highest)
+
+def calling_policy(engine, player, legal, rng: random.Random) -> tuple[str, int]:
+    return legal[1][0] if legal[0][0] == 'fold' else 'check', 0
+
+# Raises the minimum half the time it can, shoves one time in ten, and
+# otherwise calls.
+def aggressive_policy(engine, player, legal, rng: random.Random) -> tuple[str, int]:
+    action, lowest, highest = legal[-1]
+    roll = rng.random()
+    if action in ('bet', 'raise') and roll < 0.6:
+        return action, highest if roll < 0.1 else lowest
+    return calling_policy(engine, player, legal, rng)
+
+class Script:
+    # Plays the given actions in turn, over and over, checking or calling
+    # instead of any that is not legal at the time. Bets and raises are the
+    # minimum.
+    def __init__(self, *actions: str):
+        self.actions = actions
+        self.played = 0
+
+    def __call__(self, engine, player, legal, rng: random.Random) -> tuple[str, int]:
+        wanted = self.actions[self.played % len(self.actions)]
+        self.played += 1
+        for action, lowest, _ in legal:
+            if action == wanted or {action, wanted} == {'bet', 'raise'}:
+                return action, lowest
+        return calling_policy(engine, player, legal, rng)
+
+POLICIES = {
+    'random': random_policy,
+    'calling': calling_policy,
+    'aggressive': aggressive_policy,
+    'script': Script('call', 'raise', 'check', 'fold'),
+}
+
+class Table:
+    def __init__(self, game_id: int, players: int, policies: list):
+        self.game = PokerGame(game_id)
+        scheduler.cancel(self.game.reap_timer)
+        for seat in range(players):
+            self.game.add_player(f'bot{game_id}.{seat}')
+        self.engine = logic.HoldemEngine(self.game)
+        self.game.engine = self.engine
+        self.policies = {player.addr: policies[seat % len(policies)] for seat, player in enumerate(self.game.players)}
+        self.chips = sum(player.balance for player in self.game.players)
+
+    def chips_in_play(self) -> int:
+        game = self.game
+        return sum(p.balance + p.cur_bet for p in game.players) + sum(pot.total for pot in game.pots)
+
+    # The engine state an illegal action must leave alone.
+    def state(self) -> tuple:
+        engine = self.engine
+        return (engine.state, engine.turn, engine.pending, engine.last_bet, engine.min_raise,
+            tuple((p.balance, p.cur_bet, p.total_bet, p.pots) for p in self.game.players))
+
+    def check(self) -> None:
+        engine, players = self.engine, self.game.players
+        if self.chips_in_play() != self.chips:
+            raise Violation(f'{self.chips_in_play()} chips in play, expected {self.chips}')
+        if engine.state in logic.BETTING:
+            collected = sum(pot.total for pot in self.game.pots)
+            if sum(p.total_bet - p.cur_bet for p in engine.in_hand.values()) != collected:
+                raise Violation(f'bets this hand do not add up to the pot of {collected}')
+            player = engine.in_hand.get(engine.turn)
+            if player is None or not player.pots or player.balance <= 0:
+                raise Violation(f'seat {engine.turn} is to act but cannot')
+        if any(p.balance < 0 or p.cur_bet < 0 for p in players):
+            raise Violation('negative balance or bet')
+
+    # Tries an illegal action, which must be rejected with nothing changed.
+    def try_illegal(self, rng: random.Random) -> bool:
+        engine = self.engine
+        player = engine.in_hand[engine.turn]
+        to_call = engine.last_bet - player.cur_bet
+        others = [p for p in engine.in_hand.values() if p is not player]
+        attempts = [
+            (rng.choice(others).addr, 'call' if to_call else 'check', 0), #Out of turn
+            (player.addr, 'check' if to_call else 'call', 0),
+            (player.addr, 'bet' if engine.last_bet else 'raise', engine.last_bet + engine.min_raise),
+            (player.addr, 'shove', 0),
+        ]
+        if engine.min_raise > 1 and engine.last_bet and engine.last_bet + engine.min_raise <= player.cur_bet + player.balance:
+            attempts.append((player.addr, 'raise', engine.last_bet + engine.min_raise - 1)) #Under the minimum
+        addr, action, amount = rng.choice(attempts)
+        before = self.state()
+        response = engine.act(addr, action, amount)
+        if response['code'] != '400' or self.state() != before:
+            raise Violation(f'illegal {action} {amount} by {addr} was accepted or changed the table')
+        return True
+
+    # Plays one hand to the end, returning the actions taken, the illegal
+    # ones tried and whether it went to a showdown.
+    def play_hand(self, rng: random.Random, illegal: float) -> tuple[int, int, bool]:
+        game, engine = self.game, self.engine
+        for player in game.players:
+            if player.sit_out:
+                self.chips += game.buy_in - player.balance #Rebuy
+                player.balance, player.sit_out = game.buy_in, False
+        scheduler.cancel(engine.start_timer)
+        engine.start_hand()
+        dealt_in = list(engine.in_hand.values())
+        dealt = [card for p in dealt_in for card in p.hole]
+        if len(set(dealt)) != len(dealt):
+            raise Violation('a card was dealt twice')
+
+        actions = tried = 0
+        while engine.state in logic.BETTING:
+            self.check()
+            if actions == MAX_ACTIONS:
+                raise Violation(f'hand still going after {MAX_ACTIONS} actions')
+            if illegal and rng.random() < illegal:
+                tried += self.try_illegal(rng)
+            player = engine.in_hand[engine.turn]
+            legal = legal_actions(engine)
+            action, amount = self.policies[player.addr](engine, player, legal, rng)
+            response = engine.act(player.addr, action, amount)
+            if response['code'] != '200':
+                raise Violation(f'legal {action} {amount} by seat {player.seat} rejected: {response['message']}')
+            actions += 1
+
+        self.check()
+        if engine.state != logic.WAITING:
+            raise Violation(f'hand ended in state {engine.state}')
+        cards = dealt + game.cards
+        showdown = any(p.rank for p in dealt_in)
+        if len(set(cards)) != len(cards) or (showdown and len(game.cards) != 5):
+            raise Violation(f'bad board {game.cards}')
+        return actions, tried, showdown
+
+# Plays hands on tables until there are no hands left, in one process.
+def play(seed: int, tables: int, players: int, hands: int, policies: list, illegal: float = 0.0) -> dict:
+    settings.HAND_START_DELAY = 3600 #Hands are started by play_hand()
+    settings.ACTION_TIMEOUT = 3600
+    rng = random.Random(seed)
+    policies = [POLICIES[policy] if isinstance(policy, str) else policy for policy in policies]
+    table_list = [Table(seed * tables + index, players, policies) for index in range(tables)]
+    for table in table_list:
+        table.game.deck.random = rng.random
+    result = {'hands': 0, 'actions': 0, 'illegal_tried': 0, 'showdowns': 0, 'side_pots': 0, 'violations': []}
+    start_cpu, start = time.process_time(), time.perf_counter()
+    while result['hands'] < hands:
+        for index, table in enumerate(table_list):
+            if result['hands'] == hands:
+                break
+            try:
+                actions, tried, showdown = table.play_hand(rng, illegal)
+            except Violation as e:
+                if len(result['violations']) < MAX_VIOLATIONS:
+                    result['violations'].append({'seed': seed, 'table': table.game.id, 'hand': table.engine.hand_no, 'error': str(e)})
+                table_list[index] = Table(table.game.id, players, policies)
+                table_list[index].game.deck.random = rng.random
+                actions = tried = showdown = 0
+            result['hands'] += 1
+            result['actions'] += actions
+            result['illegal_tried'] += tried
+            result['showdowns'] += showdown
+            result['side_pots'] += showdown and len(table.game.pots) > 1
+    result['cpu_seconds'] = time.process_time() - start_cpu
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+# Splits hands and tables over worker processes and adds up their results.
+def run(hands: int, tables: int = 64, players: int = 6, workers: int = 1, policies: list = ('random',),
+        illegal: float = 0.0, seed: int = 0) -> dict:
+    total = {'hands': 0, 'actions': 0, 'illegal_tried': 0, 'showdowns': 0, 'side_pots': 0, 'violations': [], 'cpu_seconds': 0.0}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(play, seed + worker, max(1, tables // workers), players,
+            hands // workers + (worker < hands % workers), list(policies), illegal) for worker in range(workers)]
+        for job in jobs:
+            result = job.result()
+            for key in total:
+                total[key] += result[key]
+    total['seconds'] = time.perf_counter() - start
+    total['workers'] = workers
+    return total
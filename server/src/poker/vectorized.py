@@ -0,0 +1,41 @@
+import numpy as np
+from poker import evaluator
+
+# Array versions of the evaluator tables. The rank table is keyed by a sparse
+# 39 bit hash, so it is stored as sorted keys searched with searchsorted.
+RANK_KEY = np.array(evaluator.RANK_KEY, dtype=np.int64)
+RANK_BIT = np.array(evaluator.RANK_BIT, dtype=np.int64)
+SUIT_KEY = np.array(evaluator.SUIT_KEY, dtype=np.int64)
+FLUSH_TABLE = np.array(evaluator.FLUSH_TABLE, dtype=np.int64)
+RANK_TABLE_KEYS = np.array(sorted(evaluator.RANK_TABLE), dtype=np.int64)
+RANK_TABLE_VALUES = np.array([evaluator.RANK_TABLE[key] for key in RANK_TABLE_KEYS.tolist()], dtype=np.int64)
+
+# Maps the single set flush bit of a hand to its suit.
+FLUSH_SUIT = np.zeros(evaluator.FLUSH_BITS + 1, dtype=np.int64)
+for flush_bit, flush_suit in evaluator.FLUSH_SUIT.items():
+    FLUSH_SUIT[flush_bit] = flush_suit
+
+# Takes an (N, k) array of evaluator card codes, 5 <= k <= 7, and returns the
+# (N,) array of strengths evaluator.evaluate gives for each row.
+def evaluate_batch(cards: np.ndarray) -> np.ndarray:
+    cards = np.asarray(cards, dtype=np.intp)
+    if cards.ndim != 2 or not 5 <= cards.shape[1] <= 7:
+        raise ValueError(f'Expected an (N, 5-7) array of cards, got shape {cards.shape}.')
+    if cards.size and (cards.min() < 0 or cards.max() > 51):
+        raise ValueError('Cards must be encoded as integers 0-51.')
+
+    keys = RANK_KEY[cards].sum(axis=1)
+    strengths = RANK_TABLE_VALUES[np.searchsorted(RANK_TABLE_KEYS, keys)]
+
+    flush = (evaluator.SUIT_START + SUIT_KEY[cards].sum(axis=1)) & evaluator.FLUSH_BITS
+    rows = np.flatnonzero(flush)
+    if rows.size:
+        suited = cards[rows]
+        in_suit = (suited & 3) == FLUSH_SUIT[flush[rows]][:, None]
+        # Ranks within one suit are distinct, so summing their bits is an OR.
+        masks = np.where(in_suit, RANK_BIT[suited], 0).sum(axis=1)
+        strengths[rows] = FLUSH_TABLE[masks]
+    return strengths
+
+def categories(strengths: np.ndarray) -> np.ndarray:
+    return np.asarray(strengths) >> 20
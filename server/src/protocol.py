@@ -0,0 +1,65 @@
+import socket
+import struct
+
+# Every message on the wire is a 4 byte big-endian payload length followed by
+# the payload, a message encoded by codec.py.
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 1 << 20
+
+class ProtocolError(Exception):
+    pass
+
+def encode_frame(payload: bytes) -> bytes:
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f'Frame of {len(payload)} bytes exceeds {MAX_FRAME_SIZE}.')
+    return HEADER.pack(len(payload)) + payload
+
+class FrameBuffer:
+    def __init__(self, size: int = 1024):
+        self.buffer = bytearray(size)
+        self.start = 0
+        self.end = 0
+
+    def recv_into(self, conn: socket.socket) -> int:
+        self.reserve(1)
+        with memoryview(self.buffer) as view:
+            count = conn.recv_into(view[self.end:])
+        self.end += count
+        return count
+
+    def feed(self, data: bytes) -> None:
+        self.reserve(len(data))
+        self.buffer[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    def reserve(self, count: int) -> None:
+        if self.end + count <= len(self.buffer):
+            return
+        # Slide unread bytes to the front before growing the buffer.
+        pending = self.end - self.start
+        if self.start:
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+            self.start, self.end = 0, pending
+        if pending + count > len(self.buffer):
+            self.buffer.extend(bytes(pending + count - len(self.buffer)))
+
+    def __iter__(self):
+        buffer, unpack_from, size = self.buffer, HEADER.unpack_from, HEADER.size
+        while True:
+            available = self.end - self.start
+            if available < size:
+                self.compact()
+                return
+            (length,) = unpack_from(buffer, self.start)
+            if length > MAX_FRAME_SIZE:
+                raise ProtocolError(f'Frame of {length} bytes exceeds {MAX_FRAME_SIZE}.')
+            if available < size + length:
+                self.reserve(size + length - available)
+                return
+            begin = self.start + size
+            self.start = begin + length
+            yield bytes(buffer[begin:self.start])
+
+    def compact(self) -> None:
+        if self.start == self.end:
+            self.start = self.end = 0
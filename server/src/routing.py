@@ -1,3 +1,23 @@
+import collections
+import itertools
+import log
+import metrics
+import queue
+import scheduler
+import settings
+import threading
+import time
+from time import perf_counter_ns
+
+# How long handlers take, on whichever thread runs them, and how long posted
+# messages wait in an AsyncRouter's inbox first.
+TO_GAME = metrics.histogram('router.to_game')
+TO_SERVER = metrics.histogram('router.to_server')
+INBOX_WAIT = metrics.histogram('router.inbox_wait')
+TIMEOUTS = metrics.counter('router.timeouts')
+ROUTERS = log.category('router')
+ERRORS = log.category('error')
+
 class MessageRouter:
     def __init__(self):
         self.gameside_handler = None
@@ -11,41 +31,228 @@ class MessageRouter:
 
     def send_msg_to_server(self, message):
         if self.serverside_handler:
+            start = perf_counter_ns() if metrics.sampling else 0
             response = self.serverside_handler(message)
+            if start:
+                TO_SERVER.observe(perf_counter_ns() - start)
             return response
 
     def send_msg_to_game(self, message):
         if self.gameside_handler:
+            start = perf_counter_ns() if metrics.sampling else 0
             response = self.gameside_handler(message)
+            if start:
+                TO_GAME.observe(perf_counter_ns() - start)
             return response
 
+    # Same calls as AsyncRouter; here the handler runs inline and on_reply
+    # gets its result straight away.
+    def post_to_game(self, message, on_reply=None, timeout=None) -> None:
+        response = self.send_msg_to_game(message)
+        if on_reply:
+            on_reply(response)
+
+    def post_to_server(self, message, on_reply=None, timeout=None) -> None:
+        response = self.send_msg_to_server(message)
+        if on_reply:
+            on_reply(response)
+
+# Replies waiting on an AsyncRouter, by correlation id. One sweep a second
+# times out the overdue ones, rather than a timer per request.
+pending: dict[int, tuple] = {}
+pending_lock = threading.Lock()
+request_ids = itertools.count()
+sweeping = False
+
+def expect_reply(on_reply, timeout: float | None) -> int:
+    global sweeping
+    request_id = next(request_ids)
+    deadline = time.monotonic() + (timeout or settings.ROUTER_TIMEOUT)
+    with pending_lock:
+        pending[request_id] = (on_reply, deadline)
+        if not sweeping:
+            sweeping = True
+            scheduler.call_later(1, sweep)
+    return request_id
+
+def sweep() -> None:
+    global sweeping
+    now = time.monotonic()
+    with pending_lock:
+        expired = [request_id for request_id, (_, deadline) in pending.items() if deadline <= now]
+        sweeping = bool(pending)
+        if sweeping:
+            scheduler.call_later(1, sweep)
+    TIMEOUTS.add(len(expired))
+    for request_id in expired:
+        resolve(request_id, {'code': '400', 'message': 'Timed out'})
+
+def resolve(request_id: int, response) -> None:
+    with pending_lock:
+        entry = pending.pop(request_id, None)
+    if entry:
+        try:
+            entry[0](response)
+        except Exception as e:
+            ERRORS('reply', error=e)
+
+# Messages for a table queue in its router's inbox, and a pool of
+# ROUTER_WORKERS threads runs the handlers, so posting never waits on game
+# logic. A router is on at most one worker at a time, which keeps each
+# table's messages in order. A worker takes up to ROUTER_BATCH messages per
+# turn and then puts a still-busy router at the back of the line.
+class AsyncRouter(MessageRouter):
+    def __init__(self):
+        super().__init__()
+        self.inbox = collections.deque()
+        self.lock = threading.Lock()
+        self.scheduled = False
+
+    def post(self, to_game: bool, message, on_reply, timeout) -> int | None:
+        request_id = expect_reply(on_reply, timeout) if on_reply else None
+        posted = perf_counter_ns() if metrics.sampling else 0
+        with self.lock:
+            self.inbox.append((to_game, message, request_id, posted))
+            if self.scheduled:
+                return request_id
+            self.scheduled = True
+        dispatcher.schedule(self)
+        return request_id
+
+    def post_to_game(self, message, on_reply=None, timeout=None) -> int | None:
+        return self.post(True, message, on_reply, timeout)
+
+    def post_to_server(self, message, on_reply=None, timeout=None) -> int | None:
+        return self.post(False, message, on_reply, timeout)
+
+    # Blocking calls for code that needs the answer in hand.
+    def send_msg_to_game(self, message):
+        return self.wait_for(True, message)
+
+    def send_msg_to_server(self, message):
+        return self.wait_for(False, message)
+
+    def wait_for(self, to_game: bool, message):
+        done = threading.Event()
+        slot = []
+        def on_reply(response) -> None:
+            slot.append(response)
+            done.set()
+        self.post(to_game, message, on_reply, None)
+        done.wait()
+        return slot[0]
+
+    def drain(self) -> None:
+        with self.lock:
+            count = min(len(self.inbox), settings.ROUTER_BATCH)
+            batch = [self.inbox.popleft() for _ in range(count)]
+        for to_game, message, request_id, posted in batch:
+            handler = self.gameside_handler if to_game else self.serverside_handler
+            start = perf_counter_ns() if metrics.sampling else 0
+            if posted:
+                INBOX_WAIT.observe((start or perf_counter_ns()) - posted)
+            try:
+                response = handler(message) if handler else None
+            except Exception as e:
+                ERRORS('handler', message=message, error=e)
+                response = {'code': '400', 'message': str(e)}
+            if start:
+                (TO_GAME if to_game else TO_SERVER).observe(perf_counter_ns() - start)
+            if request_id is not None:
+                resolve(request_id, response)
+        with self.lock:
+            if not self.inbox:
+                self.scheduled = False
+                return
+        dispatcher.schedule(self)
+
+class Dispatcher:
+    def __init__(self):
+        self.ready = queue.SimpleQueue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def schedule(self, router: AsyncRouter) -> None:
+        if not self.threads:
+            self.start()
+        self.ready.put(router)
+
+    def start(self) -> None:
+        with self.lock:
+            while len(self.threads) < settings.ROUTER_WORKERS:
+                thread = threading.Thread(target=self.run, name='router', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def run(self) -> None:
+        while True:
+            self.ready.get().drain()
+
+dispatcher = Dispatcher()
+routers_by_mode = {
+    'direct': MessageRouter,
+    'async': AsyncRouter,
+}
+
+# Lookups read routers without a lock; a dict get is atomic. Creating and
+# closing take one of STRIPES locks picked by id, so a check-then-insert on
+# one id never races while other ids go ahead. A change only marks the
+# snapshot stale; get_all_routers copies the registry again on its next call
+# and otherwise hands out the last copy without a lock.
+STRIPES = 16
+
 routers: dict[int, MessageRouter] = {}
+close_handlers = []
+stripe_locks = [threading.Lock() for _ in range(STRIPES)]
+snapshot_lock = threading.Lock()
+snapshot: tuple[MessageRouter, ...] = ()
+stale = False
+metrics.gauge('routers', lambda: len(routers))
+metrics.gauge('router.pending_replies', lambda: len(pending))
+
+def changed() -> None:
+    global stale
+    stale = True
 
 def new_router(router_id: int) -> MessageRouter:
-    if router_id not in routers:
-        router = MessageRouter()
-        routers[router_id] = router
-        return router
+    with stripe_locks[hash(router_id) % STRIPES]:
+        if router_id not in routers:
+            router = routers_by_mode[settings.ROUTER_MODE]()
+            routers[router_id] = router
+            changed()
+            return router
     raise Exception('Router already exists.')
 
 def close_router(router_id: int) -> None:
-    if router_id in routers:
-        del routers[router_id]
-        try:
-            print(routers[router_id])
-        except:
-            print(f'Router {router_id} Deleted')
+    with stripe_locks[hash(router_id) % STRIPES]:
+        router = routers.pop(router_id, None)
+        if router is not None:
+            changed()
+    if router is not None:
+        for handler in close_handlers:
+            handler(router_id)
+        ROUTERS('closed', router=router_id)
         return
     raise Exception('Router does not exist.')
 
+def on_close(handler) -> None:
+    close_handlers.append(handler)
+
 def get_router(router_id: int) -> MessageRouter:
     router = routers[router_id]
     return router
 
-def get_all_routers() -> list[MessageRouter]:
-    all_routers = list(routers.values())
-    return all_routers
+# The flag is cleared before copying, so a change made during the copy
+# leaves it set for the next call.
+def get_all_routers() -> tuple[MessageRouter, ...]:
+    global snapshot, stale
+    if stale:
+        with snapshot_lock:
+            if stale:
+                stale = False
+                snapshot = tuple(routers.values())
+    return snapshot
 
-def get_all_router_ids() -> list[MessageRouter]:
+def get_all_router_ids() -> list[int]:
     all_routers = list(routers.keys())
     return all_routers
\ No newline at end of file
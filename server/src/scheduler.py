@@ -0,0 +1,88 @@
+import heapq
+import itertools
+import log
+import threading
+import time
+
+# One thread runs every delayed callback in the process (idle-table reaping,
+# hand timers) off a heap of deadlines, instead of a sleeping thread per job.
+
+ERRORS = log.category('error')
+
+class Timer:
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline: float, callback, args: tuple):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+class Scheduler:
+    def __init__(self):
+        self.heap: list[tuple[float, int, Timer]] = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.cancelled = 0
+        self.thread = None
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        timer = Timer(time.monotonic() + delay, callback, args)
+        with self.condition:
+            heapq.heappush(self.heap, (timer.deadline, next(self.counter), timer))
+            if self.heap[0][2] is timer:
+                self.condition.notify()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='scheduler', daemon=True)
+                self.thread.start()
+        return timer
+
+    def cancel(self, timer: Timer) -> None:
+        with self.condition:
+            if timer.cancelled:
+                return
+            timer.cancelled = True
+            self.cancelled += 1
+            # Rebuild once most of the heap is dead entries.
+            if self.cancelled > 64 and self.cancelled * 2 > len(self.heap):
+                self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+                heapq.heapify(self.heap)
+                self.cancelled = 0
+
+    def pending(self) -> int:
+        with self.condition:
+            return len(self.heap) - self.cancelled
+
+    def next_due(self) -> Timer:
+        with self.condition:
+            while True:
+                while self.heap and self.heap[0][2].cancelled:
+                    heapq.heappop(self.heap)
+                    self.cancelled -= 1
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                delay = self.heap[0][0] - time.monotonic()
+                if delay <= 0:
+                    timer = heapq.heappop(self.heap)[2]
+                    # Marks the timer as spent so a late cancel is a no-op.
+                    timer.cancelled = True
+                    return timer
+                self.condition.wait(delay)
+
+    def run(self) -> None:
+        while True:
+            timer = self.next_due()
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                ERRORS('timer', callback=timer.callback, error=e)
+
+scheduler = Scheduler()
+
+def call_later(delay: float, callback, *args) -> Timer:
+    return scheduler.call_later(delay, callback, *args)
+
+def cancel(timer: Timer | None) -> None:
+    if timer:
+        scheduler.cancel(timer)
@@ -1,8 +1,18 @@
-from communication import handle_client
+from communication import handle_client, handle_client_async, restore_tables
+from poker import logic
+import argparse
+import asyncio
+import checkpoint
+import history
+import log
+import metrics
 import settings
+import shards
 import socket
 import threading
 
+CONNECTIONS = log.category('connection')
+
 def start_client_thread(conn: socket.socket, addr: str) -> None:
         buffer = settings.BUFFER_SIZE
         thread = threading.Thread(target=handle_client, args=(conn, addr, buffer))
@@ -10,13 +20,67 @@ def start_client_thread(conn: socket.socket, addr: str) -> None:
 
 def start_server(HOST: str, PORT: int) -> socket.socket:
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Lets a restarted server rebind while the old connections linger.
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     server.bind ((HOST, PORT))
-    server.listen(5)
+    server.listen(settings.BACKLOG)
 
     while True:
         conn, addr = server.accept()
         start_client_thread(conn, addr)
-        print(f'Connected by {addr}\n')
+        CONNECTIONS('connected', addr=addr)
+
+def start_async_server(HOST: str, PORT: int) -> None:
+    asyncio.run(serve_async(HOST, PORT))
+
+async def serve_async(HOST: str, PORT: int) -> None:
+    async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        CONNECTIONS('connected', addr=writer.get_extra_info('peername'))
+        await handle_client_async(reader, writer, settings.BUFFER_SIZE)
+
+    server = await asyncio.start_server(on_connect, HOST or None, PORT, family=socket.AF_INET, backlog=settings.BACKLOG)
+    async with server:
+        await server.serve_forever()
+
+servers = {
+    'thread': start_server,
+    'async': start_async_server,
+}
 
 if __name__ == '__main__':
-    start_server(settings.HOST, settings.PORT)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=servers, default=settings.SERVER_MODE)
+    parser.add_argument('--host', default=settings.HOST)
+    parser.add_argument('--port', type=int, default=settings.PORT)
+    parser.add_argument('--shards', type=int, default=settings.SHARDS)
+    parser.add_argument('--router', choices=('direct', 'async'), default=settings.ROUTER_MODE)
+    parser.add_argument('--history', default=settings.HISTORY_DIR, help="hand history directory, '' to disable")
+    parser.add_argument('--checkpoint', default=settings.CHECKPOINT_PATH, help="table checkpoint file, '' to disable")
+    parser.add_argument('--log', default=settings.LOG_PATH, help="log file, '' for stdout; shard i logs to the file + '.shard{i}'")
+    parser.add_argument('--log-off', default='', help='comma separated log categories to turn off')
+    parser.add_argument('--stats-port', type=int, default=settings.STATS_PORT, help='metrics over HTTP on STATS_HOST, 0 to disable; shard i uses the port + 1 + i')
+    args = parser.parse_args()
+    settings.ROUTER_MODE = args.router
+    settings.LOG_CATEGORIES = {name: dict(entry) for name, entry in settings.LOG_CATEGORIES.items()}
+    for name in filter(None, args.log_off.split(',')):
+        settings.LOG_CATEGORIES.setdefault(name, {})['enabled'] = False
+    log.apply_settings()
+    log.start(args.log)
+    metrics.gauge('log', log.summary)
+    if args.stats_port:
+        metrics.serve(settings.STATS_HOST, args.stats_port)
+    if args.shards:
+        shards.start(args.shards, {
+            'HISTORY_DIR': args.history,
+            'CHECKPOINT_PATH': args.checkpoint,
+            'STATS_PORT': args.stats_port,
+            'LOG_PATH': args.log,
+            'LOG_CATEGORIES': settings.LOG_CATEGORIES,
+            'ROUTER_MODE': settings.ROUTER_MODE,
+        })
+    else:
+        if args.history:
+            history.start(args.history)
+        if args.checkpoint:
+            restore_tables(logic.restore_games(checkpoint.start(args.checkpoint)))
+    servers[args.mode](args.host, args.port)
\ No newline at end of file
@@ -1,3 +1,38 @@
 HOST = ''
 PORT = 50010
-BUFFER_SIZE = 1024
\ No newline at end of file
+BUFFER_SIZE = 1024
+BACKLOG = 128
+SERVER_MODE = 'thread'
+TABLE_GRACE_PERIOD = 30
+RESTORE_CLAIM_PERIOD = 300
+EQUITY_TARGET_CI = 0.01
+BUY_IN = 5000
+HAND_START_DELAY = 5
+ACTION_TIMEOUT = 30
+SHARDS = 0
+SEND_QUEUE_HIGH = 256 * 1024
+SEND_QUEUE_LOW = 64 * 1024
+SEND_QUEUE_LIMIT = 1024 * 1024
+SLOW_CLIENT_TIMEOUT = 10
+ROUTER_MODE = 'direct'
+ROUTER_WORKERS = 4
+ROUTER_BATCH = 32
+ROUTER_TIMEOUT = 5
+HISTORY_DIR = 'history'
+HISTORY_MAX_BYTES = 64 * 1024 * 1024
+HISTORY_FSYNC_INTERVAL = 1
+CHECKPOINT_PATH = 'tables.ckpt'
+CHECKPOINT_SLOTS = 256
+CHECKPOINT_SYNC_INTERVAL = 5
+STATS_HOST = '127.0.0.1'
+STATS_PORT = 50011
+METRICS_SAMPLE = 16
+METRICS_WINDOW = 0.01
+LOG_PATH = ''
+LOG_QUEUE_LIMIT = 10000
+LOG_CATEGORIES = {
+    'connection': {'rate': 200},
+    'game': {'rate': 100},
+    'router': {'rate': 100},
+    'error': {'rate': 100},
+}
\ No newline at end of file
@@ -0,0 +1,153 @@
+import checkpoint
+import history
+import itertools
+import log
+import metrics
+import multiprocessing
+from multiprocessing.connection import Connection
+import routing
+import settings
+import threading
+
+# In sharded mode every table lives in one of N worker processes, picked by
+# game id. The main process keeps a proxy MessageRouter per table, so
+# communication.py talks to remote tables exactly as it does to local ones:
+# send_msg_to_game becomes a request over the shard's pipe, and the table's
+# events are posted back to the proxy's server side.
+#
+# Pipe messages:
+#   main -> shard  ('create', request_id, name, game_id)
+#                  ('msg', request_id, game_id, message)
+#   shard -> main  ('reply', request_id, result)
+#                  ('event', game_id, message)
+#                  ('closed', game_id)
+#                  ('restored', game_id)
+
+class Shard:
+    def __init__(self, index: int, overrides: dict):
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=run_shard, args=(index, child_conn, overrides), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.send_lock = threading.Lock()
+        self.request_ids = itertools.count()
+        self.pending: dict[int, list] = {}
+        self.reader = threading.Thread(target=self.read_replies, daemon=True)
+        self.reader.start()
+
+    def request(self, kind: str, *args):
+        request_id = next(self.request_ids)
+        done = threading.Event()
+        slot = [done, None]
+        self.pending[request_id] = slot
+        with self.send_lock:
+            self.conn.send((kind, request_id, *args))
+        done.wait()
+        return slot[1]
+
+    def read_replies(self) -> None:
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            match message:
+                case ('reply', request_id, result):
+                    slot = self.pending.pop(request_id)
+                    slot[1] = result
+                    slot[0].set()
+                case ('event', game_id, event):
+                    router = routing.routers.get(game_id)
+                    if router:
+                        router.post_to_server(event)
+                case ('closed', game_id):
+                    if game_id in routing.routers:
+                        routing.close_router(game_id)
+                case ('restored', game_id):
+                    attach(self, game_id)
+                    for handler in restore_handlers:
+                        handler(game_id)
+
+        # The shard is gone; fail whatever was still waiting on it.
+        for request_id in list(self.pending):
+            slot = self.pending.pop(request_id)
+            slot[1] = {'code': '400', 'message': 'Shard stopped'}
+            slot[0].set()
+
+    def stop(self) -> None:
+        self.conn.close()
+        self.process.join(timeout=1)
+
+shards: list[Shard] = []
+restore_handlers = []
+
+# Called with the id of every table a shard restores from its checkpoint.
+def on_restore(handler) -> None:
+    restore_handlers.append(handler)
+
+def start(count: int, overrides: dict | None = None) -> None:
+    for index in range(count):
+        shards.append(Shard(index, overrides or {}))
+
+def stop() -> None:
+    while shards:
+        shards.pop().stop()
+
+def active() -> bool:
+    return bool(shards)
+
+def shard_for(game_id: int) -> Shard:
+    return shards[hash(game_id) % len(shards)]
+
+def create_game(name: str, game_id: int) -> None:
+    shard = shard_for(game_id)
+    shard.request('create', name, game_id)
+    attach(shard, game_id)
+
+def attach(shard: Shard, game_id: int) -> None:
+    router = routing.new_router(game_id)
+    router.register_game_handler(lambda message: shard.request('msg', game_id, message))
+
+def run_shard(index: int, conn: Connection, overrides: dict) -> None:
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    log.apply_settings()
+    log.start(f'{settings.LOG_PATH}.shard{index}' if settings.LOG_PATH else '')
+    metrics.gauge('log', log.summary)
+    from poker import logic
+    if overrides.get('HISTORY_DIR'):
+        history.start(settings.HISTORY_DIR, f'shard{index}')
+    if overrides.get('STATS_PORT'):
+        metrics.serve(settings.STATS_HOST, settings.STATS_PORT + 1 + index)
+
+    send_lock = threading.Lock()
+    def send(message: tuple) -> None:
+        with send_lock:
+            conn.send(message)
+
+    routing.on_close(lambda game_id: send(('closed', game_id)))
+    def serve(game_id: int) -> None:
+        router = routing.get_router(game_id)
+        router.register_server_handler(lambda event: send(('event', game_id, event)))
+
+    if overrides.get('CHECKPOINT_PATH'):
+        tables = checkpoint.start(f'{settings.CHECKPOINT_PATH}.shard{index}')
+        for game_id in logic.restore_games(tables):
+            serve(game_id)
+            send(('restored', game_id))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        match message:
+            case ('create', request_id, name, game_id):
+                logic.create_local_game(name, game_id)
+                serve(game_id)
+                send(('reply', request_id, None))
+            case ('msg', request_id, game_id, game_message):
+                router = routing.routers.get(game_id)
+                result = router.send_msg_to_game(game_message) if router else {'code': '400', 'message': 'Game not found'}
+                send(('reply', request_id, result))
@@ -0,0 +1,13 @@
+import os
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import log
+import settings
+
+# Tests check state, not the event log.
+settings.LOG_CATEGORIES = {name: {'enabled': False} for name in settings.LOG_CATEGORIES}
+log.apply_settings()
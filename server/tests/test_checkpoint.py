@@ -0,0 +1,86 @@
+import common
+import checkpoint
+import communication
+from poker import logic
+import poker.objects as poker
+import os
+import routing
+import scheduler
+import settings
+import tempfile
+import unittest
+from test_rooms import Connection
+
+# Tables restored from a checkpoint: seats come back under the username,
+# for that user to reclaim from a new connection, and seats nobody
+# reclaims are released so the table can be reaped.
+
+class RestoreTest(unittest.TestCase):
+    def setUp(self):
+        routing.routers.clear()
+        routing.changed()
+        poker.games.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, 'tables.ckpt')
+        checkpoint.start(path)
+        logic.create_local_game('holdem', 1)
+        game = poker.games[1]
+        for name, port in (('alice', 1000), ('bob', 1001)):
+            game.handle_message(f"player:add:('10.0.0.1', {port})|{name}")
+        game.players[0].balance = 1234
+        game.engine.checkpoint()
+        scheduler.cancel(game.engine.start_timer)
+        checkpoint.stop()
+
+        routing.routers.clear()
+        routing.changed()
+        poker.games.clear()
+        logic.restore_games(checkpoint.start(path))
+        self.game = poker.games[1]
+
+    def tearDown(self):
+        checkpoint.stop()
+        self.directory.cleanup()
+        for game in list(poker.games.values()):
+            scheduler.cancel(game.release_timer)
+            game.players.clear()
+            game.reap()
+
+    def test_restored_by_name(self):
+        self.assertEqual([(p.seat, p.name, p.addr, p.balance) for p in self.game.players],
+            [(0, 'alice', '', 1234), (1, 'bob', '', settings.BUY_IN)])
+        self.assertIsNone(self.game.reap_timer)
+        self.assertIsNotNone(self.game.release_timer)
+
+    def test_reclaim_from_new_address(self):
+        self.game.handle_message("player:add:('10.0.0.2', 2000)|alice")
+        alice = self.game.players[0]
+        self.assertEqual((alice.seat, alice.addr, alice.balance, alice.sit_out), (0, "('10.0.0.2', 2000)", 1234, False))
+        self.assertEqual(len(self.game.players), 2)
+
+    def test_release_unclaimed(self):
+        self.game.handle_message("player:add:('10.0.0.2', 2000)|alice")
+        self.game.handle_message('player:release:')
+        self.assertEqual([p.name for p in self.game.players], ['alice'])
+
+    def test_release_all_reaps(self):
+        self.game.handle_message('player:release:')
+        self.assertEqual(self.game.players, [])
+        self.assertIsNotNone(self.game.reap_timer)
+        self.game.reap()
+        self.assertNotIn(1, poker.games)
+
+class NameSizeTest(unittest.TestCase):
+    def test_long_username_refused(self):
+        conn = Connection()
+        communication.create_new_user(conn, 'addr', 'x' * (checkpoint.NAME_SIZE + 1))
+        self.assertNotIn('addr', communication.clients)
+        self.assertEqual(len(conn.sent), 1)
+
+    def test_longest_username_kept(self):
+        name = 'é' * (checkpoint.NAME_SIZE // 2)
+        packed = checkpoint.PLAYER.pack(0, 0, 0, name.encode('utf-8'))
+        self.assertEqual(checkpoint.PLAYER.unpack(packed)[3].rstrip(b'\0').decode('utf-8'), name)
+
+if __name__ == '__main__':
+    unittest.main()
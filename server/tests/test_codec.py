@@ -0,0 +1,63 @@
+import common
+import codec
+from protocol import ProtocolError
+import struct
+import unittest
+
+# Every message in SCHEMA must survive a round trip, and a malformed payload
+# must raise ProtocolError rather than anything the reader would not catch.
+
+SAMPLES = {'B': 200, 'H': 60000, 'I': 4000000000, 's': 'héllo:world', 'y': b'\x00\xff\x01'}
+
+class CodecTest(unittest.TestCase):
+    def sample(self, fields: str) -> tuple:
+        return tuple(SAMPLES[kind] for kind in fields)
+
+    def test_round_trip(self):
+        for opcode, fields in codec.SCHEMA.items():
+            with self.subTest(opcode=opcode):
+                values = self.sample(fields)
+                self.assertEqual(codec.decode(codec.encode(opcode, *values)), (opcode, *values))
+
+    def test_round_trip_empty_tail(self):
+        for opcode, fields in codec.SCHEMA.items():
+            if fields[-1] not in 'sy':
+                continue
+            with self.subTest(opcode=opcode):
+                values = tuple('' if kind == 's' else b'' if kind == 'y' else SAMPLES[kind] for kind in fields)
+                self.assertEqual(codec.decode(codec.encode(opcode, *values)), (opcode, *values))
+
+    def test_truncated_fixed_fields(self):
+        for opcode, fields in codec.SCHEMA.items():
+            payload = codec.encode(opcode, *self.sample(fields))
+            for cut in range(1, struct.calcsize('!B' + fields.rstrip('sy'))):
+                with self.subTest(opcode=opcode, cut=cut):
+                    with self.assertRaises(ProtocolError):
+                        codec.decode(payload[:cut])
+
+    def test_length_past_end(self):
+        payload = codec.encode(codec.CHAT_MSG, 'sender', 'text')
+        for cut in range(2, len(payload) - len('text')):
+            with self.subTest(cut=cut):
+                with self.assertRaises(ProtocolError):
+                    codec.decode(payload[:cut])
+        bad = bytes([codec.CHAT_MSG]) + codec.STRING.pack(1000) + b'short'
+        with self.assertRaises(ProtocolError):
+            codec.decode(bad)
+
+    def test_bad_utf8(self):
+        with self.assertRaises(ProtocolError):
+            codec.decode(bytes([codec.USER]) + b'\xff\xfe')
+
+    def test_oversize_field(self):
+        with self.assertRaises(ProtocolError):
+            codec.encode(codec.CHAT_MSG, 'x' * (codec.MAX_STRING + 1), 'text')
+
+    def test_unknown_opcode(self):
+        for payload in (b'', bytes([0]), bytes([255]) + b'data', bytes([codec.TABLE_HOLE + 1])):
+            with self.subTest(payload=payload):
+                with self.assertRaises(ProtocolError):
+                    codec.decode(payload)
+
+if __name__ == '__main__':
+    unittest.main()
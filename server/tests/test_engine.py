@@ -0,0 +1,96 @@
+import common
+from poker import logic
+import poker.objects as poker
+import routing
+import scheduler
+import settings
+import unittest
+
+# HoldemEngine through the table's messages: players leaving mid-hand, on
+# the clock or not, and seats handed out again afterwards.
+
+class EngineTest(unittest.TestCase):
+    def setUp(self):
+        settings.HAND_START_DELAY = 3600 #Hands are started by the tests
+        settings.ACTION_TIMEOUT = 3600
+        routing.routers.clear()
+        routing.changed()
+        poker.games.clear()
+        logic.create_local_game('holdem', 1)
+        self.game = poker.games[1]
+        self.engine = self.game.engine
+
+    def tearDown(self):
+        scheduler.cancel(self.engine.start_timer)
+        scheduler.cancel(self.engine.action_timer)
+        self.game.players.clear()
+        self.game.reap()
+
+    def seat(self, count: int) -> None:
+        for index in range(count):
+            self.game.handle_message(f'player:add:p{index}')
+
+    def start(self) -> None:
+        scheduler.cancel(self.engine.start_timer)
+        self.engine.start_timer = None
+        self.engine.start_hand()
+
+    def test_seats_are_unique(self):
+        self.seat(4)
+        self.game.handle_message('player:rmv:p1')
+        self.game.handle_message('player:add:p4')
+        self.assertEqual(sorted(p.seat for p in self.game.players), [0, 1, 2, 3])
+        self.game.handle_message('player:rmv:p0')
+        self.game.handle_message('player:rmv:p2')
+        self.game.handle_message('player:add:p5')
+        self.game.handle_message('player:add:p6')
+        self.game.handle_message('player:add:p7')
+        self.assertEqual(sorted(p.seat for p in self.game.players), [0, 1, 2, 3, 4])
+
+    def test_leaver_off_the_clock(self):
+        self.seat(4)
+        self.start()
+        turn, timer = self.engine.turn, self.engine.action_timer
+        self.assertEqual(turn, 3)
+        self.game.handle_message('player:rmv:p2')
+        self.assertEqual(self.engine.turn, turn)
+        self.assertIs(self.engine.action_timer, timer)
+        self.assertFalse(self.engine.pending >> 2 & 1)
+        self.assertFalse(self.engine.in_hand[2].pots)
+        # The hand goes on from the player who was to act, skipping the leaver.
+        self.assertEqual(self.engine.act('p3', 'call')['code'], '200')
+        self.assertEqual(self.engine.turn, 0)
+        self.assertEqual(self.engine.act('p0', 'call')['code'], '200')
+        self.assertEqual(self.engine.turn, 1)
+
+    def test_leaver_on_the_clock(self):
+        self.seat(4)
+        self.start()
+        timer = self.engine.action_timer
+        self.game.handle_message('player:rmv:p3')
+        self.assertEqual(self.engine.turn, 0)
+        self.assertIsNot(self.engine.action_timer, timer)
+        self.assertEqual(self.engine.action_timer.args, (self.engine.hand_no, 0))
+
+    def test_last_opponent_leaves(self):
+        self.seat(2)
+        self.start()
+        stays = self.engine.in_hand[self.engine.turn]
+        leaves = self.engine.in_hand[1 - self.engine.turn]
+        expected = stays.balance + stays.cur_bet + leaves.cur_bet
+        self.game.handle_message(f'player:rmv:{leaves.addr}')
+        self.assertEqual(self.engine.state, logic.WAITING)
+        self.assertEqual(stays.balance, expected)
+        self.assertIsNone(self.engine.action_timer)
+
+    def test_rejoin_mid_hand_keeps_leavers_seat(self):
+        self.seat(4)
+        self.start()
+        self.game.handle_message('player:rmv:p2')
+        self.game.handle_message('player:add:p4')
+        joined = next(p for p in self.game.players if p.addr == 'p4')
+        self.assertNotIn(joined.seat, (0, 1, 2, 3))
+        self.assertNotIn(joined.seat, self.engine.in_hand)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import common
+from collections import Counter
+from itertools import combinations
+from poker import evaluator
+from poker.objects import Player
+import random
+import unittest
+
+# poker.evaluator against a plain reference: every 5 card hand falls in the
+# right category, and sampled 5 and 7 card hands order the same way as the
+# reference's (category, tiebreak ranks) tuples.
+
+FIVE_CARD_COUNTS = {
+    evaluator.HIGH_CARD: 1302540,
+    evaluator.PAIR: 1098240,
+    evaluator.TWO_PAIR: 123552,
+    evaluator.THREE_OF_A_KIND: 54912,
+    evaluator.STRAIGHT: 10200,
+    evaluator.FLUSH: 5108,
+    evaluator.FULL_HOUSE: 3744,
+    evaluator.FOUR_OF_A_KIND: 624,
+    evaluator.STRAIGHT_FLUSH: 40,
+}
+
+def reference(hand: tuple[int, ...]) -> tuple:
+    ranks = sorted((card >> 2 for card in hand), reverse=True)
+    counts = Counter(ranks)
+    grouped = sorted(counts, key=lambda rank: (counts[rank], rank), reverse=True)
+    shape = sorted(counts.values(), reverse=True)
+    flush = len({card & 3 for card in hand}) == 1
+    straight = None
+    if len(counts) == 5:
+        if ranks[0] - ranks[4] == 4:
+            straight = ranks[0]
+        elif ranks == [evaluator.ACE, 3, 2, 1, 0]:
+            straight = 3
+    if straight is not None:
+        return (evaluator.STRAIGHT_FLUSH if flush else evaluator.STRAIGHT, straight)
+    if flush:
+        return (evaluator.FLUSH, *ranks)
+    match shape:
+        case [4, 1]:
+            return (evaluator.FOUR_OF_A_KIND, *grouped)
+        case [3, 2]:
+            return (evaluator.FULL_HOUSE, *grouped)
+        case [3, 1, 1]:
+            return (evaluator.THREE_OF_A_KIND, *grouped)
+        case [2, 2, 1]:
+            return (evaluator.TWO_PAIR, *grouped)
+        case [2, 1, 1, 1]:
+            return (evaluator.PAIR, *grouped)
+    return (evaluator.HIGH_CARD, *ranks)
+
+def best_reference(hand: list[int]) -> tuple:
+    return max(reference(five) for five in combinations(hand, 5))
+
+class EvaluatorTest(unittest.TestCase):
+    def assert_same_order(self, hands: list, reference) -> None:
+        scored = sorted((reference(hand), evaluator.evaluate(hand), hand) for hand in hands)
+        for (ref, strength, hand), (next_ref, next_strength, next_hand) in zip(scored, scored[1:]):
+            if ref == next_ref:
+                self.assertEqual(strength, next_strength, (hand, next_hand))
+            else:
+                self.assertLess(strength, next_strength, (hand, next_hand))
+        for ref, strength, hand in scored:
+            self.assertEqual(evaluator.category(strength), ref[0], hand)
+
+    def test_every_five_card_hand(self):
+        counts = Counter()
+        strengths = set()
+        for hand in combinations(range(52), 5):
+            strength = evaluator.evaluate(hand)
+            counts[evaluator.category(strength)] += 1
+            strengths.add(strength)
+        self.assertEqual(counts, FIVE_CARD_COUNTS)
+        self.assertEqual(len(strengths), 7462)
+
+    def test_five_card_order(self):
+        rng = random.Random(0)
+        hands = [tuple(rng.sample(range(52), 5)) for _ in range(50000)]
+        hands += [(48, 1, 6, 11, 12), (49, 44, 40, 36, 32), (51, 47, 43, 39, 35)] #Wheel, Broadway, royal flush
+        self.assert_same_order(hands, reference)
+
+    def test_seven_card_order(self):
+        rng = random.Random(1)
+        hands = [tuple(rng.sample(range(52), 7)) for _ in range(20000)]
+        self.assert_same_order(hands, best_reference)
+
+    def test_best_hand(self):
+        rng = random.Random(2)
+        for _ in range(2000):
+            hand = rng.sample(range(52), 7)
+            best = evaluator.best_hand(hand)
+            self.assertEqual(len(best), 5)
+            self.assertTrue(set(best) <= set(hand))
+            self.assertEqual(evaluator.evaluate(best), evaluator.evaluate(hand))
+
+    def test_player_hand(self):
+        player = Player(0, 'p0')
+        self.assertEqual(player.hand, [])
+        cards = [48, 0, 4, 8, 12, 20, 24]
+        player.find_rank(cards)
+        self.assertEqual(player.rank, evaluator.evaluate(cards))
+        self.assertEqual(evaluator.evaluate(player.hand), player.rank)
+        player.clear_hand()
+        self.assertEqual(player.hand, [])
+
+if __name__ == '__main__':
+    unittest.main()
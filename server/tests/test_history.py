@@ -0,0 +1,46 @@
+import common
+import history
+import tempfile
+import unittest
+
+# Hands recorded under a recycled game id must all stay reachable.
+
+class HandLogTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        history.start(self.directory.name)
+
+    def tearDown(self):
+        history.stop()
+        self.directory.cleanup()
+
+    def read(self) -> history.HandLog:
+        history.writer.flush()
+        path, = history.list_logs(self.directory.name)
+        log = history.HandLog(path)
+        self.addCleanup(log.close)
+        return log
+
+    def test_recycled_game_id(self):
+        history.record(12345, 1, 0, [1, 2, 3], [(0, 100, 150, [4, 5]), (1, 100, 50, [6, 7])], [(0, 0, 5, 10)])
+        history.record(12345, 1, 1, [8, 9, 10], [(0, 200, 100, [11, 12]), (1, 200, 300, [13, 14])], [(0, 1, 5, 10)])
+        history.record(12345, 2, 0, [], [(0, 150, 150, [15, 16])], [])
+        log = self.read()
+        first, second = log.hands(12345, 1)
+        self.assertEqual((first['button'], second['button']), (0, 1))
+        self.assertLessEqual(first['time'], second['time'])
+        self.assertEqual(second['board'], bytes([8, 9, 10]))
+        self.assertEqual(len(log.hands(12345, 2)), 1)
+        self.assertEqual(log.hands(12345, 3), [])
+
+    def test_replay_matches_lookup(self):
+        for hand_no in range(1, 51):
+            history.record(7, hand_no, hand_no % 6, [], [(0, hand_no, hand_no + 1, [0, 1])], [(0, 0, 1, hand_no)])
+        log = self.read()
+        replayed = list(log)
+        self.assertEqual(len(replayed), 50)
+        for hand in replayed:
+            self.assertEqual(log.hands(7, hand['hand']), [hand])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import common
+import outbound
+import socket
+import threading
+import time
+import unittest
+
+# The send path of a threaded-mode connection must never block the caller,
+# whether or not the platform has MSG_DONTWAIT.
+
+class QueuedConnectionTest(unittest.TestCase):
+    def setUp(self):
+        self.near, self.far = socket.socketpair()
+        self.near.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        self.conn = outbound.QueuedConnection(self.near)
+
+    def tearDown(self):
+        self.conn.close()
+        self.far.close()
+        self.conn.writer.join(5)
+
+    def fill(self) -> float:
+        start = time.perf_counter()
+        for _ in range(64):
+            self.conn.sendall(b'x' * 4096)
+        return time.perf_counter() - start
+
+    def test_stalled_client_queues(self):
+        self.assertLess(self.fill(), 1)
+        self.assertGreater(self.conn.depth(), 0)
+
+    def test_stalled_client_queues_without_dontwait(self):
+        flag, outbound.MSG_DONTWAIT = outbound.MSG_DONTWAIT, None
+        try:
+            self.assertLess(self.fill(), 1)
+            self.assertGreater(self.conn.depth(), 0)
+        finally:
+            outbound.MSG_DONTWAIT = flag
+
+    def test_everything_delivered(self):
+        received = bytearray()
+        def drain():
+            while len(received) < 64 * 4096:
+                received.extend(self.far.recv(65536))
+        reader = threading.Thread(target=drain)
+        reader.start()
+        self.fill()
+        reader.join(5)
+        self.assertEqual(len(received), 64 * 4096)
+        # The writer counts its batch just after the socket takes it.
+        deadline = time.monotonic() + 5
+        while self.conn.sent < len(received) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.conn.sent, len(received))
+
+    def test_direct_send_counted(self):
+        self.conn.sendall(b'x' * 100)
+        self.assertEqual(self.conn.sent, 100)
+        self.assertEqual(self.conn.depth(), 0)
+
+class BackpressureTest(unittest.TestCase):
+    def test_evict_is_abstract(self):
+        with self.assertRaises(TypeError):
+            outbound.Backpressure()
+
+if __name__ == '__main__':
+    unittest.main()
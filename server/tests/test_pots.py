@@ -0,0 +1,81 @@
+import common
+from poker import logic
+from poker.objects import Player, Pot, build_pots, pot_winners
+import random
+import unittest
+
+# Side pots over random all-in showdowns, against a reference that hands
+# out the chips one level at a time: the chip every player put in at level
+# L goes to the best live hand among the players who put in at least L (or,
+# above every live total, among those with the biggest). Each set of
+# winners must get the same chips from build_pots' pots, and each pot's odd
+# chips go to its winners nearest the button's left.
+
+def random_showdown(rng: random.Random, count: int, ranks: int = 4) -> list[Player]:
+    seats = rng.sample(range(logic.MAX_SEATS), count)
+    players = []
+    for seat in seats:
+        player = Player(seat, f'p{seat}')
+        player.total_bet = rng.choice((rng.randint(1, 50) * 10, rng.randint(1, 5000)))
+        player.pots = 1 if rng.random() < 0.7 else 0
+        player.rank = rng.randint(1, ranks)
+        players.append(player)
+    if not any(p.pots for p in players):
+        players[0].pots = 1
+    return players
+
+def reference(players: list[Player]) -> dict[tuple, int]:
+    live = [p for p in players if p.pots]
+    top = max(p.total_bet for p in live)
+    chips = {}
+    levels = sorted({0} | {p.total_bet for p in players})
+    for low, high in zip(levels, levels[1:]):
+        amount = (high - low) * sum(1 for p in players if p.total_bet >= high)
+        eligible = [p for p in live if p.total_bet >= min(high, top)]
+        best = max(p.rank for p in eligible)
+        key = tuple(sorted(p.seat for p in eligible if p.rank == best))
+        chips[key] = chips.get(key, 0) + amount
+    return chips
+
+# What each winner's share must be: walking the seats from the button's
+# left, the first total % winners winners get a chip more.
+def expected_shares(total: int, seats: set[int], button: int) -> dict[int, int]:
+    order = [(button + step) % logic.MAX_SEATS for step in range(1, logic.MAX_SEATS + 1)]
+    order = [seat for seat in order if seat in seats]
+    odd = total % len(order)
+    return {seat: total // len(order) + (i < odd) for i, seat in enumerate(order)}
+
+class PotsTest(unittest.TestCase):
+    def check(self, players: list[Player], button: int) -> None:
+        pots = build_pots(players)
+        winners = pot_winners(pots, players)
+        self.assertEqual(sum(pot.total for pot in pots), sum(p.total_bet for p in players))
+        chips = {}
+        for index, (pot, pot_players) in enumerate(zip(pots, winners)):
+            self.assertTrue(pot_players)
+            seats = {p.seat for p in pot_players}
+            key = tuple(sorted(seats))
+            chips[key] = chips.get(key, 0) + pot.total
+            for player in pot_players:
+                self.assertTrue(player.in_pot(index))
+            shares = {p.seat: share for p, share in logic.pot_shares(pot, pot_players, button)}
+            self.assertEqual(shares, expected_shares(pot.total, seats, button), (button, pot.total))
+        self.assertEqual(chips, reference(players))
+
+    def test_random_showdowns(self):
+        rng = random.Random(0)
+        for _ in range(20000):
+            # Few ranks, so plenty of ties.
+            self.check(random_showdown(rng, rng.randint(2, 8)), rng.randint(-1, 7))
+
+    def test_odd_chips_from_the_button(self):
+        pot = Pot([])
+        pot.total = 101
+        winners = [Player(seat, f'p{seat}') for seat in (1, 4, 6)]
+        shares = {p.seat: share for p, share in logic.pot_shares(pot, winners, 4)}
+        self.assertEqual(shares, {6: 34, 1: 34, 4: 33})
+        shares = {p.seat: share for p, share in logic.pot_shares(pot, winners, -1)}
+        self.assertEqual(shares, {1: 34, 4: 34, 6: 33})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import common
+import protocol
+from protocol import FrameBuffer, ProtocolError
+import random
+import socket
+import unittest
+
+# FrameBuffer must hand back exactly the payloads that were framed, however
+# the stream is cut up by the socket, and refuse a header it cannot honour.
+
+PAYLOADS = [b'', b'a', b'hello', bytes(range(256)) * 10, b'x' * 5000]
+STREAM = b''.join(protocol.encode_frame(payload) for payload in PAYLOADS)
+
+class FrameBufferTest(unittest.TestCase):
+    def read(self, chunks, size: int = 1024) -> list[bytes]:
+        frames = FrameBuffer(size)
+        received = []
+        for chunk in chunks:
+            frames.feed(chunk)
+            received.extend(frames)
+        self.assertEqual(frames.end - frames.start, 0)
+        return received
+
+    def test_one_read(self):
+        self.assertEqual(self.read([STREAM]), PAYLOADS)
+
+    def test_split_at_every_byte(self):
+        for cut in range(len(STREAM) + 1):
+            with self.subTest(cut=cut):
+                self.assertEqual(self.read([STREAM[:cut], STREAM[cut:]], size=16), PAYLOADS)
+
+    def test_one_byte_at_a_time(self):
+        self.assertEqual(self.read([STREAM[i:i + 1] for i in range(len(STREAM))], size=4), PAYLOADS)
+
+    def test_random_chunks(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            cuts = sorted(rng.sample(range(1, len(STREAM)), rng.randint(1, 20)))
+            chunks = [STREAM[a:b] for a, b in zip([0] + cuts, cuts + [len(STREAM)])]
+            self.assertEqual(self.read(chunks, size=rng.choice((8, 64, 1024))), PAYLOADS)
+
+    def test_several_frames_per_read(self):
+        stream = STREAM * 3
+        self.assertEqual(self.read([stream[:len(stream) // 2], stream[len(stream) // 2:]]), PAYLOADS * 3)
+
+    def test_oversize_header(self):
+        frames = FrameBuffer()
+        frames.feed(protocol.HEADER.pack(protocol.MAX_FRAME_SIZE + 1))
+        with self.assertRaises(ProtocolError):
+            list(frames)
+
+    def test_oversize_header_after_good_frame(self):
+        frames = FrameBuffer()
+        frames.feed(protocol.encode_frame(b'ok') + protocol.HEADER.pack(0xFFFFFFFF))
+        received = []
+        with self.assertRaises(ProtocolError):
+            for payload in frames:
+                received.append(payload)
+        self.assertEqual(received, [b'ok'])
+
+    def test_largest_frame(self):
+        payload = b'z' * protocol.MAX_FRAME_SIZE
+        self.assertEqual(self.read([protocol.encode_frame(payload)]), [payload])
+
+    def test_encode_oversize(self):
+        with self.assertRaises(ProtocolError):
+            protocol.encode_frame(b'z' * (protocol.MAX_FRAME_SIZE + 1))
+
+    def test_recv_into(self):
+        near, far = socket.socketpair()
+        with near, far:
+            far.sendall(STREAM)
+            far.shutdown(socket.SHUT_WR)
+            frames = FrameBuffer(16)
+            received = []
+            while frames.recv_into(near):
+                received.extend(frames)
+            self.assertEqual(received, PAYLOADS)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import common
+from poker import logic
+import poker.objects as poker
+import routing
+import sys
+import threading
+import unittest
+
+# The reaper's check and close race a client joining the emptied table; one
+# of them must win outright, never a player seated at a closed table.
+
+class ReapTest(unittest.TestCase):
+    def setUp(self):
+        routing.routers.clear()
+        routing.changed()
+        poker.games.clear()
+
+    def test_join_after_reap_refused(self):
+        logic.create_local_game('holdem', 1)
+        game = poker.games[1]
+        game.reap()
+        self.assertEqual(game.add_player('p0')['code'], '400')
+        self.assertEqual(game.players, [])
+
+    def test_reap_races_join(self):
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for game_id in range(1, 301):
+                logic.create_local_game('holdem', game_id)
+                game = poker.games[game_id]
+                joiner = threading.Thread(target=game.add_player, args=(f'p{game_id}',))
+                joiner.start()
+                game.reap()
+                joiner.join()
+                self.assertEqual(game.closed, not game.players, game_id)
+                self.assertEqual(game_id in routing.routers, bool(game.players), game_id)
+                game.players.clear()
+                if not game.closed:
+                    game.reap()
+        finally:
+            sys.setswitchinterval(interval)
+
+if __name__ == '__main__':
+    unittest.main()
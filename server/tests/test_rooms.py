@@ -0,0 +1,63 @@
+import common
+import communication
+from poker import logic
+import poker.objects as poker
+import routing
+import unittest
+
+# Rooms outliving their table: a spectator whose table is reaped must be
+# able to disconnect or move on without touching the dead table's router.
+
+class Connection:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    def sendall(self, data: bytes, key: str | None = None, droppable: bool = False) -> None:
+        self.sent.append(data)
+
+    def close(self) -> None:
+        self.closed = True
+
+class ReapedRoomTest(unittest.TestCase):
+    def setUp(self):
+        communication.clients.clear()
+        communication.rooms.clear()
+        routing.routers.clear()
+        routing.changed()
+        poker.games.clear()
+        for game_id in (1, 2):
+            logic.create_local_game('holdem', game_id)
+            routing.get_router(game_id).register_server_handler(communication.handle_game)
+        self.conn = Connection()
+        communication.create_new_user(self.conn, 'watcher', 'watcher')
+        communication.watch_game(self.conn, 'watcher', 1)
+
+    def tearDown(self):
+        for game in list(poker.games.values()):
+            game.reap()
+
+    def test_reap_clears_members_game(self):
+        self.assertEqual(communication.clients['watcher']['game'], 1)
+        poker.games[1].reap()
+        self.assertNotIn(1, communication.rooms)
+        self.assertIsNone(communication.clients['watcher']['game'])
+
+    def test_disconnect_after_reap(self):
+        poker.games[1].reap()
+        communication.close_client(self.conn, 'watcher')
+        self.assertTrue(self.conn.closed)
+        self.assertNotIn('watcher', communication.clients)
+
+    def test_join_after_reap(self):
+        poker.games[1].reap()
+        communication.join_game(self.conn, 'watcher', 2)
+        self.assertEqual(communication.clients['watcher']['game'], 2)
+        self.assertIn('watcher', communication.rooms[2])
+
+    def test_leave_unknown_table(self):
+        communication.leave_game('watcher', 99)
+        self.assertEqual(communication.clients['watcher']['game'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
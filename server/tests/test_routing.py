@@ -0,0 +1,33 @@
+import common
+import routing
+import unittest
+
+# get_all_routers copies the registry only after a change, and every copy
+# it hands out matches the registry at the time of the call.
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        routing.routers.clear()
+        routing.changed()
+
+    def tearDown(self):
+        routing.routers.clear()
+        routing.changed()
+
+    def test_follows_changes(self):
+        self.assertEqual(routing.get_all_routers(), ())
+        first = routing.new_router(1)
+        second = routing.new_router(2)
+        self.assertEqual(set(routing.get_all_routers()), {first, second})
+        routing.close_router(1)
+        self.assertEqual(routing.get_all_routers(), (second,))
+
+    def test_copied_once_per_change(self):
+        routing.new_router(1)
+        snapshot = routing.get_all_routers()
+        self.assertIs(routing.get_all_routers(), snapshot)
+        routing.new_router(2)
+        self.assertIsNot(routing.get_all_routers(), snapshot)
+
+if __name__ == '__main__':
+    unittest.main()